@@ -1,20 +1,23 @@
 import os
+import re
 import openai
 import json
 import shutil
-import re
 import cv2
 import random
 
-from flask import Flask, request, render_template_string, redirect, url_for, session
+from flask import (Flask, request, render_template_string, redirect, url_for, session,
+                   jsonify, send_from_directory, abort)
 
 # Import backend modules from the "backend" folder.
-from backend.floorplan_generator import FloorplanGenerator
-from backend.floorplan_visualizer import FloorplanVisualizer
+from backend.plan_cache import PlanCache
+from backend.plan_jobs import PlanJobQueue, DONE, FAILED
+from backend.workspace import DEFAULT_TTL_SECONDS, valid_id
+from backend.spec_parser import SpecParser, finalize_specs
+from backend.plan_library import PlanLibrary, DEFAULT_LIBRARY_DIR
 from backend.room_type_detector import RoomTypeDetector
 from backend.perfect_plan_selector import PerfectPlanSelector
 from backend.pretty_floorplan_maker import PrettyFloorplanMaker
-from backend.first_floor_plan_generator import FirstFloorPlanGenerator
 from backend.first_floor_enhancer import FirstFloorEnhancer
 from backend.floorplan_rl_agent import FloorplanRLAgent
 
@@ -27,6 +30,33 @@ openai.api_key = "sk-...DuYA"  # Replace with your actual API key
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'  # Change this for production
 
+# Renders shared across requests (same plan => same PNG)
+plan_cache = PlanCache()
+
+# Spec parsing: identical descriptions reuse the stored LLM answer
+spec_parser = SpecParser()
+
+# Plan generation runs in background worker processes; requests only submit and poll.
+# Each session gets its own workspace; unused ones are removed after the TTL.
+job_queue = PlanJobQueue(workers=int(os.environ.get("PLAN_JOB_WORKERS", 2)),
+                         cache_dir=plan_cache.root,
+                         ttl_seconds=int(os.environ.get("PLAN_WORKSPACE_TTL", DEFAULT_TTL_SECONDS)))
+
+# Precomputed plans (backend/plan_library.py) answer known specs instantly; below
+# PLAN_LIBRARY_TARGET plans per spec (9, like plan_library.py --per-spec), each hit
+# also queues a background top-up (one per spec at a time)
+plan_library = PlanLibrary(os.environ.get("PLAN_LIBRARY_DIR", DEFAULT_LIBRARY_DIR))
+PLAN_LIBRARY_TARGET = int(os.environ.get("PLAN_LIBRARY_TARGET", 9))
+
+# GA candidates a single API job may ask for (larger requests are clamped)
+MAX_JOB_FLOORPLANS = int(os.environ.get("PLAN_JOB_MAX_FLOORPLANS", 40))
+
+# Spec keys a job accepts; anything else in a client's "specs" is dropped
+JOB_SPEC_KEYS = ("bedrooms", "washrooms", "has_garage", "has_attachedwashroom")
+
+# Ground-floor images a user can pick (what the ground-floor jobs write)
+GROUND_PLAN_FILE = re.compile(r"^plan\d+\.png$")
+
 # ---------------------------
 # Helper functions
 # ---------------------------
@@ -54,71 +84,132 @@ def rename_png_and_json(old_png, old_dir, new_png, new_dir):
         os.rename(old_json_path, new_json_path)
 
 def parse_floorplan_request(user_text: str) -> dict:
-    system_content = """
-You are a helpful AI that extracts floorplan specs from the user's text.
-They might mention:
- - number of bedrooms (1..3)
- - number of washrooms (1..3)
- - garage or not
- - attached washrooms or not
-If not stated, defaults: bedrooms=2, washrooms=1, has_garage=false, attached=false.
-Return strictly valid JSON with 4 keys: bedrooms, washrooms, has_garage, has_attachedwashroom.
-No extra text, just JSON.
-"""
-    user_prompt = f"User request:\n{user_text}\nExtract the parameters in JSON only."
+    """
+    Floorplan specs from the user's text: local regex parse when it is enough,
+    else the (memoized) OpenAI answer; see backend/spec_parser.py.
+    """
+    return spec_parser.parse(user_text)
+
+def session_workspace():
+    """
+    This session's Workspace (created on first use).
+    """
+    workspace_id = session.get("workspace")
+    workspace = job_queue.workspace(workspace_id if valid_id(workspace_id) else None)
+    session["workspace"] = workspace.workspace_id
+    return workspace
+
+def start_ground_floor(specs, num_floorplans=5, seed=None):
+    """
+    Job id of the ground-floor plans for specs: served from the plan library
+    when it has them (unless a seed asks for a specific GA run), else generated.
+    """
+    workspace = session_workspace()
+    entries = plan_library.lookup(specs) if seed is None else []
+    if not entries:
+        return job_queue.submit_ground_floor(workspace, specs, num_floorplans, seed)
+    job_id = job_queue.complete("ground_floor", workspace, lambda output_dir: {
+        "plans": plan_library.export(specs, entries, output_dir), "source": "library"})
+    if plan_library.count(specs) < PLAN_LIBRARY_TARGET:
+        job_queue.submit_library_top_up(workspace, plan_library.root, specs)
+    return job_id
+
+def job_file_urls(job_id):
+    """
+    URLs of the PNGs a finished job produced (empty while it is still running).
+    """
+    result = job_queue.result(job_id) or {}
+    return [url_for("job_file", job_id=job_id, filename=name + ".png")
+            for name in result.get("plans", [])]
+
+def job_pending_page(job_id, title):
+    status = job_queue.status(job_id)
+    html = """
+    <html>
+      <head>
+        <title>{{ title }}</title>
+        {% if status.status not in ["done", "failed"] %}<meta http-equiv="refresh" content="2">{% endif %}
+      </head>
+      <body>
+        <h2>{{ title }}</h2>
+        <p>Job {{ status.job_id }}: {{ status.status }}</p>
+        {% if status.error %}<p>{{ status.error }}</p>{% endif %}
+      </body>
+    </html>
+    """
+    return render_template_string(html, title=title, status=status)
+
+# ---------------------------
+# Job API
+# ---------------------------
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Start a ground-floor generation job.
+    JSON body: {"description": "..."} or {"specs": {...}}, optional "num_floorplans", "seed".
+    Client specs get the same clamping as a parsed description, and
+    num_floorplans is clamped to 1..MAX_JOB_FLOORPLANS.
+    """
+    data = request.get_json(silent=True) or request.form.to_dict()
+    if not isinstance(data, dict):
+        return jsonify({"error": "expected a JSON object"}), 400
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_content},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.0
-        )
-        content = response["choices"][0]["message"]["content"].strip()
-        data = json.loads(content)
-    except Exception as e:
-        print("OpenAI API error, using defaults:", e)
-        data = {
-            "bedrooms": 2,
-            "washrooms": 1,
-            "has_garage": False,
-            "has_attachedwashroom": False
-        }
-    # Ensure valid values
-    bedrooms = data.get("bedrooms", 2)
-    if bedrooms not in [1, 2, 3]:
-        bedrooms = 2
-    washrooms = data.get("washrooms", 1)
-    if washrooms not in [1, 2, 3]:
-        washrooms = 1
-    has_garage = bool(data.get("has_garage", False))
-    has_attachedwashroom = bool(data.get("has_attachedwashroom", False))
-    text_lower = user_text.lower()
-    bed_match = re.search(r'(\d+)\s+bedroom', text_lower)
-    if bed_match:
-        bed_num = int(bed_match.group(1))
-        if bed_num in [1, 2, 3]:
-            bedrooms = bed_num
-    wash_match = re.search(r'(\d+)\s+(?:washroom|bathroom)', text_lower)
-    if wash_match:
-        wash_num = int(wash_match.group(1))
-        if wash_num in [1, 2, 3]:
-            washrooms = wash_num
-    # Override as per your logic.
-    has_garage = True
-    if bedrooms >= 2:
-        has_attachedwashroom = True
-    # Extract language if provided.
-    language = "English"
-    if "urdu" in text_lower:
-        language = "Urdu"
-    data["language"] = language
-    data["bedrooms"] = bedrooms
-    data["washrooms"] = washrooms
-    data["has_garage"] = has_garage
-    data["has_attachedwashroom"] = has_attachedwashroom
-    return data
+        num_floorplans = int(data.get("num_floorplans", 5))
+        seed = int(data["seed"]) if data.get("seed") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "num_floorplans and seed must be integers"}), 400
+    num_floorplans = max(1, min(num_floorplans, MAX_JOB_FLOORPLANS))
+    specs = data.get("specs")
+    if specs is None:
+        description = data.get("description", "")
+        if not isinstance(description, str):
+            return jsonify({"error": "description must be a string"}), 400
+        specs = parse_floorplan_request(description)
+    elif isinstance(specs, dict):
+        specs = finalize_specs({k: specs[k] for k in JOB_SPEC_KEYS if k in specs}, "")
+    else:
+        return jsonify({"error": "specs must be an object"}), 400
+    job_id = start_ground_floor(specs, num_floorplans, seed)
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id),
+        "result_url": url_for("job_result", job_id=job_id),
+    }), 202
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(status)
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "unknown job"}), 404
+    if status["status"] == FAILED:
+        return jsonify(status), 500
+    if status["status"] != DONE:
+        return jsonify(status), 202
+    job = job_queue.get(job_id)
+    plans = []
+    for name in job.result["plans"]:
+        with open(os.path.join(job_queue.output_dir(job), name + ".json"), "r") as jf:
+            plan = json.load(jf)
+        plans.append({
+            "name": name,
+            "image_url": url_for("job_file", job_id=job_id, filename=name + ".png"),
+            "plan": plan,
+        })
+    return jsonify(dict(status, plans=plans))
+
+@app.route("/jobs/<job_id>/files/<path:filename>")
+def job_file(job_id, filename):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404)
+    return send_from_directory(os.path.abspath(job_queue.output_dir(job)), filename)
 
 # ---------------------------
 # Routes
@@ -130,6 +221,8 @@ def index():
         session["language"] = request.form.get("language", "English")
         specs = parse_floorplan_request(session["description"])
         session["specs"] = specs
+        job_queue.collect_garbage()
+        session["ground_job"] = start_ground_floor(specs)
         # Initialize RL agent and store its Q-table in session.
         rl_agent = FloorplanRLAgent()
         session["rl_agent"] = rl_agent.q_table  # Q-table is a JSON-serializable dict.
@@ -157,10 +250,12 @@ def index():
 def ground_floor():
     specs = session.get("specs", {"bedrooms": 2, "washrooms": 1, "has_garage": True, "has_attachedwashroom": True, "language": "English"})
     language = specs.get("language", "English")
-    # The ground-floor images will be generated by the backend and saved in the "pretty" folder.
-    # For this route, we list the generated plans from the "pretty" folder.
-    pretty_dir = "pretty"
-    image_list = sorted([f for f in os.listdir(pretty_dir) if f.lower().endswith(".png")])[:3]
+    job_id = session.get("ground_job")
+    if job_id is None or job_queue.get(job_id) is None:
+        return redirect(url_for("index"))
+    if job_queue.result(job_id) is None:
+        return job_pending_page(job_id, "Generating ground floor plans...")
+    image_list = job_file_urls(job_id)
     html = """
     <html>
       <head>
@@ -183,7 +278,7 @@ def ground_floor():
       <body>
         <h2>Ground Floor Plans ({{ language }})</h2>
         {% for img in images %}
-          <img id="{{ img }}" src="{{ url_for('static', filename='assets/ground/' + img) }}" class="img-select" width="150" onclick="selectImage('{{ img }}')">
+          <img id="{{ img.split('/')[-1] }}" src="{{ img }}" class="img-select" width="150" onclick="selectImage('{{ img.split('/')[-1] }}')">
         {% endfor %}
         <br><br>
         <form action="{{ url_for('generate_first_floor') }}" method="POST">
@@ -197,49 +292,35 @@ def ground_floor():
 
 @app.route("/generate_first_floor", methods=["POST"])
 def generate_first_floor():
-    selected_ground = request.form.get("selected_image", "")
+    selected_ground = os.path.basename(request.form.get("selected_image", ""))
     if not selected_ground:
         return "Please select a ground-floor plan.", 400
+    if not GROUND_PLAN_FILE.match(selected_ground):
+        return "Invalid ground-floor plan.", 400
+    ground_base = selected_ground[:-4]
     session["selected_ground"] = selected_ground
-    chosen_json = os.path.join("pretty", f"{selected_ground[:-4]}.json")
+    ground_job = job_queue.get(session.get("ground_job", ""))
+    if ground_job is None:
+        return "Ground floor plans are no longer available.", 400
+    chosen_json = os.path.join(job_queue.output_dir(ground_job), f"{ground_base}.json")
     if not os.path.exists(chosen_json):
         return f"ERROR: Missing {chosen_json}", 400
     with open(chosen_json, "r") as f:
         chosen_floorplan_dict = json.load(f)
-    floor1_dir = "output_floor1"
-    if os.path.exists(floor1_dir):
-        for oldf in os.listdir(floor1_dir):
-            if oldf.lower().endswith((".png", ".json")):
-                os.remove(os.path.join(floor1_dir, oldf))
-    else:
-        os.makedirs(floor1_dir, exist_ok=True)
-    approach_list = [1, 2, 3]
-    visualizer = FloorplanVisualizer()
-    ff_width = FloorplanGenerator.FLOORPLAN_WIDTH
-    ff_height = FloorplanGenerator.FLOORPLAN_HEIGHT
-    for app_idx in approach_list:
-        # Import FirstFloorPlanGenerator from backend.
-        from backend.first_floor_plan_generator import FirstFloorPlanGenerator
-        ff_gen = FirstFloorPlanGenerator(chosen_floorplan_dict, ff_width, ff_height)
-        first_floor_dict = ff_gen.generate_first_floor_plan(approach=app_idx)
-        outbase = f"first_floor_plan_{selected_ground[:-4]}_approach{app_idx}"
-        out_png = os.path.join(floor1_dir, outbase + ".png")
-        out_json = os.path.join(floor1_dir, outbase + ".json")
-        visualizer.plot_with_boundaries(
-            first_floor_dict,
-            out_png,
-            ff_width,
-            ff_height,
-            "English"  # Using English for first-floor visualization by default.
-        )
-        with open(out_json, "w") as jf:
-            json.dump(first_floor_dict, jf)
+    session["first_job"] = job_queue.submit_first_floor(
+        session_workspace(), chosen_floorplan_dict, f"first_floor_plan_{ground_base}",
+        ground_job
+    )
     return redirect(url_for("first_floor"))
 
 @app.route("/first_floor")
 def first_floor():
-    floor1_dir = "output_floor1"
-    images = sorted([f for f in os.listdir(floor1_dir) if f.lower().endswith(".png")])
+    job_id = session.get("first_job")
+    if job_id is None or job_queue.get(job_id) is None:
+        return redirect(url_for("ground_floor"))
+    if job_queue.result(job_id) is None:
+        return job_pending_page(job_id, "Generating first floor plans...")
+    images = job_file_urls(job_id)
     html = """
     <html>
       <head>
@@ -262,7 +343,7 @@ def first_floor():
       <body>
         <h2>First Floor Plans</h2>
         {% for img in images %}
-          <img id="{{ img }}" src="{{ url_for('static', filename='assets/first/' + img) }}" class="img-select" width="150" onclick="selectImage('{{ img }}')">
+          <img id="{{ img.split('/')[-1] }}" src="{{ img }}" class="img-select" width="150" onclick="selectImage('{{ img.split('/')[-1] }}')">
         {% endfor %}
         <br><br>
         <form action="{{ url_for('summary') }}" method="POST">
@@ -287,16 +368,18 @@ def summary():
         <h2>Final Summary</h2>
         <div style="border:1px solid black; padding:10px;">
           <h3>Ground Floor</h3>
-          <img src="{{ url_for('static', filename='assets/ground/' + ground) }}" width="300">
+          <img src="{{ url_for('job_file', job_id=ground_job, filename=ground) }}" width="300">
         </div>
         <div style="border:1px solid black; padding:10px; margin-top:20px;">
           <h3>First Floor</h3>
-          <img src="{{ url_for('static', filename='assets/first/' + first) }}" width="300">
+          <img src="{{ url_for('job_file', job_id=first_job, filename=first) }}" width="300">
         </div>
       </body>
     </html>
     """
-    return render_template_string(summary_html, ground=selected_ground, first=selected_first)
+    return render_template_string(summary_html, ground=selected_ground, first=selected_first,
+                                  ground_job=session.get("ground_job", ""),
+                                  first_job=session.get("first_job", ""))
 
 @app.route("/feedback", methods=["POST"])
 def feedback():
@@ -0,0 +1,207 @@
+import numpy as np
+
+try:
+    from .plan_analysis import fuse_footprint
+except ImportError:
+    from plan_analysis import fuse_footprint
+
+# What lies on the other side of a wall, besides another room
+LIVING = "living"       # open floor inside the fused boundary
+EXTERIOR = "exterior"   # outside the fused boundary (or outside the drawing)
+
+
+class WallSegment:
+    """
+    A straight piece of a room's wall with the same thing on its other side.
+    start -> end runs counter-clockwise around `room` (bottom edge left to right,
+    right edge upwards, top edge right to left, left edge downwards).
+    `other` is a room name, LIVING or EXTERIOR.
+    """
+
+    def __init__(self, room, other, start, end):
+        self.room = room
+        self.other = other
+        self.start = start
+        self.end = end
+
+    @property
+    def length(self):
+        return abs(self.end[0] - self.start[0]) + abs(self.end[1] - self.start[1])
+
+    @property
+    def midpoint(self):
+        return ((self.start[0] + self.end[0]) / 2, (self.start[1] + self.end[1]) / 2)
+
+    def __repr__(self):
+        return f"WallSegment({self.room!r} | {self.other!r}: {self.start} -> {self.end})"
+
+
+class RoomAdjacencyGraph:
+    """
+    Which walls of which rooms touch what, built once per plan from the integer
+    room rectangles:
+      - shared walls between rooms, with their lengths
+      - walls facing the living area (inside the fused boundary, not a room)
+      - exterior walls (on the fused boundary)
+    Every rectangle in the dict is a node, like in the renders.
+
+    Door placement is a lookup here (door_wall), and other stages can query
+    neighbors()/shared_length()/living_walls() instead of intersecting polygons.
+    """
+
+    def __init__(self, floorplan, width=20, height=20, max_closing=50):
+        """
+        :param floorplan: {room_name: {x, y, width, height}} with integer coordinates.
+        :raises ValueError: if a room is not a positive integer rectangle.
+        """
+        self.rooms = {}
+        for name, rect in floorplan.items():
+            values = (rect["x"], rect["y"], rect["width"], rect["height"])
+            if not all(float(v).is_integer() for v in values) or values[2] <= 0 or values[3] <= 0:
+                raise ValueError("Adjacency graph needs positive integer room rectangles.")
+            self.rooms[name] = tuple(int(v) for v in values)
+        if not self.rooms:
+            raise ValueError("Adjacency graph needs at least one room.")
+
+        names = list(self.rooms)
+        self.ox = min([0] + [x for x, _, _, _ in self.rooms.values()])
+        self.oy = min([0] + [y for _, y, _, _ in self.rooms.values()])
+        x_end = max([width] + [x + w for x, _, w, _ in self.rooms.values()])
+        y_end = max([height] + [y + h for _, y, _, h in self.rooms.values()])
+
+        # owners[row, col] = bitmask of the rooms covering that cell
+        self.owners = np.zeros((y_end - self.oy, x_end - self.ox), dtype=np.int64)
+        for i, (x, y, w, h) in enumerate(self.rooms.values()):
+            self.owners[y - self.oy:y - self.oy + h, x - self.ox:x - self.ox + w] |= (1 << i)
+        occupied = (self.owners != 0).astype(np.uint8)
+
+        fused, dist = fuse_footprint(occupied, max_closing)
+        self.closing_distance = min(dist, max_closing)
+        self.fused = fused
+
+        in_bounds = np.zeros_like(occupied)
+        in_bounds[-self.oy:height - self.oy, -self.ox:width - self.ox] = 1
+        self.living = (fused & in_bounds & (1 - occupied)).astype(bool)
+
+        self._names = names
+        self.walls = {name: self._room_walls(name, i) for i, name in enumerate(names)}
+
+        self.shared = {}
+        for name, segments in self.walls.items():
+            for seg in segments:
+                if seg.other in self.rooms:
+                    key = tuple(sorted((name, seg.other)))
+                    # both rooms report the same wall => count it from one side only
+                    if name == key[0]:
+                        self.shared[key] = self.shared.get(key, 0) + seg.length
+
+    def _cell_kind(self, col, row, self_bit):
+        """
+        What the wall faces at grid cell (col, row): a list of room names,
+        or LIVING / EXTERIOR.
+        """
+        if not (0 <= row < self.owners.shape[0] and 0 <= col < self.owners.shape[1]):
+            return EXTERIOR
+        mask = int(self.owners[row, col]) & ~self_bit
+        if mask:
+            return tuple(n for i, n in enumerate(self._names) if mask & (1 << i))
+        if self.owners[row, col]:
+            # only this room is there (cannot happen for the room's own outline)
+            return EXTERIOR
+        return LIVING if self.living[row, col] else EXTERIOR
+
+    def _room_walls(self, name, index):
+        """
+        Walk the room outline counter-clockwise one unit edge at a time and merge
+        neighbouring edges that face the same thing into WallSegments.
+        """
+        x, y, w, h = self.rooms[name]
+        c0, r0 = x - self.ox, y - self.oy
+        bit = 1 << index
+        sides = (
+            # (unit edge starts, direction, cell on the other side of each edge)
+            ([(x + i, y) for i in range(w)], (1, 0), [(c0 + i, r0 - 1) for i in range(w)]),
+            ([(x + w, y + i) for i in range(h)], (0, 1), [(c0 + w, r0 + i) for i in range(h)]),
+            ([(x + w - i, y + h) for i in range(w)], (-1, 0), [(c0 + w - 1 - i, r0 + h) for i in range(w)]),
+            ([(x, y + h - i) for i in range(h)], (0, -1), [(c0 - 1, r0 + h - 1 - i) for i in range(h)]),
+        )
+        segments = []
+        for starts, (dx, dy), cells in sides:
+            run_start = None
+            run_kind = None
+            for (sx, sy), (col, row) in zip(starts, cells):
+                kind = self._cell_kind(col, row, bit)
+                if kind != run_kind:
+                    if run_start is not None:
+                        segments.extend(self._segments(name, run_kind, run_start, (sx, sy)))
+                    run_start, run_kind = (sx, sy), kind
+            end = (starts[-1][0] + dx, starts[-1][1] + dy)
+            segments.extend(self._segments(name, run_kind, run_start, end))
+        return segments
+
+    @staticmethod
+    def _segments(name, kind, start, end):
+        if isinstance(kind, tuple):
+            return [WallSegment(name, other, start, end) for other in kind]
+        return [WallSegment(name, kind, start, end)]
+
+    # ----------------------------------------------------------
+    # Queries
+    # ----------------------------------------------------------
+    def neighbors(self, room):
+        """
+        Rooms sharing a wall (positive length) with `room`, in plan order.
+        """
+        return [n for n in self._names if n != room and self.shared_length(room, n) > 0]
+
+    def shared_length(self, a, b):
+        return self.shared.get(tuple(sorted((a, b))), 0)
+
+    def shared_walls(self, room, other):
+        return [seg for seg in self.walls[room] if seg.other == other]
+
+    def living_walls(self, room):
+        return [seg for seg in self.walls[room] if seg.other == LIVING]
+
+    def exterior_walls(self, room):
+        return [seg for seg in self.walls[room] if seg.other == EXTERIOR]
+
+    def touches_living(self, room):
+        return bool(self.living_walls(room))
+
+    def door_wall(self, room):
+        """
+        Wall segment that gets the room's door (the door goes in its middle):
+          - washroom => longest wall shared with the first study, else the first
+            bedroom it touches, else its longest wall onto the living area
+          - any other room => its longest wall onto the living area
+        Exterior walls never get a door. Returns None if nothing qualifies.
+        """
+        candidates = []
+        if room.split("_")[0] == "Washroom":
+            for room_type in ("Study", "Bedroom"):
+                for other in self._names:
+                    if room_type in other and self.shared_length(room, other) > 0.1:
+                        candidates = self.shared_walls(room, other)
+                        break
+                if candidates:
+                    break
+        if not candidates:
+            candidates = self.living_walls(room)
+
+        best = None
+        for seg in candidates:
+            if best is None or seg.length > best.length:
+                best = seg
+        return best
+
+    def door_walls(self):
+        """
+        {room_name: WallSegment} for every room that gets a door.
+        """
+        doors = {}
+        for name in self._names:
+            seg = self.door_wall(name)
+            if seg is not None:
+                doors[name] = seg
+        return doors
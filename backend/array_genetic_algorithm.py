@@ -0,0 +1,191 @@
+import time
+import random
+
+import numpy as np
+
+try:
+    from .floorplan_generator import FloorplanGenerator
+except ImportError:
+    from floorplan_generator import FloorplanGenerator
+
+# Column order of the gene array
+X, Y, W, H = 0, 1, 2, 3
+
+
+class ArrayFloorplanGenerator(FloorplanGenerator):
+    """
+    Same GA as FloorplanGenerator.genetic_algorithm, but the whole population is a
+    NumPy array of shape (population, rooms, 4) holding [x, y, width, height].
+    Selection, crossover, mutation, boundary clamping and fitness run as batched
+    array operations; dicts are only built for the initial population and the result.
+    """
+
+    def __init__(self, rooms=None, attached_washroom=False, rl_agent=None,
+                 elite_count=None, stall_generations=None,
+                 population_size=None, generations=None):
+        """
+        Args:
+         - rooms, attached_washroom, rl_agent, elite_count, stall_generations:
+           see FloorplanGenerator.
+         - population_size (int): Overrides POPULATION_SIZE for this engine.
+         - generations (int): Overrides GENERATIONS for this engine.
+        """
+        super().__init__(rooms=rooms, attached_washroom=attached_washroom, rl_agent=rl_agent,
+                         elite_count=elite_count, stall_generations=stall_generations)
+        if population_size is not None:
+            self.POPULATION_SIZE = population_size
+        if generations is not None:
+            self.GENERATIONS = generations
+        # Seeded from `random` so random.seed() makes both engines reproducible.
+        self.rng = np.random.default_rng(random.getrandbits(64))
+        # genes bytes -> layout_violations(), reset every run
+        self._layout_cache = {}
+
+    def to_array(self, population):
+        """
+        List of floorplan dicts -> (genes[pop, rooms, 4], attached[pop, rooms]).
+        """
+        genes = np.array(
+            [[[fp[r]["x"], fp[r]["y"], fp[r]["width"], fp[r]["height"]] for r in self.rooms]
+             for fp in population],
+            dtype=np.int64,
+        ).reshape(len(population), len(self.rooms), 4)
+        attached = np.array(
+            [[fp[r].get("has_washroom_attached", False) for r in self.rooms] for fp in population],
+            dtype=bool,
+        ).reshape(len(population), len(self.rooms))
+        return genes, attached
+
+    def to_dict(self, genes, attached):
+        """
+        One individual's (rooms, 4) genes -> floorplan dict.
+        """
+        floorplan = {}
+        for i, room in enumerate(self.rooms):
+            x, y, w, h = (int(v) for v in genes[i])
+            rect = {"x": x, "y": y, "width": w, "height": h}
+            if attached[i]:
+                rect["has_washroom_attached"] = True
+            floorplan[room] = rect
+        return floorplan
+
+    def fitness(self, genes):
+        """
+        Penalized fitness for every individual: (pop, rooms, 4) -> (pop,).
+        Total room area minus PENALTY_WEIGHT per broken placement rule, with the
+        pairwise rule checks evaluated for the whole population at once.
+        """
+        area = (genes[..., W] * genes[..., H]).sum(axis=-1)
+        violations = self.constraints.violations(genes)
+        # layout check (connectivity / one living room) only for rule-abiding plans
+        no_flags = np.zeros(genes.shape[1], dtype=bool)
+        for i in np.flatnonzero(violations == 0):
+            key = genes[i].tobytes()
+            bad = self._layout_cache.get(key)
+            if bad is None:
+                bad = self.layout_violations(self.to_dict(genes[i], no_flags))
+                self._layout_cache[key] = bad
+            violations[i] += bad
+        return area - self.PENALTY_WEIGHT * violations
+
+    def tournament_selection(self, scores, count, tournament_size=3):
+        """
+        Run `count` tournaments at once; return the winners' population indices.
+        Participants are drawn without replacement within each tournament.
+        """
+        pop = scores.shape[0]
+        size = min(tournament_size, pop)
+        participants = self.rng.integers(0, pop, size=(count, size))
+        # redraw tournaments that picked someone twice (rare once pop >> size)
+        while True:
+            ordered = np.sort(participants, axis=1)
+            dup = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+            if not dup.any():
+                break
+            participants[dup] = self.rng.integers(0, pop, size=(int(dup.sum()), size))
+        winners = np.argmax(scores[participants], axis=1)
+        return participants[np.arange(count), winners]
+
+    def crossover(self, genes, attached, parents1, parents2):
+        """
+        For each child and room, take the gene of parent1 or parent2 with p=0.5.
+        """
+        take_first = self.rng.random((parents1.shape[0], genes.shape[1])) < 0.5
+        child_genes = np.where(take_first[..., None], genes[parents1], genes[parents2])
+        child_attached = np.where(take_first, attached[parents1], attached[parents2])
+        return child_genes, child_attached
+
+    def mutate(self, genes, mutation_rate):
+        """
+        Perturb x, y, width, height of each room by -1..1 with p=mutation_rate,
+        then clamp to the floor boundary exactly like FloorplanGenerator.
+        """
+        hit = self.rng.random(genes.shape[:2]) < mutation_rate
+        deltas = self.rng.integers(-1, 2, size=genes.shape)
+        mutated = genes + deltas * hit[..., None]
+
+        # Enforce boundaries (only rooms that mutated can leave the floor).
+        mutated[..., X] = np.maximum(mutated[..., X], 0)
+        mutated[..., Y] = np.maximum(mutated[..., Y], 0)
+        mutated[..., W] = np.where(mutated[..., X] + mutated[..., W] > self.FLOORPLAN_WIDTH,
+                                   self.FLOORPLAN_WIDTH - mutated[..., X], mutated[..., W])
+        mutated[..., H] = np.where(mutated[..., Y] + mutated[..., H] > self.FLOORPLAN_HEIGHT,
+                                   self.FLOORPLAN_HEIGHT - mutated[..., Y], mutated[..., H])
+        return np.where(hit[..., None], mutated, genes)
+
+    def genetic_algorithm(self, on_generation=None):
+        """
+        Array version of FloorplanGenerator.genetic_algorithm, with the same
+        ELITE_COUNT / STALL_GENERATIONS behaviour and on_generation stats.
+        Fitness is one vectorized call per generation; only the layout check is
+        cached, so cache_hits is always reported as 0.
+        """
+        self.last_run_stats = []
+        self._layout_cache = {}
+        population = self.initialize_population()
+        if not population:
+            return {}
+        mutation_rate = self.rl_agent.get_mutation_rate() if self.rl_agent is not None else self.MUTATION_RATE
+
+        genes, attached = self.to_array(population)
+        scores = self.fitness(genes)
+        elite_count = min(self.ELITE_COUNT, self.POPULATION_SIZE)
+        best_so_far = None
+        stalled = 0
+        for generation in range(self.GENERATIONS):
+            start = time.perf_counter()
+            elites = np.argsort(-scores, kind="stable")[:elite_count]
+            children = self.POPULATION_SIZE - elite_count
+            parents1 = self.tournament_selection(scores, children)
+            parents2 = self.tournament_selection(scores, children)
+            child_genes, child_attached = self.crossover(genes, attached, parents1, parents2)
+            child_genes = self.mutate(child_genes, mutation_rate)
+            genes = np.concatenate([genes[elites], child_genes])
+            attached = np.concatenate([attached[elites], child_attached])
+            scores = self.fitness(genes)
+
+            best = int(scores.max())
+            elapsed = time.perf_counter() - start
+            stats = {
+                "generation": generation + 1,
+                "best": best,
+                "mean": float(scores.mean()),
+                "evaluations": len(scores),
+                "cache_hits": 0,
+                "cache_hit_rate": 0.0,
+                "evals_per_sec": len(scores) / elapsed if elapsed > 0 else 0.0,
+            }
+            self.last_run_stats.append(stats)
+            if on_generation is not None:
+                on_generation(stats)
+
+            if best_so_far is None or best > best_so_far:
+                best_so_far = best
+                stalled = 0
+            else:
+                stalled += 1
+            if self.STALL_GENERATIONS and stalled >= self.STALL_GENERATIONS:
+                break
+
+        best = int(np.argmax(scores))
+        return self.to_dict(genes[best], attached[best])
@@ -0,0 +1,255 @@
+# batch_generation.py
+#
+# Spread floorplan generation and rendering over a process pool.
+# Every plan gets its own seed derived from (base_seed, index), so a batch is
+# reproducible for a given base seed no matter how many workers run it, and
+# results always come back in index order.
+#
+#   python batch_generation.py --num-floorplans 400 --sweep 1,2,4,8
+#   python batch_generation.py --render-dir /tmp/plans --renderer raster
+
+import os
+import time
+import random
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from .floorplan_generator import FloorplanGenerator
+    from .array_genetic_algorithm import ArrayFloorplanGenerator
+    from .raster_renderer import RENDERERS
+    from .workspace import atomic_write_json
+except ImportError:
+    from floorplan_generator import FloorplanGenerator
+    from array_genetic_algorithm import ArrayFloorplanGenerator
+    from raster_renderer import RENDERERS
+    from workspace import atomic_write_json
+
+# GA engines selectable by name (names survive pickling to worker processes)
+ENGINES = {
+    "dict": FloorplanGenerator,
+    "array": ArrayFloorplanGenerator,
+}
+
+
+def plan_seed(base_seed, index):
+    """
+    Deterministic per-plan seed. Independent of the worker that runs it.
+    """
+    return (base_seed * 1000003 + index) % (2 ** 32)
+
+
+def _seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _generate_task(task):
+    """
+    Worker entry point: (index, seed, rooms, attached_washroom, engine) -> (index, floorplan_dict).
+    """
+    index, seed, rooms, attached_washroom, engine = task
+    _seed_everything(seed)
+    generator = ENGINES[engine](rooms=rooms, attached_washroom=attached_washroom)
+    return index, generator.genetic_algorithm()
+
+
+def _task_renderer(renderer, cache_dir):
+    """
+    Renderer for a worker; the cache is reopened by path (it is just a directory).
+    :return: (renderer, PlanCache or None)
+    """
+    try:
+        from .raster_renderer import get_renderer
+        from .plan_cache import PlanCache
+    except ImportError:
+        from raster_renderer import get_renderer
+        from plan_cache import PlanCache
+    cache = PlanCache(cache_dir) if cache_dir else None
+    return get_renderer(renderer, cache=cache), cache
+
+
+def _render_counts(cache):
+    if cache is None:
+        return 0, 0
+    return cache.hits.get("render", 0), cache.misses.get("render", 0)
+
+
+def _render_task(task):
+    """
+    Worker entry point: render one plan to PNG and write its JSON next to it.
+    """
+    base_name, fp_dict, output_dir, width, height, renderer, cache_dir = task
+    png_path = os.path.join(output_dir, base_name + ".png")
+    json_path = os.path.join(output_dir, base_name + ".json")
+    visualizer, cache = _task_renderer(renderer, cache_dir)
+    visualizer.plot_with_boundaries(fp_dict, png_path, width, height)
+    atomic_write_json(json_path, fp_dict)
+    return base_name, _render_counts(cache)
+
+
+def _render_image_task(task):
+    """
+    Worker entry point: render one plan in memory and return the BGR image.
+    """
+    fp_dict, width, height, renderer, cache_dir = task
+    visualizer, cache = _task_renderer(renderer, cache_dir)
+    return visualizer.render(fp_dict, width, height), _render_counts(cache)
+
+
+def _merge_counts(cache, results):
+    """
+    Fold the workers' render hit/miss counts into the caller's cache.
+    """
+    if cache is None:
+        return
+    for _, (hits, misses) in results:
+        cache.add_counts("render", hits, misses)
+
+
+def _chunksize(num_tasks, workers):
+    # a few chunks per worker keeps the pool busy without per-task IPC overhead
+    return max(1, num_tasks // (workers * 4))
+
+
+def _run(func, tasks, workers):
+    if workers <= 1:
+        return [func(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order => stable output ordering
+        return list(pool.map(func, tasks, chunksize=_chunksize(len(tasks), workers)))
+
+
+class BatchStats:
+    """
+    Wall-clock throughput of one batch stage.
+    """
+
+    def __init__(self, stage, count, workers, seconds):
+        self.stage = stage
+        self.count = count
+        self.workers = workers
+        self.seconds = seconds
+
+    @property
+    def plans_per_sec(self):
+        return self.count / self.seconds if self.seconds > 0 else float("inf")
+
+    def __str__(self):
+        return (f"{self.stage}: {self.count} plans in {self.seconds:.2f}s "
+                f"with {self.workers} worker(s) => {self.plans_per_sec:.1f} plans/sec")
+
+
+def generate_plans(rooms, attached_washroom=False, num_floorplans=40, workers=1, base_seed=0,
+                   engine="dict"):
+    """
+    Run `num_floorplans` independent genetic_algorithm() calls over `workers` processes.
+    :param engine: "dict" (FloorplanGenerator) or "array" (ArrayFloorplanGenerator).
+    :return: ([(base_name, floorplan_dict), ...] in index order, BatchStats)
+    """
+    tasks = [(i, plan_seed(base_seed, i), list(rooms), attached_washroom, engine)
+             for i in range(num_floorplans)]
+    start = time.perf_counter()
+    results = _run(_generate_task, tasks, workers)
+    stats = BatchStats("generate", len(tasks), workers, time.perf_counter() - start)
+    named = [(f"floorplan_{index+1}", plan) for index, plan in results]
+    return named, stats
+
+
+def iter_plans(rooms, attached_washroom=False, num_floorplans=40, workers=1, base_seed=0,
+               engine="dict", window=None):
+    """
+    generate_plans() as a generator: yields (base_name, floorplan_dict) in index
+    order as soon as each GA run finishes, with at most `window` runs in flight
+    (default 2 per worker), so memory does not grow with num_floorplans.
+    Same seeds => same plans as generate_plans().
+    """
+    tasks = ((i, plan_seed(base_seed, i), list(rooms), attached_washroom, engine)
+             for i in range(num_floorplans))
+    if workers <= 1:
+        for task in tasks:
+            index, plan = _generate_task(task)
+            yield f"floorplan_{index+1}", plan
+        return
+
+    window = window or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_generate_task, task) for _, task in zip(range(window), tasks))
+        try:
+            while pending:
+                index, plan = pending.popleft().result()
+                task = next(tasks, None)
+                if task is not None:
+                    pending.append(pool.submit(_generate_task, task))
+                yield f"floorplan_{index+1}", plan
+        finally:
+            # the consumer may stop early: drop the runs nobody will read
+            for future in pending:
+                future.cancel()
+
+
+def render_plans(named_plans, output_dir, width, height, workers=1, renderer="matplotlib",
+                 cache=None):
+    """
+    Render [(base_name, floorplan_dict), ...] into output_dir (PNG + JSON).
+    :param renderer: "matplotlib" (FloorplanVisualizer) or "raster" (RasterFloorplanRenderer).
+    :param cache: optional PlanCache to reuse earlier renders from; its "render"
+                  counters include the lookups made by the workers.
+    :return: BatchStats
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_dir = cache.root if cache is not None else None
+    tasks = [(name, plan, output_dir, width, height, renderer, cache_dir)
+             for name, plan in named_plans]
+    start = time.perf_counter()
+    _merge_counts(cache, _run(_render_task, tasks, workers))
+    return BatchStats("render", len(tasks), workers, time.perf_counter() - start)
+
+
+def render_images(named_plans, width, height, workers=1, renderer="matplotlib", cache=None):
+    """
+    Render [(base_name, floorplan_dict), ...] in memory (only the cache touches the disk).
+    :return: ([BGR image, ...] in input order, BatchStats)
+    """
+    cache_dir = cache.root if cache is not None else None
+    tasks = [(plan, width, height, renderer, cache_dir) for _, plan in named_plans]
+    start = time.perf_counter()
+    results = _run(_render_image_task, tasks, workers)
+    _merge_counts(cache, results)
+    images = [img for img, _ in results]
+    return images, BatchStats("render", len(tasks), workers, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batch generation throughput.")
+    parser.add_argument("--num-floorplans", type=int, default=200)
+    parser.add_argument("--sweep", default="1,2,4",
+                        help="Comma-separated worker counts to measure.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="dict")
+    parser.add_argument("--render-dir", default=None,
+                        help="Also render the plans into this directory and time it.")
+    parser.add_argument("--renderer", choices=RENDERERS, default="matplotlib")
+    args = parser.parse_args()
+
+    rooms = ["Bedroom_1", "Bedroom_2", "Washroom_1", "Washroom_2", "Kitchen", "Garage"]
+    reference = None
+    for workers in [int(w) for w in args.sweep.split(",")]:
+        plans, stats = generate_plans(rooms, True, args.num_floorplans, workers, args.seed,
+                                      args.engine)
+        if reference is None:
+            reference = plans
+        elif plans != reference:
+            print("WARNING: results differ between worker counts.")
+        print(stats)
+
+    if args.render_dir:
+        for workers in [int(w) for w in args.sweep.split(",")]:
+            print(render_plans(reference, args.render_dir, 20, 20, workers, args.renderer))
+
+
+if __name__ == "__main__":
+    main()
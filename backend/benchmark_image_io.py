@@ -0,0 +1,125 @@
+# benchmark_image_io.py
+#
+# Wall time of the disk-based stages on a directory of a few thousand plans,
+# with 1 (inline) and more image_io threads. The images are copies of the
+# renders in image_dir; the outputs of every thread count are checked to be
+# byte-identical to the inline run.
+#
+#   python benchmark_image_io.py [image_dir] [--count 2000] [--workers 1 2 4 8]
+
+import os
+import sys
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+from image_io import list_images, map_ordered
+from room_type_detector import RoomTypeDetector
+from perfect_plan_selector import PerfectPlanSelector
+from pretty_floorplan_maker import PrettyFloorplanMaker
+from first_floor_enhancer import FirstFloorEnhancer
+
+
+def make_plan_dir(image_dir, count, target):
+    """
+    Fill target with `count` copies of the images (and JSONs) in image_dir.
+    """
+    names = sorted(list_images(image_dir))
+    os.makedirs(target, exist_ok=True)
+    for i in range(count):
+        name = names[i % len(names)]
+        base = os.path.splitext(name)[0]
+        shutil.copyfile(os.path.join(image_dir, name), os.path.join(target, f"plan_{i}.png"))
+        json_path = os.path.join(image_dir, base + ".json")
+        if os.path.exists(json_path):
+            shutil.copyfile(json_path, os.path.join(target, f"plan_{i}.json"))
+    return target
+
+
+def digest(directory):
+    h = hashlib.sha1()
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            h.update(name.encode() + f.read())
+    return h.hexdigest()
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run_stages(plans, work, workers):
+    """
+    :return: {stage: (seconds, digest of its output)}
+    """
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        results = {}
+
+        # Detector pass 1 over every file (selection stops early, the scan is the I/O)
+        detector = RoomTypeDetector(plans, os.path.join(work, "finaloutput"), workers=workers)
+        handles = []
+        seconds = timed(lambda: handles.extend(
+            map_ordered(detector._score_file, list_images(plans), workers)))
+        results["detector scan"] = (seconds, hashlib.sha1(
+            repr([(h.filename, h.living_rooms) for h in handles]).encode()).hexdigest())
+
+        selector = PerfectPlanSelector(plans, os.path.join(work, "perfect"), workers=workers)
+        results["selector"] = (timed(selector.select_connected_plans), digest(selector.output_dir))
+
+        # The porch label position is drawn with random.choice
+        random.seed(0)
+        maker = PrettyFloorplanMaker(plans, os.path.join(work, "pretty"), workers=workers)
+        results["prettifier"] = (timed(maker.make_pretty_floorplans), digest(maker.output_dir))
+
+        # The enhancer rewrites its folder in place: give it a fresh copy of the pretty output
+        floor1 = os.path.join(work, "output_floor1")
+        shutil.copytree(maker.output_dir, floor1)
+        reference = sorted(list_images(maker.output_dir))[0]
+        enhancer = FirstFloorEnhancer(maker.output_dir, floor1, workers=workers)
+        seconds = timed(lambda: enhancer.enhance_first_floor_plans(reference))
+        results["enhancer"] = (seconds, digest(floor1))
+        return results
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark threaded image I/O in the stages.")
+    parser.add_argument("image_dir", nargs="?",
+                        default=os.path.join(os.path.dirname(__file__), "..", "frontend", "output"))
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    if not list_images(args.image_dir):
+        print(f"No images found in {args.image_dir}.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plans = make_plan_dir(args.image_dir, args.count, os.path.join(tmp, "plans"))
+        print(f"{args.count} plans from {args.image_dir}")
+        baseline = None
+        for workers in args.workers:
+            work = os.path.join(tmp, f"w{workers}")
+            results = run_stages(plans, work, workers)
+            baseline = baseline or results
+            line = " | ".join(f"{stage} {seconds:6.2f}s" for stage, (seconds, _) in results.items())
+            total = sum(seconds for seconds, _ in results.values())
+            print(f"{workers:2d} thread(s): {line} | total {total:6.2f}s")
+            for stage, (_, out) in results.items():
+                if out != baseline[stage][1]:
+                    print(f"Output of {stage} differs from the {args.workers[0]}-thread run.")
+                    sys.exit(1)
+    print("Outputs identical for every thread count.")
+
+
+if __name__ == "__main__":
+    main()
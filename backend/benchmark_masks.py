@@ -0,0 +1,77 @@
+# benchmark_masks.py
+#
+# Per-image latency of living-mask extraction: the old per-pixel Python loop
+# vs. the vectorized plan_masks module, on the stock renders and on 4x upscales.
+#
+#   python benchmark_masks.py [image_dir] [--limit N]
+
+import os
+import sys
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from plan_masks import compute_plan_masks, floorplan_mask
+
+
+def legacy_living_mask(image):
+    """
+    The nested-loop living mask the selector/prettifier/enhancer used to build.
+    """
+    h, w = image.shape[:2]
+    floor_mask = floorplan_mask(image)
+    living_mask = np.zeros((h, w), dtype=np.uint8)
+    if floor_mask is None:
+        return living_mask
+    for y in range(h):
+        for x in range(w):
+            if floor_mask[y, x] == 255:
+                b, g, r = image[y, x]
+                if b >= 240 and g >= 240 and r >= 240:
+                    living_mask[y, x] = 255
+    return living_mask
+
+
+def time_per_image(func, images):
+    start = time.perf_counter()
+    for img in images:
+        func(img)
+    return (time.perf_counter() - start) / len(images) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark living-mask extraction.")
+    parser.add_argument("image_dir", nargs="?",
+                        default=os.path.join(os.path.dirname(__file__), "..", "output"))
+    parser.add_argument("--limit", type=int, default=5,
+                        help="Number of images per size (the legacy loop is slow).")
+    parser.add_argument("--scale", type=int, default=4)
+    args = parser.parse_args()
+
+    names = sorted(f for f in os.listdir(args.image_dir) if f.lower().endswith(".png"))
+    images = [cv2.imread(os.path.join(args.image_dir, f)) for f in names[:args.limit]]
+    images = [img for img in images if img is not None]
+    if not images:
+        print(f"No images found in {args.image_dir}.")
+        sys.exit(1)
+
+    upscaled = [cv2.resize(img, None, fx=args.scale, fy=args.scale,
+                           interpolation=cv2.INTER_NEAREST) for img in images]
+
+    for label, batch in (("stock", images), (f"{args.scale}x upscaled", upscaled)):
+        # Sanity check: both implementations must agree pixel for pixel.
+        for img in batch:
+            if not np.array_equal(legacy_living_mask(img), compute_plan_masks(img).living_mask):
+                print(f"Mismatch between legacy and vectorized masks ({label}).")
+                sys.exit(1)
+        h, w = batch[0].shape[:2]
+        before = time_per_image(legacy_living_mask, batch)
+        after = time_per_image(compute_plan_masks, batch)
+        print(f"{label:>14} {w}x{h}: loop {before:9.2f} ms/img | "
+              f"vectorized {after:7.2f} ms/img | speedup {before / after:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# first_floor_batch.py
+#
+# First-floor options for many ground-floor plans at once: `variants` runs of
+# every FirstFloorPlanGenerator approach per ground plan, spread over a process
+# pool. Each ground plan is prepared once (room dict, stairs) for all of its
+# variants, and identical ground plans are only worked on once.
+# Every variant draws from its own seed derived from (base_seed, ground plan,
+# approach, variant), so the options of a plan do not depend on the batch it
+# comes in or on the worker count. Options that come out identical (same
+# plan_hash) are kept once.
+# Ground plans given as PlanDocuments hand their stairs (pixels) and
+# "Living Room" label on to every option, for the first floor's document;
+# the generated room dicts themselves stay in plan units.
+#
+#   python first_floor_batch.py pretty --variants 5 --workers 4
+#   python first_floor_batch.py pretty --render-dir /tmp/floor1 --renderer raster
+
+import os
+import time
+import random
+import argparse
+
+try:
+    from .first_floor_plan_generator import FirstFloorPlanGenerator
+    from .batch_generation import BatchStats, plan_seed, render_plans, _run
+    from .plan_hashing import plan_hash
+    from .plan_document import DOCUMENT_SUFFIX, PlanDocument, read_document, write_document
+    from .raster_renderer import RENDERERS
+except ImportError:
+    from first_floor_plan_generator import FirstFloorPlanGenerator
+    from batch_generation import BatchStats, plan_seed, render_plans, _run
+    from plan_hashing import plan_hash
+    from plan_document import DOCUMENT_SUFFIX, PlanDocument, read_document, write_document
+    from raster_renderer import RENDERERS
+
+APPROACHES = (1, 2, 3)
+
+# Labels of the ground floor that hold on the first floor (same stairwell and hall)
+SHARED_LABELS = ("Living Room",)
+
+
+def ground_seed(base_seed, ground_plan):
+    """
+    Seed of one ground plan: depends on its content, not on its position in a batch.
+    """
+    return plan_seed(base_seed, int(plan_hash(ground_plan)[:8], 16))
+
+
+def option_suffix(approach, variant, variants):
+    """
+    "approach2" with one variant per approach (the names main.py always used),
+    "approach2_v3" otherwise.
+    """
+    return f"approach{approach}" if variants == 1 else f"approach{approach}_v{variant}"
+
+
+def first_floor_options(ground_plan, width, height, approaches=APPROACHES, variants=1,
+                        base_seed=0, source_image_path=None):
+    """
+    All distinct first-floor plans of one ground plan, approach by approach.
+    :param ground_plan: flat room dict, or the ground floor's PlanDocument.
+    :return: [{"suffix", "approach", "variant", "plan_hash", "plan"}, ...]; with a
+             document also "stairs" and "labels" for the option's own document.
+    """
+    document = ground_plan if isinstance(ground_plan, PlanDocument) else None
+    if document is not None:
+        ground_plan = document.rooms
+    generator = FirstFloorPlanGenerator(ground_plan, width, height, source_image_path)
+    seed = ground_seed(base_seed, ground_plan)
+    seen = set()
+    options = []
+    for approach in approaches:
+        for variant in range(1, variants + 1):
+            rng = random.Random(plan_seed(seed, approach * 1000 + variant))
+            plan = generator.generate_first_floor_plan(approach=approach, rng=rng)
+            key = plan_hash(plan)
+            if key in seen:
+                continue
+            seen.add(key)
+            option = {
+                "suffix": option_suffix(approach, variant, variants),
+                "approach": approach,
+                "variant": variant,
+                "plan_hash": key,
+                "plan": plan,
+            }
+            if document is not None:
+                option["stairs"] = document.stairs
+                option["labels"] = {text: document.labels[text]
+                                    for text in SHARED_LABELS if text in document.labels}
+            options.append(option)
+    return options
+
+
+def option_document(option, ground_plan_hash=None):
+    """
+    PlanDocument of one first-floor option: its rooms, plus the ground floor's
+    stairs and shared labels when the option came from a ground-floor document.
+    """
+    document = PlanDocument(option["plan"], stairs=option.get("stairs"),
+                            labels=option.get("labels"))
+    document.add_provenance("output_floor1", approach=option["approach"],
+                            variant=option["variant"], ground_plan=ground_plan_hash)
+    return document
+
+
+def _options_task(task):
+    """
+    Worker entry point: (ground_plan, width, height, approaches, variants, base_seed,
+    source_image_path) -> options.
+    """
+    return first_floor_options(*task)
+
+
+def generate_first_floor_batch(named_ground_plans, width, height, approaches=APPROACHES,
+                               variants=1, workers=1, base_seed=0, source_images=None):
+    """
+    First-floor options for every ground plan.
+    :param named_ground_plans: [(base_name, ground_floor_dict or PlanDocument), ...]
+    :param source_images: optional {base_name: PNG path} to read the stairs from
+                          when a ground plan has no "Stairs" entry.
+    :return: ({base_name: [option, ...]}, BatchStats); every option also gets
+             "name" = <base_name>_<suffix>.
+    """
+    named_ground_plans = list(named_ground_plans)
+    source_images = source_images or {}
+
+    # identical ground plans (and stairs sources) => one task
+    tasks = {}
+    keys = []
+    for base_name, ground_plan in named_ground_plans:
+        source = source_images.get(base_name)
+        if isinstance(ground_plan, PlanDocument):
+            key = (plan_hash(ground_plan.rooms), source,
+                   plan_hash({"stairs": ground_plan.stairs, "labels": ground_plan.labels}))
+        else:
+            key = (plan_hash(ground_plan), source, None)
+        if key not in tasks:
+            tasks[key] = (ground_plan, width, height, tuple(approaches), variants, base_seed, source)
+        keys.append(key)
+
+    start = time.perf_counter()
+    results = dict(zip(tasks, _run(_options_task, list(tasks.values()), workers)))
+    batch = {}
+    for (base_name, _), key in zip(named_ground_plans, keys):
+        batch[base_name] = [dict(option, name=f"{base_name}_{option['suffix']}")
+                            for option in results[key]]
+    count = sum(len(options) for options in batch.values())
+    return batch, BatchStats("first floor", count, workers, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate first-floor options for many ground plans.")
+    parser.add_argument("plans_dir", help="Folder of ground-floor plan JSONs (e.g. 'pretty').")
+    parser.add_argument("--variants", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=20)
+    parser.add_argument("--height", type=int, default=20)
+    parser.add_argument("--render-dir", default=None,
+                        help="Also render every option (PNG + JSON) into this folder.")
+    parser.add_argument("--renderer", choices=RENDERERS, default="raster")
+    args = parser.parse_args()
+
+    # Ground plans as documents: stairs from the sidecar, or recovered from the PNG
+    named = []
+    for fname in sorted(os.listdir(args.plans_dir)):
+        if not fname.lower().endswith(".json") or fname.endswith(DOCUMENT_SUFFIX):
+            continue
+        base_name = os.path.splitext(fname)[0]
+        named.append((base_name, read_document(args.plans_dir, base_name)))
+    if not named:
+        print(f"No plan JSONs found in {args.plans_dir}.")
+        return
+
+    batch, stats = generate_first_floor_batch(named, args.width, args.height,
+                                              variants=args.variants, workers=args.workers,
+                                              base_seed=args.seed)
+    possible = len(named) * len(APPROACHES) * args.variants
+    print(f"{len(named)} ground plans -> {stats.count} distinct first-floor options "
+          f"({possible - stats.count} duplicates dropped)")
+    print(stats)
+
+    if args.render_dir:
+        options = [option for opts in batch.values() for option in opts]
+        print(render_plans([(option["name"], option["plan"]) for option in options],
+                           args.render_dir, args.width, args.height,
+                           workers=args.workers, renderer=args.renderer))
+        for option in options:
+            write_document(args.render_dir, option["name"], option_document(option))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,155 +1,265 @@
 import os
 import cv2
 import json
-import numpy as np
+import time
+
+try:
+    from .plan_masks import floorplan_mask
+    from .plan_regions import compute_plan_regions
+    from .plan_record import PlanRecord
+    from .plan_document import PORCH_HEX, PlanDocument, find_stairs, read_document, document_path
+    from .batch_generation import BatchStats
+    from .image_io import ImageWriter, list_images, map_ordered
+    from .workspace import stage_dir
+except ImportError:
+    from plan_masks import floorplan_mask
+    from plan_regions import compute_plan_regions
+    from plan_record import PlanRecord
+    from plan_document import PORCH_HEX, PlanDocument, find_stairs, read_document, document_path
+    from batch_generation import BatchStats
+    from image_io import ImageWriter, list_images, map_ordered
+    from workspace import stage_dir
 
 class FirstFloorEnhancer:
     """
     This class uses the reference first-floor plan (from the 'pretty' folder)
-    to detect the stairs region and living room centroid. It then processes all
+    to get the stairs region and living room centroid, from its plan document
+    (detected in the pixels only for a plan without one). It then processes all
     first-floor plan images in 'output_floor1' by drawing the same stairs (with
     the same size, shape, and position) and placing a "Living Room" label in the
-    inner area. It also updates the corresponding JSON files.
+    inner area. It also updates the corresponding JSON files and plan documents.
     Additionally, the area outside the black boundary is filled with the background
     color FBF5F1.
+    The reference features are worked out once per reference file (and kept
+    until it changes); the first-floor plans are enhanced on `workers` threads,
+    and the time each one took is kept in self.timings.
     """
-    
-    def __init__(self, pretty_dir="pretty", first_floor_dir="output_floor1"):
-        self.pretty_dir = pretty_dir
-        self.first_floor_dir = first_floor_dir
+
+    def __init__(self, pretty_dir="pretty", first_floor_dir="output_floor1", workspace=None,
+                 workers=1):
+        # With a workspace the folders are stages inside it
+        self.pretty_dir = stage_dir(pretty_dir, workspace)
+        self.first_floor_dir = stage_dir(first_floor_dir, workspace)
+        # Threads decoding, drawing and writing (see image_io)
+        self.workers = workers
         # The stairs are drawn in this color (BGR)
         self.stairs_color = (200, 100, 200)
         self.stairs_tol = 10  # tolerance for color detection
         self.living_label = "Living Room"
         # Background color for areas outside the floorplan (hex FBF5F1 => BGR: (241,245,251))
         self.porch_color = (241, 245, 251)
-    
+        # {reference path: (file stamps, (stairs_rect, living_centroid))}
+        self._references = {}
+        # [(filename, seconds)] of the last run, and its BatchStats
+        self.timings = []
+        self.stats = None
+
     def detect_stairs(self, img):
         """
         Detect the stairs region in the provided image by color thresholding.
-        Returns a bounding rectangle (x, y, w, h) if found, else None.
-        """
-        lower = np.array([self.stairs_color[0] - self.stairs_tol,
-                          self.stairs_color[1] - self.stairs_tol,
-                          self.stairs_color[2] - self.stairs_tol])
-        upper = np.array([self.stairs_color[0] + self.stairs_tol,
-                          self.stairs_color[1] + self.stairs_tol,
-                          self.stairs_color[2] + self.stairs_tol])
-        mask = cv2.inRange(img, lower, upper)
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not contours:
-            return None
-        c = max(contours, key=cv2.contourArea)
-        if cv2.contourArea(c) < 10:
+        Returns the rectangle (x, y, w, h) it was drawn with (corners (x, y) and
+        (x + w, y + h), like the plan document stores it) if found, else None.
+        """
+        stairs = find_stairs(img, self.stairs_color, self.stairs_tol)
+        if stairs is None:
             return None
-        x, y, w, h = cv2.boundingRect(c)
-        return (x, y, w, h)
-    
-    def detect_living_area_centroid(self, img):
+        return stairs["x"], stairs["y"], stairs["width"], stairs["height"]
+
+    def detect_living_area_centroid(self, img, regions=None):
         """
         Detect the largest white region (living area) inside the floorplan.
         Returns the centroid (cx, cy) or None if not found.
+        :param regions: PlanRegions of img if already computed (in-memory mode).
         """
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, bin_img = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-        contours, _ = cv2.findContours(bin_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not contours:
-            return None
-        largest = max(contours, key=cv2.contourArea)
-        floor_mask = np.zeros_like(gray)
-        cv2.drawContours(floor_mask, [largest], -1, 255, -1)
-        living_mask = np.zeros_like(gray)
-        h, w = gray.shape
-        for y in range(h):
-            for x in range(w):
-                if floor_mask[y, x] == 255:
-                    b, g, r = img[y, x]
-                    if b >= 240 and g >= 240 and r >= 240:
-                        living_mask[y, x] = 255
-        living_contours, _ = cv2.findContours(living_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not living_contours:
+        if regions is None:
+            regions = compute_plan_regions(img)
+        largest = regions.largest_living()
+        if largest is None:
             return None
-        living = max(living_contours, key=cv2.contourArea)
-        M = cv2.moments(living)
-        if M["m00"] == 0:
-            return None
-        cx = int(M["m10"] / M["m00"])
-        cy = int(M["m01"] / M["m00"])
-        return (cx, cy)
-    
+        return regions.living.centroid(largest)
+
     def _get_floorplan_mask(self, img):
         """
         Computes the floorplan mask from the given image.
         It thresholds the grayscale image and returns the filled mask of the largest contour.
         """
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, black_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-        contours, _ = cv2.findContours(black_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not contours:
-            return None
-        largest = max(contours, key=cv2.contourArea)
-        mask = np.zeros_like(black_mask)
-        cv2.drawContours(mask, [largest], -1, 255, -1)
-        return mask
+        return floorplan_mask(img)
 
-    def enhance_first_floor_plans(self, ref_plan_filename):
+    def reference_features(self, ref_plan_filename):
         """
-        Using the reference plan filename (e.g. "plan1.png") from the 'pretty' folder,
-        detect the stairs region and living area centroid. Then, for each first-floor
-        plan image in self.first_floor_dir, draw the same stairs rectangle and add the
-        "Living Room" label. Also, fill the area outside the floorplan with the porch
-        color FBF5F1 and update the corresponding JSON file accordingly.
+        (stairs_rect, living_centroid) of the reference plan (e.g. "plan1.png") in
+        the 'pretty' folder: from its plan document, detecting whichever is missing
+        in the image. Cached until the image, JSON or document file changes.
+        :return: the pair, or None (with the reason printed) if either can't be found.
         """
         ref_path = os.path.join(self.pretty_dir, ref_plan_filename)
-        ref_img = cv2.imread(ref_path)
-        if ref_img is None:
-            print(f"Reference image {ref_path} not found.")
-            return
-        stairs_rect = self.detect_stairs(ref_img)
-        living_centroid = self.detect_living_area_centroid(ref_img)
+        ref_base = os.path.splitext(ref_plan_filename)[0]
+        stamps = tuple(_file_stamp(path) for path in (
+            ref_path, os.path.join(self.pretty_dir, ref_base + ".json"),
+            document_path(self.pretty_dir, ref_base)))
+        cached = self._references.get(ref_path)
+        if cached is not None and cached[0] == stamps:
+            return cached[1]
+
+        reference = read_document(self.pretty_dir, ref_base, recover=False) or PlanDocument()
+
+        def load_image():
+            img = cv2.imread(ref_path)
+            if img is None:
+                print(f"Reference image {ref_path} not found.")
+            return img, None
+
+        features = self._features(reference, load_image)
+        if features is not None:
+            self._references[ref_path] = (stamps, features)
+        return features
+
+    def _features(self, document, load_image):
+        """
+        (stairs_rect, living_centroid) from a reference document, decoding the
+        reference (load_image() -> (image, regions or None)) only if it lacks one.
+        """
+        stairs = document.stairs
+        stairs_rect = None
+        if stairs is not None:
+            stairs_rect = (stairs["x"], stairs["y"], stairs["width"], stairs["height"])
+        living_centroid = document.label(self.living_label)
+
+        if stairs_rect is None or living_centroid is None:
+            ref_img, regions = load_image()
+            if ref_img is None:
+                return None
+            if stairs_rect is None:
+                stairs_rect = self.detect_stairs(ref_img)
+            if living_centroid is None:
+                living_centroid = self.detect_living_area_centroid(ref_img, regions)
         if stairs_rect is None:
             print("Stairs not detected in the reference image.")
-            return
+            return None
         if living_centroid is None:
             print("Living area not detected in the reference image.")
+            return None
+        return stairs_rect, living_centroid
+
+    def enhance_first_floor_plans(self, ref_plan_filename):
+        """
+        Using the reference plan filename (e.g. "plan1.png") from the 'pretty' folder,
+        read the stairs region and living area centroid from its plan document
+        (detecting whichever is missing in the image). Then, for each first-floor
+        plan image in self.first_floor_dir, draw the same stairs rectangle and add the
+        "Living Room" label. Also, fill the area outside the floorplan with the porch
+        color FBF5F1 and update the corresponding JSON file and document accordingly.
+        """
+        features = self.reference_features(ref_plan_filename)
+        if features is None:
             return
-        print(f"Detected stairs at {stairs_rect} and living room centroid at {living_centroid} in reference.")
-        
-        # Process each first-floor plan image in first_floor_dir
-        for fname in os.listdir(self.first_floor_dir):
-            if not fname.lower().endswith(".png"):
-                continue
-            fp_path = os.path.join(self.first_floor_dir, fname)
-            img = cv2.imread(fp_path)
-            if img is None:
-                continue
-            # Draw the stairs rectangle using the same coordinates
-            x, y, w, h = stairs_rect
-            cv2.rectangle(img, (x, y), (x + w, y + h), self.stairs_color, -1)
-            label_x = x + (w // 2) - 10
-            label_y = y + (h // 2)
-            cv2.putText(img, "Stairs", (label_x, label_y),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
-            # Place the "Living Room" label at the detected centroid
-            cv2.putText(img, self.living_label, (living_centroid[0] - 20, living_centroid[1]),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
-            
-            # ----- New Code: Fill area outside floorplan with porch color -----
-            mask = self._get_floorplan_mask(img)
-            if mask is not None:
-                porch_mask = cv2.bitwise_not(mask)
-                img[porch_mask == 255] = self.porch_color
-            # ----- End New Code -----
-            
-            cv2.imwrite(fp_path, img)
-            print(f"Enhanced {fp_path}")
-            # Update JSON file with stairs info
-            base = os.path.splitext(fname)[0]
-            json_path = os.path.join(self.first_floor_dir, base + ".json")
-            if os.path.exists(json_path):
-                with open(json_path, "r") as jf:
-                    floor_dict = json.load(jf)
-                floor_dict["Stairs"] = {"x": x, "y": y, "width": w, "height": h}
-                with open(json_path, "w") as jf:
-                    json.dump(floor_dict, jf)
-                print(f"Updated JSON {json_path}")
+        print(f"Reference stairs at {features[0]} and living room centroid at {features[1]}.")
+
+        # Decode + draw + mask on `workers` threads; writes go behind, from this thread
+        start = time.perf_counter()
+        self.timings = []
+        names = list_images(self.first_floor_dir, extensions=(".png",))
+        enhanced = map_ordered(lambda fname: self._enhance_file(fname, features, ref_plan_filename),
+                               names, self.workers)
+        with ImageWriter(self.workers) as writer:
+            for record, seconds in enhanced:
+                if record is None:
+                    continue
+                fp_path = record.write(self.first_floor_dir, writer=writer)
+                self.timings.append((record.filename, seconds))
+                print(f"Enhanced {fp_path} in {seconds * 1000:.1f} ms")
+        self.stats = BatchStats("enhance", len(self.timings), self.workers,
+                                time.perf_counter() - start)
+        print(self.stats)
+
+    def enhance_records(self, records, reference):
+        """
+        In-memory mode: enhance first-floor PlanRecords after the reference pretty
+        PlanRecord (its document, else its pixels and shared regions).
+        Returns new records (image, plan with "Stairs", document); the input
+        records are left untouched. Per-plan times go to self.timings.
+        """
+        features = self._features(reference.plan_document(),
+                                  lambda: (reference.image, reference.regions()))
+        self.timings = []
+        if features is None:
+            return []
+        start = time.perf_counter()
+        enhanced = []
+        for record in records:
+            t0 = time.perf_counter()
+            plan = dict(record.plan) if record.plan is not None else None
+            document = record.plan_document().copy()
+            enhanced.append(self._enhance(record.filename, record.image.copy(), plan, document,
+                                          features, reference.filename))
+            self.timings.append((record.filename, time.perf_counter() - t0))
+        self.stats = BatchStats("enhance", len(enhanced), 1, time.perf_counter() - start)
+        return enhanced
+
+    def _enhance_file(self, fname, features, ref_plan_filename):
+        """
+        Decode and enhance one first-floor plan of self.first_floor_dir.
+        :return: (PlanRecord or None if unreadable, seconds)
+        """
+        start = time.perf_counter()
+        img = cv2.imread(os.path.join(self.first_floor_dir, fname))
+        if img is None:
+            return None, 0.0
+        base = os.path.splitext(fname)[0]
+        # The JSON is only rewritten where there is one; same for the document
+        plan = None
+        json_path = os.path.join(self.first_floor_dir, base + ".json")
+        if os.path.exists(json_path):
+            with open(json_path, "r") as jf:
+                plan = json.load(jf)
+        document = read_document(self.first_floor_dir, base, recover=False)
+        record = self._enhance(fname, img, plan, document, features, ref_plan_filename)
+        return record, time.perf_counter() - start
+
+    def _enhance(self, fname, img, plan, document, features, ref_plan_filename):
+        """
+        Draw the reference stairs + living label on one first-floor image (in
+        place), fill the porch, and put the stairs into its plan and document.
+        :return: PlanRecord(fname, plan, img) carrying the document
+        """
+        stairs_rect, living_centroid = features
+        # Draw the stairs rectangle using the same coordinates
+        x, y, w, h = stairs_rect
+        cv2.rectangle(img, (x, y), (x + w, y + h), self.stairs_color, -1)
+        label_x = x + (w // 2) - 10
+        label_y = y + (h // 2)
+        cv2.putText(img, "Stairs", (label_x, label_y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+        # Place the "Living Room" label at the reference centroid
+        cv2.putText(img, self.living_label, (living_centroid[0] - 20, living_centroid[1]),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+
+        # Fill area outside floorplan with porch color (one masked assignment)
+        mask = self._get_floorplan_mask(img)
+        if mask is not None:
+            img[mask == 0] = self.porch_color
+
+        # Stairs info for the JSON ...
+        stairs = {"x": x, "y": y, "width": w, "height": h}
+        if plan is not None:
+            plan["Stairs"] = stairs
+        # ... and the plan document with everything drawn here
+        if document is not None:
+            document.stairs = stairs
+            document.set_label(self.living_label, [living_centroid])
+            document.porch = dict(document.porch or {}, color=PORCH_HEX)
+            document.add_provenance("enhanced", reference=ref_plan_filename)
+        record = PlanRecord(fname, plan, img)
+        record.document = document
+        return record
+
+
+def _file_stamp(path):
+    """
+    (mtime_ns, size) of a file, or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
@@ -2,7 +2,11 @@
 
 import random
 import cv2
-import numpy as np
+
+try:
+    from .plan_document import find_stairs
+except ImportError:
+    from plan_document import find_stairs
 
 class FirstFloorPlanGenerator:
     """
@@ -23,6 +27,8 @@ class FirstFloorPlanGenerator:
         :param floor_height: Overall floor height.
         :param source_image_path: Optional; if provided and if base_floorplan lacks "Stairs",
                                   this PNG will be loaded to extract the stairs rectangle.
+        The base plan is prepared once: generate_first_floor_plan() can be called
+        any number of times (every approach, many variants) on the same generator.
         """
         self.floor_width = floor_width
         self.floor_height = floor_height
@@ -44,7 +50,8 @@ class FirstFloorPlanGenerator:
 
     def _extract_stairs_from_image(self, image_path):
         """
-        Load the image from the provided path and try to locate the stairs rectangle.
+        Load the image from the provided path and try to locate the stairs rectangle
+        (the pixel fallback for plans without a document, see plan_document.find_stairs).
         The stairs are drawn using the color (200, 100, 200) in BGR.
         A tolerance of ±10 is applied.
         Returns a dict {"x": x, "y": y, "width": w, "height": h} if found;
@@ -53,37 +60,26 @@ class FirstFloorPlanGenerator:
         img = cv2.imread(image_path)
         if img is None:
             return None
+        return find_stairs(img)
 
-        # Define lower and upper bounds for the stairs color.
-        lower = np.array([200 - 10, 100 - 10, 200 - 10], dtype=np.uint8)
-        upper = np.array([200 + 10, 100 + 10, 200 + 10], dtype=np.uint8)
-        mask = cv2.inRange(img, lower, upper)
-        # Find contours in the mask.
-        cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not cnts:
-            return None
-        # Assume the largest contour corresponds to the stairs.
-        c = max(cnts, key=cv2.contourArea)
-        if cv2.contourArea(c) < 10:  # too small to be valid
-            return None
-        x, y, w, h = cv2.boundingRect(c)
-        return {"x": x, "y": y, "width": w, "height": h}
-
-    def generate_first_floor_plan(self, approach=None):
+    def generate_first_floor_plan(self, approach=None, rng=None):
         """
         If approach is None => pick random from [1,2,3].
         Then, regardless of the approach used, force the "Stairs" to be exactly
         the same as in the selected pretty floorplan.
+        :param rng: random.Random the random picks are drawn from (seed it for a
+                    reproducible variant); the global random module by default.
         """
+        rng = rng or random
         if approach is None:
-            approach = random.choice([1, 2, 3])
+            approach = rng.choice([1, 2, 3])
 
         if approach == 1:
-            plan = self._approach1()
+            plan = self._approach1(rng)
         elif approach == 2:
-            plan = self._approach2()
+            plan = self._approach2(rng)
         else:
-            plan = self._approach3()
+            plan = self._approach3(rng)
 
         # Force the stairs into the generated plan using the preserved stairs data.
         if self.base_stairs is not None:
@@ -91,7 +87,7 @@ class FirstFloorPlanGenerator:
 
         return plan
 
-    def _approach1(self):
+    def _approach1(self, rng):
         plan = {}
         for rn, rect in self.base_floorplan.items():
             new_rect = dict(rect)
@@ -104,12 +100,12 @@ class FirstFloorPlanGenerator:
         # If there are at least 2 bedrooms, rename one to "Study"
         bedrooms = [k for k in plan if "Bedroom" in k]
         if len(bedrooms) >= 2:
-            chosen_bed = random.choice(bedrooms)
+            chosen_bed = rng.choice(bedrooms)
             new_study = self._rename_key(chosen_bed, "Study")
             plan[new_study] = plan.pop(chosen_bed)
         return plan
 
-    def _approach2(self):
+    def _approach2(self, rng):
         plan = {}
         for rn, rect in self.base_floorplan.items():
             new_rect = dict(rect)
@@ -122,11 +118,11 @@ class FirstFloorPlanGenerator:
         # If there is at least one bedroom, carve out a balcony from one.
         bedrooms = [b for b in plan if "Bedroom" in b]
         if bedrooms:
-            chosen = random.choice(bedrooms)
-            self._carve_balcony_if_on_boundary(plan, chosen)
+            chosen = rng.choice(bedrooms)
+            self._carve_balcony_if_on_boundary(plan, chosen, rng)
         return plan
 
-    def _approach3(self):
+    def _approach3(self, rng):
         plan = {}
         for rn, rect in self.base_floorplan.items():
             new_rect = dict(rect)
@@ -138,14 +134,14 @@ class FirstFloorPlanGenerator:
 
         bedrooms = [b for b in plan if "Bedroom" in b]
         if bedrooms:
-            chosen_study = random.choice(bedrooms)
+            chosen_study = rng.choice(bedrooms)
             new_study = self._rename_key(chosen_study, "Study")
             plan[new_study] = plan.pop(chosen_study)
             bedrooms.remove(chosen_study)
 
             if bedrooms:
-                chosen_balcony = random.choice(bedrooms)
-                self._carve_balcony_if_on_boundary(plan, chosen_balcony)
+                chosen_balcony = rng.choice(bedrooms)
+                self._carve_balcony_if_on_boundary(plan, chosen_balcony, rng)
         return plan
 
     def _rename_key(self, old_key, new_base):
@@ -155,7 +151,7 @@ class FirstFloorPlanGenerator:
         else:
             return new_base
 
-    def _carve_balcony_if_on_boundary(self, plan, room_name, thickness=1):
+    def _carve_balcony_if_on_boundary(self, plan, room_name, rng=random, thickness=1):
         if room_name not in plan:
             return
         rect = plan[room_name]
@@ -175,7 +171,7 @@ class FirstFloorPlanGenerator:
         if not boundary_sides:
             return
 
-        side = random.choice(boundary_sides)
+        side = rng.choice(boundary_sides)
         new_balc_name = room_name.replace("Bedroom", "Balcony").replace("Study", "Balcony")
         if new_balc_name == room_name:
             new_balc_name = "Balcony_" + room_name
@@ -1,5 +1,17 @@
+import time
 import random
 
+try:
+    from .plan_hashing import plan_key
+    from .plan_constraints import RoomConstraints
+    from .plan_analysis import PlanAnalyzer
+    from .occupancy_grid import OccupancyGrid
+except ImportError:
+    from plan_hashing import plan_key
+    from plan_constraints import RoomConstraints
+    from plan_analysis import PlanAnalyzer
+    from occupancy_grid import OccupancyGrid
+
 class FloorplanGenerator:
     ROOMS = ["Garage", "Kitchen", "Bedroom", "Washroom"]
     FLOORPLAN_WIDTH = 20
@@ -7,8 +19,13 @@ class FloorplanGenerator:
     POPULATION_SIZE = 10
     GENERATIONS = 50
     MUTATION_RATE = 0.1  # Default mutation rate
+    ELITE_COUNT = 1  # Best individuals copied unchanged into the next generation
+    STALL_GENERATIONS = 15  # Stop after this many generations without improvement (None = never)
+    PENALTY_WEIGHT = 100  # Fitness cost per broken placement rule (> any area gain)
+    MAX_INIT_ATTEMPTS = 500  # Floorplan attempts before initialize_population gives up
 
-    def __init__(self, rooms=None, attached_washroom=False, rl_agent=None):
+    def __init__(self, rooms=None, attached_washroom=False, rl_agent=None,
+                 elite_count=None, stall_generations=None):
         """
         Initialize the floorplan generator.
 
@@ -16,10 +33,25 @@ class FloorplanGenerator:
          - rooms (list): List of rooms to include in the floorplan.
          - attached_washroom (bool): Whether washrooms must be adjacent to bedrooms.
          - rl_agent: (Optional) An RL agent that provides a mutation rate.
+         - elite_count (int): (Optional) Overrides ELITE_COUNT.
+         - stall_generations (int): (Optional) Overrides STALL_GENERATIONS.
         """
         self.rooms = rooms if rooms else self.ROOMS
         self.attached_washroom = attached_washroom
         self.rl_agent = rl_agent
+        if elite_count is not None:
+            self.ELITE_COUNT = elite_count
+        if stall_generations is not None:
+            self.STALL_GENERATIONS = stall_generations
+        # Placement rules of initialize_population, scored on GA children too
+        self.constraints = RoomConstraints(self.rooms, attached_washroom,
+                                           floor_width=self.FLOORPLAN_WIDTH,
+                                           floor_height=self.FLOORPLAN_HEIGHT)
+        self.analyzer = PlanAnalyzer(self.FLOORPLAN_WIDTH, self.FLOORPLAN_HEIGHT)
+        # Per-generation stats of the last genetic_algorithm() run
+        self.last_run_stats = []
+        # Attempt / rejection counts of the last initialize_population() run
+        self.init_stats = {}
 
     @staticmethod
     def check_overlap(room1, room2):
@@ -69,55 +101,86 @@ class FloorplanGenerator:
                 return True
         return False
 
+    def _room_sizes(self, room):
+        """
+        Every allowed (width, height) for a room type, in random order.
+        """
+        if "Bedroom" in room:
+            low, high = 4, 5
+        elif "Kitchen" in room:
+            low, high = 3, 4
+        elif "Washroom" in room:
+            low, high = 2, 3
+        else:
+            low, high = 4, 6
+        sizes = [(w, h) for w in range(low, high + 1) for h in range(low, high + 1)]
+        random.shuffle(sizes)
+        return sizes
+
     def initialize_population(self):
+        """
+        Build up to POPULATION_SIZE floorplans that satisfy the placement rules.
+
+        Every room is dropped at a uniformly random position among the ones the
+        occupancy grid reports as feasible, so a room only fails when no position
+        exists for any of its allowed sizes. A failed room discards the whole
+        floorplan; after MAX_INIT_ATTEMPTS floorplans the method gives up and
+        returns what it has.
+        Counts are left in self.init_stats (attempts, rejected, failed_rooms).
+        """
         population = []
-        while len(population) < self.POPULATION_SIZE:
+        attempts = 0
+        failed_rooms = {}
+        while len(population) < self.POPULATION_SIZE and attempts < self.MAX_INIT_ATTEMPTS:
+            attempts += 1
             floorplan = {}
-            valid = True
+            grid = OccupancyGrid(self.FLOORPLAN_WIDTH, self.FLOORPLAN_HEIGHT)
+            failed_room = None
             for room in self.rooms:
-                if "Bedroom" in room:
-                    width, height = random.randint(4, 5), random.randint(4, 5)
-                elif "Kitchen" in room:
-                    width, height = random.randint(3, 4), random.randint(3, 4)
-                elif "Washroom" in room:
-                    width, height = random.randint(2, 3), random.randint(2, 3)
-                else:
-                    width, height = random.randint(4, 6), random.randint(4, 6)
                 placed = False
-                for _ in range(50):
-                    x = random.randint(0, self.FLOORPLAN_WIDTH - width)
-                    y = random.randint(0, self.FLOORPLAN_HEIGHT - height)
-                    room_rect = {"x": x, "y": y, "width": width, "height": height}
-                    if any(self.check_overlap(room_rect, existing_room)
-                           for existing_room in floorplan.values()):
-                        continue
-                    if "Bedroom" in room:
-                        bedroom_conflict = False
-                        for existing_name, existing_rect in floorplan.items():
-                            if "Bedroom" in existing_name:
-                                if self.is_flush_adjacent(room_rect, existing_rect):
-                                    bedroom_conflict = True
-                                    break
-                        if bedroom_conflict:
-                            continue
+                # try the sizes in random order; fall back to another size
+                # before discarding the whole floorplan
+                for width, height in self._room_sizes(room):
+                    room_rect = {"x": 0, "y": 0, "width": width, "height": height}
                     if self.attached_washroom and "Washroom" in room:
-                        if not self._place_adjacent_to_bedroom(floorplan, room, room_rect):
-                            continue
-                    elif not ("Bedroom" in room or "Washroom" in room) and any(
-                        not self.check_min_gap(room_rect, existing_room, min_gap=3)
-                        for existing_room in floorplan.values()):
-                        continue
-                    floorplan[room] = room_rect
-                    placed = True
-                    break
+                        placed = self._place_adjacent_to_bedroom(floorplan, room, room_rect, grid)
+                    else:
+                        xs, ys = grid.feasible_positions(
+                            width, height,
+                            min_gap=0 if ("Bedroom" in room or "Washroom" in room) else 3,
+                            avoid_bedroom_walls="Bedroom" in room
+                        )
+                        placed = len(xs) > 0
+                        if placed:
+                            pick = random.randrange(len(xs))
+                            room_rect["x"], room_rect["y"] = int(xs[pick]), int(ys[pick])
+                    if placed:
+                        break
                 if not placed:
-                    valid = False
+                    failed_room = room
                     break
-            if valid:
+                floorplan[room] = room_rect
+                grid.place(room_rect, bedroom="Bedroom" in room)
+            if failed_room is None:
                 population.append(floorplan)
+            else:
+                failed_rooms[failed_room] = failed_rooms.get(failed_room, 0) + 1
+
+        self.init_stats = {
+            "attempts": attempts,
+            "rejected": attempts - len(population),
+            "failed_rooms": failed_rooms,
+        }
+        if len(population) < self.POPULATION_SIZE:
+            print(f"Warning: only {len(population)}/{self.POPULATION_SIZE} initial floorplans "
+                  f"after {attempts} attempts; rooms that could not be placed: {failed_rooms}")
         return population
 
-    def _place_adjacent_to_bedroom(self, floorplan, washroom_name, room_rect):
+    def _place_adjacent_to_bedroom(self, floorplan, washroom_name, room_rect, grid=None):
+        """
+        Put the washroom against a bedroom that has no attached washroom yet.
+        With a grid, an option must also lie inside the floor.
+        """
         for existing_room_name, existing_rect in floorplan.items():
             if "Bedroom" in existing_room_name:
                 if existing_rect.get("has_washroom_attached", False):
@@ -141,26 +204,74 @@ class FloorplanGenerator:
                      "height": room_rect["height"]}
                 ]
                 for option in adjacency_options:
-                    if any(self.check_overlap(option, existing_r) for existing_r in floorplan.values()):
+                    if grid is not None:
+                        if not grid.fits(option):
+                            continue
+                    elif any(self.check_overlap(option, existing_r) for existing_r in floorplan.values()):
                         continue
                     existing_rect["has_washroom_attached"] = True
                     room_rect.update(option)
                     return True
         return False
 
-    def genetic_algorithm(self):
+    def evaluate(self, floorplan):
+        """
+        Fitness of one floorplan: total room area, minus PENALTY_WEIGHT for every
+        broken placement rule (overlap, bedroom adjacency, min gap, attached washroom)
+        and for a layout the detector/selector would throw away, so
+        crossover/mutation children that break the rules lose to valid plans.
+        """
+        area = sum(rect["width"] * rect["height"] for rect in floorplan.values())
+        violations = self.constraints.plan_violations(floorplan)
+        if violations == 0:
+            violations += self.layout_violations(floorplan)
+        return area - self.PENALTY_WEIGHT * violations
+
+    def layout_violations(self, floorplan):
+        """
+        1 if the plan would be rejected downstream (RoomTypeDetector / PerfectPlanSelector):
+        not connected, or not exactly one living room. Only worth checking on plans
+        that already satisfy the placement rules.
+        """
+        analysis = self.analyzer.analyze(floorplan)
+        return int(not analysis.connected or analysis.living_room_count != 1)
+
+    def genetic_algorithm(self, on_generation=None):
+        """
+        Evolve a population and return the best floorplan dict.
+
+        Fitness values are cached per run by the plan's canonical key, the best
+        ELITE_COUNT plans survive each generation unchanged, and the run stops
+        early once the best fitness has not improved for STALL_GENERATIONS.
+
+        Args:
+         - on_generation (callable): (Optional) Called after every generation with a
+           stats dict: generation, best, mean, evaluations, cache_hits,
+           cache_hit_rate, evals_per_sec. The same dicts end up in last_run_stats.
+        """
         # Initialize the population.
         population = self.initialize_population()
         # Use the RL agent's mutation rate if provided.
         mutation_rate = self.rl_agent.get_mutation_rate() if self.rl_agent is not None else self.MUTATION_RATE
 
-        # Define a simple fitness function: maximize total room area.
+        # Per-run fitness cache keyed by the canonical plan key.
+        cache = {}
+        counters = {"lookups": 0, "hits": 0}
+
         def fitness(floorplan):
-            return sum(rect["width"] * rect["height"] for rect in floorplan.values())
+            key = plan_key(floorplan)
+            counters["lookups"] += 1
+            score = cache.get(key)
+            if score is None:
+                score = self.evaluate(floorplan)
+                cache[key] = score
+            else:
+                counters["hits"] += 1
+            return score
 
         # Tournament selection helper.
         def tournament_selection(pop, tournament_size=3):
-            participants = random.sample(pop, tournament_size)
+            participants = random.sample(pop, min(tournament_size, len(pop)))
             return max(participants, key=fitness)
 
         # Crossover operator: for each room, choose one parent's gene.
@@ -196,8 +307,17 @@ class FloorplanGenerator:
             return mutated
 
         # Full GA loop.
-        for _ in range(self.GENERATIONS):
-            new_population = []
+        self.last_run_stats = []
+        if not population:
+            return {}
+        best_so_far = None
+        stalled = 0
+        for generation in range(self.GENERATIONS):
+            start = time.perf_counter()
+            lookups_before, hits_before = counters["lookups"], counters["hits"]
+
+            # Elitism: carry the best plans over untouched.
+            new_population = sorted(population, key=fitness, reverse=True)[:self.ELITE_COUNT]
             while len(new_population) < self.POPULATION_SIZE:
                 parent1 = tournament_selection(population)
                 parent2 = tournament_selection(population)
@@ -206,6 +326,33 @@ class FloorplanGenerator:
                 new_population.append(child)
             population = new_population
 
+            scores = [fitness(fp) for fp in population]
+            best = max(scores)
+            lookups = counters["lookups"] - lookups_before
+            hits = counters["hits"] - hits_before
+            elapsed = time.perf_counter() - start
+            stats = {
+                "generation": generation + 1,
+                "best": best,
+                "mean": sum(scores) / len(scores),
+                "evaluations": lookups - hits,
+                "cache_hits": hits,
+                "cache_hit_rate": hits / lookups if lookups else 0.0,
+                "evals_per_sec": (lookups - hits) / elapsed if elapsed > 0 else 0.0,
+            }
+            self.last_run_stats.append(stats)
+            if on_generation is not None:
+                on_generation(stats)
+
+            # Early termination once the best fitness stalls.
+            if best_so_far is None or best > best_so_far:
+                best_so_far = best
+                stalled = 0
+            else:
+                stalled += 1
+            if self.STALL_GENERATIONS and stalled >= self.STALL_GENERATIONS:
+                break
+
         # Return the best floorplan.
-        best_plan = max(population, key=fitness) if population else {}
+        best_plan = max(population, key=fitness)
         return best_plan
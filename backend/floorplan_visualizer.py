@@ -1,13 +1,31 @@
+import io
+import cv2
+import numpy as np
 import matplotlib.pyplot as plt
-from shapely.geometry import Polygon, LineString, MultiLineString, Point
-from shapely.ops import unary_union
-import random
 import matplotlib
 matplotlib.use('Agg')
 
+try:
+    from .plan_layout import (PlanLayout, construct_door_rectangle, ROOM_COLORS,
+                              ROOM_ALPHA, UNKNOWN_ROOM_COLOR)
+    from .workspace import atomic_write_bytes
+except ImportError:
+    from plan_layout import (PlanLayout, construct_door_rectangle, ROOM_COLORS,
+                             ROOM_ALPHA, UNKNOWN_ROOM_COLOR)
+    from workspace import atomic_write_bytes
+
+def _write_bytes(save_path, data):
+    """
+    Write encoded image bytes to a path (atomically) or a file-like object.
+    """
+    if hasattr(save_path, "write"):
+        save_path.write(data)
+    else:
+        atomic_write_bytes(save_path, data)
+
 class FloorplanVisualizer:
     @staticmethod
-    def plot_with_boundaries(floorplan, save_path, width, height):
+    def plot_with_boundaries(floorplan, save_path, width, height, *, cache=None):
         """
         1) Draw each room as a rectangle with a distinct color
         2) Compute union => black boundary
@@ -19,7 +37,27 @@ class FloorplanVisualizer:
         The door is a small rectangle oriented with the wall.
 
         (We've added "Stairs":"plum" so if the dictionary has Stairs, it draws them.)
+        Colors come from plan_layout.ROOM_COLORS, shared with the raster renderer.
+
+        With a PlanCache, a plan rendered before (same dict, size and palette)
+        is copied from the cache instead of being drawn again.
         """
+        if cache is not None:
+            key = cache.render_key(floorplan, width, height, "matplotlib", ROOM_COLORS)
+            data = cache.get_bytes(key, "render")
+            if data is None:
+                buf = io.BytesIO()
+                FloorplanVisualizer.plot_with_boundaries(floorplan, buf, width, height)
+                data = buf.getvalue()
+                cache.put_bytes(key, data)
+            _write_bytes(save_path, data)
+            return
+        if not hasattr(save_path, "write"):
+            # draw into memory first => the file appears atomically
+            buf = io.BytesIO()
+            FloorplanVisualizer.plot_with_boundaries(floorplan, buf, width, height)
+            _write_bytes(save_path, buf.getvalue())
+            return
 
         fig, ax = plt.subplots(figsize=(6,6))
         ax.set_xlim(0, width)
@@ -27,40 +65,17 @@ class FloorplanVisualizer:
         ax.set_aspect("equal")
         ax.axis("off")
 
-        # Define colors (added "Stairs": "plum")
-        colors = {
-                    "Garage":   "#C5D5E4",  # Soft pastel blue-gray for a calm and neutral garage
-                    "Kitchen":  "#FFEDCC",  # Warm pastel peach (friendly and inviting kitchen)
-                    "Bedroom":  "#FFB3C6",  # Soft pastel pink for a cozy and restful bedroom
-                    "Washroom": "#C4E3CB",  # Mint pastel green for a fresh and clean feel
-                    "Storage":  "#E9C9FF",  # Light lavender pastel for an elegant storage space
-                    "Balcony":  "#FFF4B1",  # Warm pastel yellow for an open and sunny feel
-                    "Study":    "#F6C5B6",  # Pastel coral peach to create a warm, productive atmosphere
-                    "Door":     "#5C4033",  # Pastel purple for a soft, charming door presence
-                    "Stairs":   "#A4D8C2"   # Mint-teal pastel for a refreshing yet distinct look
-                }
-
         # --------------------------------------------------
-        # 1) Create shapely polygons for each room
+        # 1) Rooms, fused boundary and doors (see plan_layout)
         # --------------------------------------------------
-        room_polygons = {}
-        for room_name, rect in floorplan.items():
-            x, y = rect["x"], rect["y"]
-            w, h = rect["width"], rect["height"]
-            poly = Polygon([
-                (x,     y),
-                (x + w, y),
-                (x + w, y + h),
-                (x,     y + h)
-            ])
-            room_polygons[room_name] = poly
+        layout = PlanLayout.build(floorplan, width, height)
 
         # --------------------------------------------------
         # 2) Draw each room rectangle + label
         # --------------------------------------------------
-        for room_name, poly in room_polygons.items():
+        for room_name, poly in layout.rooms.items():
             base_type = room_name.split("_")[0]
-            color = colors.get(base_type, "gray")
+            color = ROOM_COLORS.get(base_type, UNKNOWN_ROOM_COLOR)
 
             x_min, y_min, x_max, y_max = poly.bounds
             w = x_max - x_min
@@ -69,7 +84,7 @@ class FloorplanVisualizer:
             ax.add_patch(
                 plt.Rectangle(
                     (x_min, y_min), w, h,
-                    color=color, alpha=0.7
+                    color=color, alpha=ROOM_ALPHA
                 )
             )
             # label in center
@@ -82,160 +97,48 @@ class FloorplanVisualizer:
         # --------------------------------------------------
         # 3) Union => black boundary
         # --------------------------------------------------
-        union_poly = unary_union(list(room_polygons.values()))
-        fused_poly = union_poly
-        max_buf = 50
-        step = 1
-        for dist in range(step, max_buf+1, step):
-            if (fused_poly.geom_type == "Polygon") and (len(fused_poly.interiors) == 0):
-                break
-            bigger = fused_poly.buffer(dist, join_style=2)
-            fused_poly = bigger.buffer(-dist, join_style=2)
-
-        # Draw black boundary
-        if fused_poly.is_empty:
+        if layout.fused.is_empty:
             plt.savefig(save_path, bbox_inches="tight", pad_inches=0)
             plt.close(fig)
             return
 
-        if fused_poly.geom_type == "Polygon":
-            bx, by = fused_poly.exterior.xy
+        for ring in layout.boundary_rings():
+            bx, by = zip(*ring)
             ax.plot(bx, by, color="black", linewidth=2)
-        else:
-            for part in fused_poly.geoms:
-                if part.geom_type == "Polygon":
-                    shell = Polygon(part.exterior)
-                    x_sh, y_sh = shell.exterior.xy
-                    ax.plot(x_sh, y_sh, color="black", linewidth=2)
 
         # --------------------------------------------------
-        # 4) living_area => bounding rectangle minus union
-        # --------------------------------------------------
-        bounding_poly = Polygon([(0,0), (width,0), (width,height), (0,height)])
-        living_area_poly = bounding_poly.difference(union_poly)
-
+        # 4) Doors
         # --------------------------------------------------
-        # 5) Place doors
-        # --------------------------------------------------
-        for room_name, poly in room_polygons.items():
-            base_type = room_name.split("_")[0]
-
-            if base_type == "Washroom":
-                door_line = None
-                # First try to find shared boundary with a Study room
-                for other_name, other_poly in room_polygons.items():
-                    if "Study" in other_name:
-                        shared_line = poly.boundary.intersection(other_poly.boundary)
-                        if not shared_line.is_empty and shared_line.length > 0.1:
-                            door_line = shared_line
-                            break
-                # If no Study adjacent, try Bedroom adjacency
-                if not door_line:
-                    for other_name, other_poly in room_polygons.items():
-                        if "Bedroom" in other_name:
-                            shared_line = poly.boundary.intersection(other_poly.boundary)
-                            if not shared_line.is_empty and shared_line.length > 0.1:
-                                door_line = shared_line
-                                break
-                # If still not found, use living area boundary
-                if not door_line:
-                    door_line = poly.boundary.intersection(living_area_poly.boundary)
-            else:
-                # For other room types, door on adjacency with living area
-                door_line = poly.boundary.intersection(living_area_poly.boundary)
-
-            if door_line and not door_line.is_empty:
-                valid_door_line = None
-                if fused_poly.geom_type == "Polygon":
-                    valid_door_line = door_line.difference(fused_poly.exterior)
-                elif fused_poly.geom_type == "MultiPolygon":
-                    for part in fused_poly.geoms:
-                        if part.geom_type == "Polygon":
-                            valid_door_line = door_line.difference(part.exterior)
-                            if not valid_door_line.is_empty:
-                                break
-
-                if valid_door_line and not valid_door_line.is_empty:
-                    door_rect = FloorplanVisualizer._construct_door_rectangle(valid_door_line)
-                    if door_rect is not None:
-                        x_coords, y_coords = door_rect.exterior.xy
-                        ax.add_patch(
-                            plt.Polygon(
-                                list(zip(x_coords, y_coords)),
-                                color=colors["Door"]
-                            )
-                        )
+        for door_rect in layout.doors:
+            x_coords, y_coords = door_rect.exterior.xy
+            ax.add_patch(
+                plt.Polygon(
+                    list(zip(x_coords, y_coords)),
+                    color=ROOM_COLORS["Door"]
+                )
+            )
 
         # Save
         plt.savefig(save_path, bbox_inches="tight", pad_inches=0)
         plt.close(fig)
 
     @staticmethod
-    def _construct_door_rectangle(door_line, door_len=0.4, door_thick=0.1):
+    def render(floorplan, width, height, *, cache=None):
         """
-        door_line can be a LineString or MultiLineString.
-        1) Pick the longest line segment
-        2) Find its midpoint param
-        3) Build a small rectangle around that midpoint, oriented with the line direction.
-        Returns a shapely Polygon or None.
+        plot_with_boundaries into memory instead of a file.
+        Returns the BGR image cv2.imread would give for the saved PNG.
         """
-        if door_line.is_empty:
-            return None
+        buf = io.BytesIO()
+        FloorplanVisualizer.plot_with_boundaries(floorplan, buf, width, height, cache=cache)
+        data = np.frombuffer(buf.getvalue(), dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
 
-        if door_line.geom_type == "LineString":
-            line = door_line
-        elif door_line.geom_type == "MultiLineString":
-            max_len = 0
-            best_line = None
-            for l in door_line.geoms:
-                if l.length > max_len:
-                    max_len = l.length
-                    best_line = l
-            if not best_line or best_line.length < 0.01:
-                return None
-            line = best_line
-        else:
-            return None
-
-        if line.length < 0.01:
-            return None
-
-        mid_param = line.length / 2
-        mid_pt = line.interpolate(mid_param)
-
-        epsilon = 0.01
-        p1 = line.interpolate(mid_param - epsilon)
-        p2 = line.interpolate(mid_param + epsilon)
-        dx = p2.x - p1.x
-        dy = p2.y - p1.y
-        line_len = (dx*dx + dy*dy)**0.5
-        if line_len < 1e-6:
-            return None
-
-        nx = dx / line_len
-        ny = dy / line_len
-
-        left_nx = -ny
-        left_ny = nx
-
-        halfL = door_len * 0.5
-        halfT = door_thick * 0.5
-
-        mx, my = mid_pt.x, mid_pt.y
-
-        c1x = mx - halfL*nx + halfT*left_nx
-        c1y = my - halfL*ny + halfT*left_ny
-
-        c2x = mx + halfL*nx + halfT*left_nx
-        c2y = my + halfL*ny + halfT*left_ny
-
-        c3x = mx + halfL*nx - halfT*left_nx
-        c3y = my + halfL*ny - halfT*left_nx
-
-        c4x = mx - halfL*nx - halfT*left_ny
-        c4y = my - halfL*ny - halfT*left_ny
-
-        return Polygon([(c1x,c1y), (c2x,c2y), (c3x,c3y), (c4x,c4y)])
+    @staticmethod
+    def _construct_door_rectangle(door_line, door_len=0.4, door_thick=0.1):
+        """
+        Kept for callers of the old API, see plan_layout.construct_door_rectangle.
+        """
+        return construct_door_rectangle(door_line, door_len, door_thick)
 
     @staticmethod
     def _pick_door_location(geom):
@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+try:
+    from .workspace import atomic_write_bytes, atomic_write_image, atomic_write_json
+except ImportError:
+    from workspace import atomic_write_bytes, atomic_write_image, atomic_write_json
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def map_ordered(func, items, workers=1):
+    """
+    Lazy map(func, items) on a thread pool, in input order, with at most
+    2 * workers calls in flight. OpenCV releases the GIL while decoding,
+    encoding and filtering, so the threads do run in parallel.
+    Closing the generator early drops the calls that have not started yet.
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = []
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def list_images(input_dir, extensions=IMAGE_EXTENSIONS):
+    """
+    Image file names in input_dir, in os.listdir order.
+    """
+    return [f for f in os.listdir(input_dir) if f.lower().endswith(extensions)]
+
+
+def iter_images(input_dir, workers=1, extensions=IMAGE_EXTENSIONS):
+    """
+    Yield (filename, BGR image) for the images in input_dir, in os.listdir order,
+    decoding up to 2 * workers files ahead of the consumer. Unreadable files are skipped.
+    """
+    def decode(fname):
+        return fname, cv2.imread(os.path.join(input_dir, fname))
+
+    for fname, img in map_ordered(decode, list_images(input_dir, extensions), workers):
+        if img is not None:
+            yield fname, img
+
+
+def _atomic_copy(src, dst):
+    with open(src, "rb") as f:
+        atomic_write_bytes(dst, f.read())
+
+
+class ImageWriter:
+    """
+    Write-behind for stage outputs: write_image()/write_json()/copy_file() hand the (atomic)
+    write to a thread pool and return at once, so encoding and disk I/O overlap
+    with work on the next plan. close() (or leaving the with-block) waits for
+    every write and re-raises the first error.
+    With workers <= 1 everything is written inline, as before.
+    The caller must not modify an image after handing it over.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._pending = []
+
+    def write_image(self, path, image):
+        self._submit(atomic_write_image, path, image)
+
+    def write_json(self, path, value):
+        self._submit(atomic_write_json, path, value)
+
+    def copy_file(self, src, dst):
+        """
+        Copy an already encoded file byte for byte (no decode / re-encode).
+        """
+        self._submit(_atomic_copy, src, dst)
+
+    def _submit(self, func, *args):
+        if self._pool is None:
+            func(*args)
+            return
+        self._pending.append(self._pool.submit(func, *args))
+        # Bound the images waiting in the queue
+        if len(self._pending) >= 4 * self.workers:
+            self._pending.pop(0).result()
+
+    def close(self):
+        if self._pool is None:
+            return
+        try:
+            for future in self._pending:
+                future.result()
+        finally:
+            self._pending = []
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,17 +1,28 @@
 # main.py
 
 import os
-import json
+import time
 import shutil
+import random
+import argparse
 
 from floorplan_generator import FloorplanGenerator
-from floorplan_visualizer import FloorplanVisualizer
+from raster_renderer import RENDERERS
+from batch_generation import ENGINES, BatchStats, render_plans
+from plan_stream import stream_plans
 from room_type_detector import RoomTypeDetector
 from perfect_plan_selector import PerfectPlanSelector
+from plan_ranking import PLAN_METRICS, PlanScore, parse_weights
 from pretty_floorplan_maker import PrettyFloorplanMaker
+from plan_pipeline import PlanPipeline
+from plan_cache import DEFAULT_CACHE_DIR, PlanCache
+from plan_jobs import rooms_from_specs
+from workspace import DEFAULT_WORKSPACE_ROOT, Workspace, stage_dir
 
-# Our new 1st-floor generator with 3 approaches
-from first_floor_plan_generator import FirstFloorPlanGenerator
+# 1st-floor options (3 approaches) for every final plan
+from first_floor_batch import generate_first_floor_batch, option_document
+from plan_document import DOCUMENT_SUFFIX, read_document, write_document
+from plan_hashing import plan_hash
 
 def copy_json_for_png(src_png, src_dir, dst_dir):
     """
@@ -26,7 +37,7 @@ def copy_json_for_png(src_png, src_dir, dst_dir):
 def rename_png_and_json(old_png, old_dir, new_png, new_dir):
     """
     Renames old_png -> new_png in old_dir/new_dir.
-    Then renames old_png.json -> new_png.json if present.
+    Then renames old_png.json -> new_png.json (and the .plan.json document) if present.
     If new files exist, remove them first (avoid WinError 183).
     """
     old_png_path = os.path.join(old_dir, old_png)
@@ -38,18 +49,54 @@ def rename_png_and_json(old_png, old_dir, new_png, new_dir):
 
     old_base = os.path.splitext(old_png)[0]
     new_base = os.path.splitext(new_png)[0]
-    old_json = old_base + ".json"
-    new_json = new_base + ".json"
-    old_json_path = os.path.join(old_dir, old_json)
-    new_json_path = os.path.join(new_dir, new_json)
-
-    if os.path.exists(old_json_path):
-        if os.path.exists(new_json_path):
-            os.remove(new_json_path)
-        os.rename(old_json_path, new_json_path)
+    for suffix in (".json", DOCUMENT_SUFFIX):
+        old_json_path = os.path.join(old_dir, old_base + suffix)
+        new_json_path = os.path.join(new_dir, new_base + suffix)
+
+        if os.path.exists(old_json_path):
+            if os.path.exists(new_json_path):
+                os.remove(new_json_path)
+            os.rename(old_json_path, new_json_path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate ground- and first-floor plans.")
+    parser.add_argument("--num-floorplans", type=int, default=5,
+                        help="Number of candidate plans to generate (default: 5).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used for generation and rendering (default: 1).")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Base seed; the same seed reproduces the same candidates.")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="dict",
+                        help="GA engine: dict-based (default) or NumPy array-based.")
+    parser.add_argument("--renderer", choices=RENDERERS, default="matplotlib",
+                        help="Plan renderer: matplotlib (default) or the faster OpenCV raster one.")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="Hand plans between stages in memory; only 'pretty' is written.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Cache of renders and analysis results (default: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Render and analyse everything from scratch.")
+    parser.add_argument("--io-workers", type=int, default=1,
+                        help="Threads decoding ahead / writing behind in the detector, selector "
+                             "and prettifier (default: 1).")
+    parser.add_argument("--rank-weights", type=parse_weights, default=None,
+                        help="Rank the connected plans by a weighted sum of plan metrics, e.g. "
+                             f"'living_area=1,compactness=20' (metrics: {', '.join(PLAN_METRICS)}). "
+                             "Default: living area measured on the image.")
+    parser.add_argument("--rank-stop", type=float, default=None,
+                        help="Stop scoring once the selected plans all score at least this.")
+    parser.add_argument("--workspace", default=None,
+                        help="Write all stage folders into <workspace-root>/<ID> instead of "
+                             "the current directory.")
+    parser.add_argument("--workspace-root", default=DEFAULT_WORKSPACE_ROOT,
+                        help=f"Where --workspace folders live (default: {DEFAULT_WORKSPACE_ROOT}).")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    base_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
 
     # ------------------------------------------------------------
     # 1) Ask user for floorplan specs
@@ -92,89 +139,143 @@ if __name__ == "__main__":
     # ------------------------------------------------------------
     # 2) Build the list of rooms
     # ------------------------------------------------------------
-    rooms = []
-    for b in range(1, bedrooms + 1):
-        rooms.append(f"Bedroom_{b}")
-    for w in range(1, washrooms + 1):
-        rooms.append(f"Washroom_{w}")
-    rooms.append("Kitchen")
-    if has_garage:
-        rooms.append("Garage")
+    rooms = rooms_from_specs(bedrooms, washrooms, has_garage)
 
     # ------------------------------------------------------------
-    # 3) Generate & visualize many floorplans (PNG + JSON)
+    # 3) Generate many floorplans, rank them on their geometry and
+    #    only render (PNG + JSON) the ones that survive selection.
     # ------------------------------------------------------------
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
-
-    generator = FloorplanGenerator(rooms=rooms, attached_washroom=has_attachedwashroom)
-    visualizer = FloorplanVisualizer()
-
-    num_floorplans = 40
-    for i in range(num_floorplans):
-        fp_dict = generator.genetic_algorithm()
-        base_name = f"floorplan_{i+1}"
-        png_path = os.path.join(output_dir, base_name + ".png")
-        json_path = os.path.join(output_dir, base_name + ".json")
-
-        # Save PNG
-        visualizer.plot_with_boundaries(
-            fp_dict,
-            png_path,
+    workspace = Workspace(args.workspace, args.workspace_root) if args.workspace else None
+    output_dir = stage_dir("output", workspace)
+    finaloutput_dir = stage_dir("finaloutput", workspace)
+    perfect_dir = stage_dir("perfect", workspace)
+    pretty_dir = stage_dir("pretty", workspace)
+    # Remove old files so only this run's survivors reach the detector
+    for oldf in os.listdir(output_dir):
+        if oldf.lower().endswith((".png", ".json")):
+            os.remove(os.path.join(output_dir, oldf))
+
+    cache = None if args.no_cache else PlanCache(args.cache_dir)
+    plan_score = None
+    if args.rank_weights is not None:
+        plan_score = PlanScore(args.rank_weights, FloorplanGenerator.FLOORPLAN_WIDTH,
+                               FloorplanGenerator.FLOORPLAN_HEIGHT)
+    num_floorplans = args.num_floorplans
+    num_rendered = 3
+
+    # generate -> validate -> score -> top-k, one plan at a time
+    start = time.perf_counter()
+    survivors = []
+    for survivors in stream_plans(rooms, has_attachedwashroom, num_floorplans, args.workers,
+                                  base_seed, args.engine, k=num_rendered,
+                                  width=FloorplanGenerator.FLOORPLAN_WIDTH,
+                                  height=FloorplanGenerator.FLOORPLAN_HEIGHT):
+        if len(survivors) == 1:
+            print(f"First acceptable plan after {time.perf_counter() - start:.2f}s.")
+    gen_stats = BatchStats("generate", num_floorplans, args.workers, time.perf_counter() - start)
+
+    print(f"Selected {len(survivors)} of {num_floorplans} floorplans for rendering.")
+
+    if args.in_memory:
+        # ------------------------------------------------------------
+        # 4)-6) Render once and run detector -> selector -> prettifier
+        #       on in-memory records; 'pretty' is the only disk sink.
+        # ------------------------------------------------------------
+        pipeline = PlanPipeline(
             FloorplanGenerator.FLOORPLAN_WIDTH,
-            FloorplanGenerator.FLOORPLAN_HEIGHT
+            FloorplanGenerator.FLOORPLAN_HEIGHT,
+            renderer=args.renderer,
+            workers=min(args.workers, len(survivors)),
+            cache=cache,
+            workspace=workspace,
+            min_plans=num_rendered,
+            selector=PerfectPlanSelector(cache=cache, workspace=workspace, score=plan_score,
+                                         stop_score=args.rank_stop)
+        )
+        pipeline.run([(base_name, fp_dict) for base_name, fp_dict, _ in survivors])
+        render_stats = pipeline.render_stats
+        pipeline.write_final()
+    else:
+        # Save PNG + JSON for each survivor
+        render_stats = render_plans(
+            [(base_name, fp_dict) for base_name, fp_dict, _ in survivors],
+            output_dir,
+            FloorplanGenerator.FLOORPLAN_WIDTH,
+            FloorplanGenerator.FLOORPLAN_HEIGHT,
+            workers=min(args.workers, len(survivors)),
+            renderer=args.renderer,
+            cache=cache
         )
-        # Save JSON
-        with open(json_path, "w") as jf:
-            json.dump(fp_dict, jf)
-
-    # ------------------------------------------------------------
-    # 4) Detect & label living rooms -> finaloutput
-    # ------------------------------------------------------------
-    detector = RoomTypeDetector(input_dir=output_dir, output_dir="finaloutput")
-    detector.detect_and_label_images()
-
-    # Copy matching JSON for each PNG in finaloutput
-    final_out_pngs = [f for f in os.listdir("finaloutput") if f.lower().endswith(".png")]
-    for pngf in final_out_pngs:
-        copy_json_for_png(pngf, output_dir, "finaloutput")
 
-    # ------------------------------------------------------------
-    # 5) PerfectPlanSelector -> picks 3 => 'perfect'
-    # ------------------------------------------------------------
-    selector = PerfectPlanSelector(input_dir="finaloutput", output_dir="perfect")
-    selector.select_connected_plans()
+        # ------------------------------------------------------------
+        # 4) Detect & label living rooms -> finaloutput
+        # ------------------------------------------------------------
+        detector = RoomTypeDetector(input_dir=output_dir, output_dir=finaloutput_dir,
+                                    workers=args.io_workers, min_plans=num_rendered)
+        detector.detect_and_label_images()
+
+        # Copy matching JSON for each PNG in finaloutput
+        final_out_pngs = [f for f in os.listdir(finaloutput_dir) if f.lower().endswith(".png")]
+        for pngf in final_out_pngs:
+            copy_json_for_png(pngf, output_dir, finaloutput_dir)
+
+        # ------------------------------------------------------------
+        # 5) PerfectPlanSelector -> picks 3 => 'perfect'
+        # ------------------------------------------------------------
+        selector = PerfectPlanSelector(input_dir=finaloutput_dir, output_dir=perfect_dir, cache=cache,
+                                       workers=args.io_workers, score=plan_score,
+                                       stop_score=args.rank_stop)
+        selector.select_connected_plans()
+
+        # Copy JSON for those 3 perfect images
+        perfect_pngs = [f for f in os.listdir(perfect_dir) if f.lower().endswith(".png")]
+        for pngf in perfect_pngs:
+            copy_json_for_png(pngf, finaloutput_dir, perfect_dir)
+
+        # ------------------------------------------------------------
+        # 6) Make them pretty -> 'pretty'
+        # ------------------------------------------------------------
+        maker = PrettyFloorplanMaker(input_dir=perfect_dir, output_dir=pretty_dir, cache=cache,
+                                     workers=args.io_workers)
+        maker.make_pretty_floorplans()
+
+        # Copy JSON for the final pretty images
+        pretty_pngs = [f for f in os.listdir(pretty_dir) if f.lower().endswith(".png")]
+        for pngf in pretty_pngs:
+            copy_json_for_png(pngf, perfect_dir, pretty_dir)
+
+        # Now presumably we have 3 final PNG + JSON in 'pretty'.
+        # Rename them to plan1, plan2, plan3
+        pretty_pngs = sorted(
+            f for f in os.listdir(pretty_dir)
+            if f.lower().endswith(".png")
+        )
+        for i, old_png in enumerate(pretty_pngs[:3], start=1):
+            new_png = f"plan{i}.png"
+            rename_png_and_json(old_png, pretty_dir, new_png, pretty_dir)
 
-    # Copy JSON for those 3 perfect images
-    perfect_pngs = [f for f in os.listdir("perfect") if f.lower().endswith(".png")]
-    for pngf in perfect_pngs:
-        copy_json_for_png(pngf, "finaloutput", "perfect")
+    print(f"\nFinal 3 plans in '{pretty_dir}' are now plan1.png/json, plan2.png/json, plan3.png/json.\n")
 
     # ------------------------------------------------------------
-    # 6) Make them pretty -> 'pretty'
+    # Precompute the 1st-floor options of every final plan while the
+    # user looks at them (one variant per approach, duplicates dropped).
+    # The plan documents carry the stairs and living-room label along.
     # ------------------------------------------------------------
-    maker = PrettyFloorplanMaker(input_dir="perfect", output_dir="pretty")
-    maker.make_pretty_floorplans()
-
-    # Copy JSON for the final pretty images
-    pretty_pngs = [f for f in os.listdir("pretty") if f.lower().endswith(".png")]
-    for pngf in pretty_pngs:
-        copy_json_for_png(pngf, "perfect", "pretty")
-
-    # Now presumably we have 3 final PNG + JSON in 'pretty'.
-    # Rename them to plan1, plan2, plan3
-    pretty_pngs = sorted(
-        f for f in os.listdir("pretty")
-        if f.lower().endswith(".png")
+    final_plans = []
+    for i in range(1, 4):
+        document = read_document(pretty_dir, f"plan{i}")
+        if document is not None:
+            final_plans.append((f"first_floor_plan_{i}", document))
+    ground_hashes = {name: plan_hash(document.rooms) for name, document in final_plans}
+    first_floor_options, first_floor_stats = generate_first_floor_batch(
+        final_plans,
+        FloorplanGenerator.FLOORPLAN_WIDTH,
+        FloorplanGenerator.FLOORPLAN_HEIGHT,
+        base_seed=base_seed
     )
-    for i, old_png in enumerate(pretty_pngs[:3], start=1):
-        new_png = f"plan{i}.png"
-        rename_png_and_json(old_png, "pretty", new_png, "pretty")
-
-    print("\nFinal 3 plans in 'pretty' are now plan1.png/json, plan2.png/json, plan3.png/json.\n")
 
     # ------------------------------------------------------------
-    # Ask user which plan => load JSON => generate 3 approaches
+    # Ask user which plan => render its first-floor options
     # ------------------------------------------------------------
     ans = input("Do you want to generate the 1st-floor plan from plan1, plan2, or plan3? (y/n): ").strip().lower()
     if ans == 'y':
@@ -187,47 +288,39 @@ if __name__ == "__main__":
             except ValueError:
                 print("Invalid choice. Must be 1, 2, or 3.")
 
-        chosen_json = os.path.join("pretty", f"plan{choice}.json")
-        if not os.path.exists(chosen_json):
-            print(f"ERROR: Missing {chosen_json}, can't proceed.")
+        options = first_floor_options.get(f"first_floor_plan_{choice}")
+        if options is None:
+            print(f"ERROR: Missing {os.path.join(pretty_dir, f'plan{choice}.json')}, can't proceed.")
         else:
-            with open(chosen_json, "r") as f:
-                chosen_floorplan_dict = json.load(f)
-
             # Clear old files in output_floor1
-            floor1_dir = "output_floor1"
-            if os.path.exists(floor1_dir):
-                for oldf in os.listdir(floor1_dir):
-                    if oldf.lower().endswith(".png") or oldf.lower().endswith(".json"):
-                        os.remove(os.path.join(floor1_dir, oldf))
-            else:
-                os.makedirs(floor1_dir, exist_ok=True)
-
-            # We want 3 FIRST-FLOOR IMAGES, each with a DIFFERENT approach (1,2,3).
-            approach_list = [1, 2, 3]
-            for app_idx in approach_list:
-                ff_gen = FirstFloorPlanGenerator(
-                    chosen_floorplan_dict,
-                    FloorplanGenerator.FLOORPLAN_WIDTH,
-                    FloorplanGenerator.FLOORPLAN_HEIGHT
-                )
-                # Generate a distinct approach
-                first_floor_dict = ff_gen.generate_first_floor_plan(approach=app_idx)
-
-                # Save them as e.g. first_floor_plan_2_approach1.png/.json
-                outbase = f"first_floor_plan_{choice}_approach{app_idx}"
-                out_png = os.path.join(floor1_dir, outbase + ".png")
-                out_json = os.path.join(floor1_dir, outbase + ".json")
-
-                visualizer.plot_with_boundaries(
-                    first_floor_dict,
-                    out_png,
-                    FloorplanGenerator.FLOORPLAN_WIDTH,
-                    FloorplanGenerator.FLOORPLAN_HEIGHT
-                )
-                with open(out_json, "w") as jf:
-                    json.dump(first_floor_dict, jf)
-
-            print(f"\nSaved 3 distinct first-floor plans (Approach #1, #2, #3) in '{floor1_dir}'.\n")
-
+            floor1_dir = stage_dir("output_floor1", workspace)
+            for oldf in os.listdir(floor1_dir):
+                if oldf.lower().endswith(".png") or oldf.lower().endswith(".json"):
+                    os.remove(os.path.join(floor1_dir, oldf))
+
+            # One FIRST-FLOOR IMAGE per distinct approach, e.g.
+            # first_floor_plan_2_approach1.png/.json
+            render_plans(
+                [(option["name"], option["plan"]) for option in options],
+                floor1_dir,
+                FloorplanGenerator.FLOORPLAN_WIDTH,
+                FloorplanGenerator.FLOORPLAN_HEIGHT,
+                workers=min(args.workers, len(options)),
+                renderer=args.renderer,
+                cache=cache
+            )
+            ground_hash = ground_hashes[f"first_floor_plan_{choice}"]
+            for option in options:
+                write_document(floor1_dir, option["name"], option_document(option, ground_hash))
+            approaches = ", ".join(f"#{option['approach']}" for option in options)
+            print(f"\nSaved {len(options)} distinct first-floor plans (Approach {approaches}) in '{floor1_dir}'.\n")
+
+    print(f"Throughput (seed {base_seed}):")
+    print(f"  {gen_stats}")
+    print(f"  {render_stats}")
+    print(f"  {first_floor_stats}")
+    if cache is not None:
+        for kind, counts in cache.stats().items():
+            print(f"  cache[{kind}]: {counts['hits']} hits, {counts['misses']} misses "
+                  f"({counts['hit_rate']:.0%})")
     print("All done!")
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+def _window_sums(mask, win_w, win_h):
+    """
+    Sum of `mask` over every win_w x win_h window, via a summed-area table.
+    Result[y, x] is the sum over rows y..y+win_h-1, cols x..x+win_w-1.
+    """
+    table = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    table[1:, 1:] = mask.cumsum(axis=0).cumsum(axis=1)
+    return (table[win_h:, win_w:] - table[:-win_h, win_w:]
+            - table[win_h:, :-win_w] + table[:-win_h, :-win_w])
+
+
+class OccupancyGrid:
+    """
+    Unit-cell occupancy of the floor while rooms are being placed.
+    Row y / column x is the cell [x, x+1] x [y, y+1] in plan coordinates.
+
+    feasible_positions() returns every (x, y) where a w x h room can go without
+    overlapping (check_overlap), optionally keeping `min_gap` from all rooms
+    (check_min_gap) and not sharing a wall with a bedroom (is_flush_adjacent).
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.occupied = np.zeros((height, width), dtype=np.uint8)
+        self.bedrooms = np.zeros((height, width), dtype=np.uint8)
+
+    def fits(self, rect):
+        """
+        True if rect lies inside the floor and touches no occupied cell.
+        """
+        x, y, w, h = rect["x"], rect["y"], rect["width"], rect["height"]
+        if x < 0 or y < 0 or w <= 0 or h <= 0 or x + w > self.width or y + h > self.height:
+            return False
+        return not self.occupied[y:y + h, x:x + w].any()
+
+    def feasible_positions(self, w, h, min_gap=0, avoid_bedroom_walls=False):
+        """
+        :return: (xs, ys) arrays of every valid bottom-left corner for a w x h room.
+        """
+        if w > self.width or h > self.height or w <= 0 or h <= 0:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+        # rooms inside the window (grown by min_gap on every side) => blocked
+        g = min_gap
+        padded = np.pad(self.occupied, g)
+        ok = _window_sums(padded, w + 2 * g, h + 2 * g) == 0
+
+        if avoid_bedroom_walls and self.bedrooms.any():
+            # bedroom cells directly left/right or above/below the room => shared wall
+            beds = np.pad(self.bedrooms, 1)
+            side_strips = _window_sums(beds, w + 2, h)[1:, :]
+            cap_strips = _window_sums(beds, w, h + 2)[:, 1:]
+            ok &= (side_strips[:ok.shape[0], :ok.shape[1]] == 0)
+            ok &= (cap_strips[:ok.shape[0], :ok.shape[1]] == 0)
+
+        ys, xs = np.nonzero(ok)
+        return xs, ys
+
+    def place(self, rect, bedroom=False):
+        x, y, w, h = rect["x"], rect["y"], rect["width"], rect["height"]
+        self.occupied[y:y + h, x:x + w] = 1
+        if bedroom:
+            self.bedrooms[y:y + h, x:x + w] = 1
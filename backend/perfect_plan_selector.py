@@ -1,98 +1,206 @@
 import os
+import json
 import cv2
-import numpy as np
+
+try:
+    from .plan_regions import compute_plan_regions
+    from .plan_record import PlanRecord, iter_records, clear_stage_files
+    from .plan_stream import TopK
+    from .plan_document import DOCUMENT_SUFFIX, read_document, write_document
+    from .image_io import IMAGE_EXTENSIONS, ImageWriter, list_images
+    from .workspace import stage_dir
+except ImportError:
+    from plan_regions import compute_plan_regions
+    from plan_record import PlanRecord, iter_records, clear_stage_files
+    from plan_stream import TopK
+    from plan_document import DOCUMENT_SUFFIX, read_document, write_document
+    from image_io import IMAGE_EXTENSIONS, ImageWriter, list_images
+    from workspace import stage_dir
 
 class PerfectPlanSelector:
     def __init__(
         self,
         input_dir="finaloutput",
         output_dir="perfect",
-        min_contour_area=200
+        min_contour_area=200,
+        cache=None,
+        workspace=None,
+        workers=1,
+        k=3,
+        score=None,
+        stop_score=None
     ):
         """
         :param input_dir:  Folder where labeled floorplans are found.
         :param output_dir: Folder to store the final chosen images.
         :param min_contour_area: Any contour below this is ignored when checking 'connected'.
+        :param cache: optional PlanCache for connectivity + living-area results.
+        :param workspace: optional Workspace; the folders are then stages inside it.
+        :param workers: threads decoding ahead and writing behind (see image_io).
+        :param k: how many plans to select.
+        :param score: optional plan_ranking.PlanScore (any callable plan dict -> number)
+                      to rank the connected plans by. None ranks by the living area
+                      measured on the image, as before.
+        :param stop_score: stop scoring once the k selected plans all score at least this.
         """
-        self.input_dir = input_dir
-        self.output_dir = output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.input_dir = stage_dir(input_dir, workspace)
+        self.output_dir = stage_dir(output_dir, workspace)
 
         # Minimum contour area to consider a valid shape for connectivity
         self.min_contour_area = min_contour_area
+        self.cache = cache
+        self.workers = workers
+        self.k = k
+        self.score = score
+        self.stop_score = stop_score
 
     def select_connected_plans(self):
         """
-        1) Gathers all images in self.input_dir.
+        1) Streams the images in self.input_dir (with a score, their JSON plans first).
         2) For each image, checks if it's connected (exactly one large black boundary).
-        3) Among all connected images, measures each one's living-room area.
-        4) Sorts them by living-room area (descending). Picks top 3.
-        5) Copies those top 3 to self.output_dir.
+        3) Scores the connected ones (living-room area by default) and keeps the
+           best k in a bounded heap; with a score, images whose plan cannot make
+           the top k are never decoded.
+        4) Copies only the final k to self.output_dir (each with its plan document,
+           noting the selection) and removes the images an earlier run left there.
         """
-        # Remove old images in output_dir
-        for f in os.listdir(self.output_dir):
-            if f.lower().endswith((".png", ".jpg", ".jpeg")):
-                os.remove(os.path.join(self.output_dir, f))
-
-        # 1) Gather images
-        image_files = [
-            f for f in os.listdir(self.input_dir)
-            if f.lower().endswith((".png", ".jpg", ".jpeg"))
-        ]
-        if not image_files:
+        names = list_images(self.input_dir)
+        if not names:
+            clear_stage_files(self.output_dir)
             print("No images found in input directory.")
             return
 
-        # 2) Check connectivity + measure living-room area
-        connected_plans = []
-        for fname in image_files:
-            path = os.path.join(self.input_dir, fname)
-            image = cv2.imread(path)
-            if image is None:
+        # 1)-3) Check connectivity, score, keep the top k (as pixel-less handles)
+        if self.score is None:
+            records = iter_records(self.input_dir, with_plans=False, workers=self.workers)
+        else:
+            records = (PlanRecord(fname, self._read_plan(fname), None) for fname in names)
+        selected = self._select(records, self.k, self._load_image, keep_images=False)
+
+        # 4) Copy the files as they are (no decode / re-encode), then drop stale outputs
+        with ImageWriter(self.workers) as writer:
+            for record in selected:
+                writer.copy_file(os.path.join(self.input_dir, record.filename),
+                                 os.path.join(self.output_dir, record.filename))
+                document = read_document(self.input_dir, record.name, recover=False)
+                if document is not None:
+                    self._note_selection(document, record)
+                    write_document(self.output_dir, record.name, document, writer)
+                print(f"Copied '{record.filename}' to '{self.output_dir}' (living_area={record.living_area}).")
+        kept = {record.filename for record in selected}
+        kept.update(record.name + DOCUMENT_SUFFIX for record in selected)
+        for fname in list_images(self.output_dir, IMAGE_EXTENSIONS + (DOCUMENT_SUFFIX,)):
+            if fname not in kept:
+                os.remove(os.path.join(self.output_dir, fname))
+
+    def select_records(self, records, k=None):
+        """
+        Steps 2-3 of select_connected_plans on in-memory PlanRecords.
+        Sets record.living_area on the connected ones and returns the top k
+        (self.k by default), best first, each with the selection noted in its
+        document. records may be any iterable: only the k best are held at a time.
+        """
+        selected = self._select(records, k or self.k)
+        for record in selected:
+            record.document = record.plan_document().copy()
+            self._note_selection(record.document, record)
+        return selected
+
+    def _note_selection(self, document, record):
+        info = {"living_area": record.living_area}
+        if self.score is not None:
+            info["score"] = self.score(record.plan or {})
+        document.add_provenance("perfect", **info)
+
+    def _select(self, records, k, load=None, keep_images=True):
+        """
+        Bounded top-k over a stream of records. Ties go to the earlier record,
+        like the stable sort this replaces.
+        :param load: load(record) -> image for records streamed without one.
+        :param keep_images: False drops each image once it is measured, so only
+                            pixel-less handles are kept.
+        """
+        top = TopK(k)
+        scored = 0
+        for record in records:
+            scored += 1
+            # A plan-dict score is known before the image is even looked at
+            plan_score = None
+            if self.score is not None:
+                plan_score = self.score(record.plan or {})
+                if not top.accepts(plan_score):
+                    continue
+
+            if record.image is None:
+                record.image = load(record) if load is not None else None
+                if record.image is None:
+                    continue
+            connected, living_area = self._measure(record)
+            if not keep_images:
+                record.image = None
+            if not connected:
                 continue
+            record.living_area = living_area
+            top.push(living_area if plan_score is None else plan_score, record)
 
-            if self.is_connected(image):
-                # measure living room area
-                living_area = self.get_living_room_area(image)
-                if living_area is not None:
-                    connected_plans.append((fname, living_area))
-                else:
-                    # If for some reason we can't measure living area, treat as 0
-                    connected_plans.append((fname, 0))
+            threshold = top.threshold()
+            if self.stop_score is not None and threshold is not None and threshold >= self.stop_score:
+                print(f"Top {k} all score >= {self.stop_score} after {scored} plans; stopped scoring.")
+                break
 
-        if not connected_plans:
+        if not len(top):
             print("No connected floorplans found.")
-            return
+            return []
+        return top.best()
 
-        # 3) Sort by living-room area, descending
-        connected_plans.sort(key=lambda x: x[1], reverse=True)
+    def _read_plan(self, fname):
+        json_path = os.path.join(self.input_dir, os.path.splitext(fname)[0] + ".json")
+        if not os.path.exists(json_path):
+            return {}
+        with open(json_path, "r") as jf:
+            return json.load(jf)
 
-        # 4) Pick top 3
-        selected = connected_plans[:3]
+    def _load_image(self, record):
+        return cv2.imread(os.path.join(self.input_dir, record.filename))
 
-        # 5) Copy them to output_dir
-        for (filename, area) in selected:
-            src_path = os.path.join(self.input_dir, filename)
-            dst_path = os.path.join(self.output_dir, filename)
-            img = cv2.imread(src_path)
-            if img is not None:
-                cv2.imwrite(dst_path, img)
-                print(f"Copied '{filename}' to '{self.output_dir}' (living_area={area}).")
+    def _measure(self, record):
+        """
+        (is_connected, living_area) of a record's image, from the cache if possible.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.image_key(record.image, "selector",
+                                       min_contour_area=self.min_contour_area)
+            entry = self.cache.get_json(key, "selector")
+            if entry is not None:
+                return entry["connected"], entry["living_area"]
+
+        regions = record.regions()
+        connected = self._is_connected(regions)
+        living_area = 0
+        if connected:
+            # measure living room area
+            living_area = self._largest_living_area(regions)
+            # If for some reason we can't measure living area, treat as 0
+            if living_area is None:
+                living_area = 0
+
+        if key is not None:
+            self.cache.put_json(key, {"connected": connected, "living_area": living_area})
+        return connected, living_area
 
     def is_connected(self, image):
         """
-        Return True if there's exactly 1 large contour => connected.
+        Return True if there's exactly 1 large black component => connected.
         1) Convert to gray
         2) Invert threshold: black => white
-        3) Count how many large contours exist
+        3) Count how many large external components exist
         """
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        _, binimg = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-        cnts, _ = cv2.findContours(binimg, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return self._is_connected(compute_plan_regions(image))
 
-        # Count how many have area > self.min_contour_area
-        large = [c for c in cnts if cv2.contourArea(c) > self.min_contour_area]
-        return (len(large) == 1)
+    def _is_connected(self, regions):
+        # Count how many have a contour area above self.min_contour_area
+        return len(regions.boundary.large(self.min_contour_area)) == 1
 
     def get_living_room_area(self, image):
         """
@@ -101,35 +209,13 @@ class PerfectPlanSelector:
         Steps:
           1) Get the largest black boundary => mask the interior
           2) Among the interior, consider any pixel with b>=240,g>=240,r>=240 => white => living
-          3) Find external contours => largest is living area => return its area
+          3) Label the white components => contour area of the largest is the living area
         """
-        h, w = image.shape[:2]
+        return self._largest_living_area(compute_plan_regions(image))
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        # black => invert => largest boundary
-        _, black_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-        cnts, _ = cv2.findContours(black_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not cnts:
+    @staticmethod
+    def _largest_living_area(regions):
+        largest = regions.largest_living()
+        if largest is None:
             return 0
-
-        # pick largest black boundary
-        largest = max(cnts, key=cv2.contourArea)
-        floorplan_mask = np.zeros_like(black_mask)
-        cv2.drawContours(floorplan_mask, [largest], -1, 255, -1)
-
-        # build living_mask => strictly white inside floorplan
-        living_mask = np.zeros((h, w), dtype=np.uint8)
-        for y in range(h):
-            for x in range(w):
-                if floorplan_mask[y, x] == 255:
-                    b, g, r = image[y, x]
-                    if b>=240 and g>=240 and r>=240:
-                        living_mask[y, x] = 255
-
-        # find largest living contour => area
-        lcnts, _ = cv2.findContours(living_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not lcnts:
-            return 0
-
-        largest_lr = max(lcnts, key=cv2.contourArea)
-        return cv2.contourArea(largest_lr)
+        return regions.living.area(largest)
@@ -0,0 +1,248 @@
+import cv2
+import numpy as np
+
+
+class PlanAnalysis:
+    """
+    Metrics of one floorplan dict, computed on the integer grid the rooms live on.
+    Areas are in square plan units, lengths in plan units and points in plan
+    coordinates (origin bottom-left, like the matplotlib renders).
+
+      - connected:          the fused footprint is one hole-free polygon
+                            (the render has exactly one black boundary)
+      - rooms_touching:     the rooms alone form one 4-connected block (no closing needed)
+      - closing_distance:   buffer distance the visualizer needs to fuse the footprint
+      - living_regions:     [(area, (cx, cy)), ...] of every white region inside the
+                            boundary, largest first
+      - living_area:        area of the largest living region (0 if none)
+      - living_centroid:    centroid of the largest living region (None if none)
+      - free_wall_length:   boundary of the largest living region that is exterior
+                            wall rather than a room wall (where stairs can go)
+      - room_wall_length:   boundary of the largest living region shared with rooms
+      - footprint_area:     area enclosed by the fused boundary
+    """
+
+    def __init__(self, connected, rooms_touching, closing_distance, living_regions,
+                 free_wall_length, room_wall_length, footprint_area):
+        self.connected = connected
+        self.rooms_touching = rooms_touching
+        self.closing_distance = closing_distance
+        self.living_regions = living_regions
+        self.free_wall_length = free_wall_length
+        self.room_wall_length = room_wall_length
+        self.footprint_area = footprint_area
+
+    @property
+    def living_room_count(self):
+        return len(self.living_regions)
+
+    @property
+    def living_area(self):
+        return self.living_regions[0][0] if self.living_regions else 0
+
+    @property
+    def living_centroid(self):
+        return self.living_regions[0][1] if self.living_regions else None
+
+    def as_dict(self):
+        return {
+            "connected": self.connected,
+            "rooms_touching": self.rooms_touching,
+            "closing_distance": self.closing_distance,
+            "living_regions": [[area, list(c)] for area, c in self.living_regions],
+            "living_area": self.living_area,
+            "living_centroid": list(self.living_centroid) if self.living_centroid else None,
+            "free_wall_length": self.free_wall_length,
+            "room_wall_length": self.room_wall_length,
+            "footprint_area": self.footprint_area,
+        }
+
+
+def room_items(floorplan):
+    """
+    Yield (room_name, (x, y, w, h)) for every room rectangle in a floorplan dict.
+    "Stairs" is skipped: it is stored in image pixels, not plan units.
+    Negative sizes are normalized the same way shapely treats the polygon.
+    """
+    for name, rect in floorplan.items():
+        if name == "Stairs" or not isinstance(rect, dict):
+            continue
+        x, y, w, h = rect["x"], rect["y"], rect["width"], rect["height"]
+        if w < 0:
+            x, w = x + w, -w
+        if h < 0:
+            y, h = y + h, -h
+        yield name, (x, y, w, h)
+
+
+def is_integral_plan(floorplan):
+    return all(float(v).is_integer() for _, r in room_items(floorplan) for v in r)
+
+
+class PlanGrid:
+    """
+    Rasterization of a floorplan dict onto its unit grid.
+    Cell (row, col) covers plan [col+ox, col+ox+1] x [row+oy, row+oy+1].
+    The grid spans the floor bounds plus any rooms sticking out of them.
+    """
+
+    def __init__(self, floorplan, width, height):
+        rects = [r for _, r in room_items(floorplan)]
+        for r in rects:
+            if not all(float(v).is_integer() for v in r):
+                raise ValueError("Grid analysis needs integer room coordinates.")
+        rects = [tuple(int(v) for v in r) for r in rects]
+
+        self.ox = min([0] + [x for x, _, _, _ in rects])
+        self.oy = min([0] + [y for _, y, _, _ in rects])
+        x_end = max([width] + [x + w for x, _, w, _ in rects])
+        y_end = max([height] + [y + h for _, y, _, h in rects])
+
+        self.occupied = np.zeros((y_end - self.oy, x_end - self.ox), dtype=np.uint8)
+        for x, y, w, h in rects:
+            self.occupied[y - self.oy:y - self.oy + h, x - self.ox:x - self.ox + w] = 1
+
+        # cells inside the drawing bounds (living area = bounds minus rooms)
+        self.in_bounds = np.zeros_like(self.occupied)
+        self.in_bounds[-self.oy:height - self.oy, -self.ox:width - self.ox] = 1
+
+    def cell_center(self, row, col):
+        return (col + self.ox + 0.5, row + self.oy + 0.5)
+
+
+def close_cells(mask, dist):
+    """
+    Morphological closing of a cell mask by a square of half-size `dist` on the
+    unbounded plane. On integer rectangles this is exactly
+    shapely's buffer(dist, join_style=2).buffer(-dist, join_style=2).
+    """
+    if dist <= 0:
+        return mask.copy()
+    # cv2 border copy: np.pad costs more than the closing itself on plan-sized grids
+    padded = cv2.copyMakeBorder(mask, dist, dist, dist, dist, cv2.BORDER_CONSTANT, value=0)
+    kernel = np.ones((2 * dist + 1, 2 * dist + 1), dtype=np.uint8)
+    grown = cv2.dilate(padded, kernel, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    closed = cv2.erode(grown, kernel, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    return closed[dist:-dist, dist:-dist]
+
+
+def is_single_hole_free(mask):
+    """
+    True if the cells form one polygon without interior rings:
+    one 4-connected block whose complement is all reachable from outside.
+    """
+    n_fg, _ = cv2.connectedComponents(mask, connectivity=4)
+    if n_fg != 2:
+        return False
+    background = cv2.copyMakeBorder(1 - mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=1)
+    n_bg, _ = cv2.connectedComponents(background, connectivity=4)
+    return n_bg == 2
+
+
+def fuse_footprint(occupied, max_dist=50):
+    """
+    Mirror the visualizer's fused boundary: close the room union with growing
+    distance until it is a single hole-free polygon.
+    Returns (fused_mask, distance_used). If nothing fuses within max_dist,
+    the last closing is returned (the render then has several boundaries).
+    """
+    fused = occupied
+    if not occupied.any():
+        return fused, 0
+    # Once the square is as large as the grid, a cell is filled iff rooms lie in
+    # all four of its quadrants: bigger distances give the same closing.
+    last = min(max_dist, max(occupied.shape))
+    for dist in range(0, last + 1):
+        fused = close_cells(occupied, dist)
+        if is_single_hole_free(fused):
+            return fused, dist
+    return fused, max_dist + 1
+
+
+class PlanAnalyzer:
+    """
+    Computes connectivity, living-area size and centroid and free wall space
+    straight from {room: {x, y, width, height}} dicts, with no rendering.
+    """
+
+    def __init__(self, width=20, height=20, max_closing=50):
+        self.width = width
+        self.height = height
+        self.max_closing = max_closing
+
+    def analyze(self, floorplan):
+        grid = PlanGrid(floorplan, self.width, self.height)
+        occupied = grid.occupied
+
+        rooms_touching = bool(occupied.any()) and is_single_hole_free(occupied)
+        fused, dist = fuse_footprint(occupied, self.max_closing)
+        connected = bool(occupied.any()) and dist <= self.max_closing
+
+        # living => inside the boundary, inside the drawing, not a room
+        living = (fused & grid.in_bounds & (1 - occupied)).astype(np.uint8)
+        n, labels, stats, centroids = cv2.connectedComponentsWithStats(living, connectivity=4)
+        regions = []
+        for i in range(1, n):
+            area = int(stats[i, cv2.CC_STAT_AREA])
+            cx = float(centroids[i][0]) + grid.ox + 0.5
+            cy = float(centroids[i][1]) + grid.oy + 0.5
+            regions.append((area, (cx, cy), i))
+        regions.sort(key=lambda r: r[0], reverse=True)
+
+        free_wall = 0
+        room_wall = 0
+        if regions:
+            largest = (labels == regions[0][2]).astype(np.uint8)
+            free_wall, room_wall = self._wall_lengths(largest, occupied)
+
+        return PlanAnalysis(
+            connected=connected,
+            rooms_touching=rooms_touching,
+            closing_distance=dist,
+            living_regions=[(area, c) for area, c, _ in regions],
+            free_wall_length=free_wall,
+            room_wall_length=room_wall,
+            footprint_area=int(fused.sum()),
+        )
+
+    @staticmethod
+    def _wall_lengths(region, occupied):
+        """
+        Count the unit edges around `region`: those facing a room are room walls,
+        every other edge (boundary / outside) is free wall.
+        """
+        padded = np.pad(region, 1)
+        rooms = np.pad(occupied, 1)
+        free_wall = 0
+        room_wall = 0
+        for shift, axis in ((1, 0), (-1, 0), (1, 1), (-1, 1)):
+            neighbor_in_region = np.roll(padded, shift, axis=axis)
+            neighbor_is_room = np.roll(rooms, shift, axis=axis)
+            edge = (padded == 1) & (neighbor_in_region == 0)
+            room_wall += int(np.count_nonzero(edge & (neighbor_is_room == 1)))
+            free_wall += int(np.count_nonzero(edge & (neighbor_is_room == 0)))
+        return free_wall, room_wall
+
+    def select(self, named_plans, k=3):
+        """
+        Pick the plans worth rendering, with the same preferences as the image stages:
+          1) connected (RoomTypeDetector / PerfectPlanSelector.is_connected)
+          2) exactly one living room, falling back to others if too few qualify
+          3) largest living area first (PerfectPlanSelector)
+        :param named_plans: iterable of (name, floorplan_dict)
+        :return: up to k tuples (name, floorplan_dict, PlanAnalysis)
+        """
+        one_lr = []
+        others = []
+        for name, plan in named_plans:
+            analysis = self.analyze(plan)
+            if not analysis.connected:
+                continue
+            if analysis.living_room_count == 1:
+                one_lr.append((name, plan, analysis))
+            else:
+                others.append((name, plan, analysis))
+
+        one_lr.sort(key=lambda x: x[2].living_area, reverse=True)
+        others.sort(key=lambda x: x[2].living_area, reverse=True)
+        return (one_lr + others)[:k]
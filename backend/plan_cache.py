@@ -0,0 +1,161 @@
+import os
+import json
+import hashlib
+
+try:
+    from .plan_hashing import plan_hash
+    from .workspace import atomic_write_bytes
+except ImportError:
+    from plan_hashing import plan_hash
+    from workspace import atomic_write_bytes
+
+DEFAULT_CACHE_DIR = ".plan_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PlanCache:
+    """
+    Persistent, content-addressed store of what gets derived from floorplans:
+      - renders:  PNG bytes keyed by plan_hash(plan, width, height, backend, palette)
+      - analyses: small JSON results (living-area metrics, stairs placement) keyed
+                  by the hash of the image they were measured on plus the stage
+                  parameters, so they also apply to PNGs loaded from disk.
+
+    Entries live in <root>/<key[:2]>/<key>.<ext>. Every hit refreshes the file's
+    mtime; once the cache grows past max_bytes the least recently used entries
+    are deleted. hits / misses count lookups per kind ("render", "selector", ...).
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = {}
+        self.misses = {}
+        self._size = None
+        os.makedirs(self.root, exist_ok=True)
+
+    # ----------------------------------------------------------
+    # Keys
+    # ----------------------------------------------------------
+    @staticmethod
+    def render_key(floorplan, width, height, backend, palette):
+        return plan_hash(floorplan, kind="render", width=width, height=height,
+                         backend=backend, palette=palette)
+
+    @staticmethod
+    def image_key(image, kind, **params):
+        """
+        Key of a result computed from a decoded image (BGR array).
+        """
+        digest = hashlib.sha1()
+        digest.update(str(image.shape).encode("utf-8"))
+        digest.update(image.tobytes())
+        return plan_hash({"image": digest.hexdigest()}, kind=kind, **params)
+
+    # ----------------------------------------------------------
+    # Lookups
+    # ----------------------------------------------------------
+    def get_bytes(self, key, kind, ext=".png"):
+        path = self._path(key, ext)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self._count(self.misses, kind)
+            return None
+        self._touch(path)
+        self._count(self.hits, kind)
+        return data
+
+    def put_bytes(self, key, data, ext=".png"):
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self._size is not None and os.path.exists(path):
+            self._size -= os.path.getsize(path)
+        # write + rename => readers never see half-written entries
+        atomic_write_bytes(path, data)
+        if self._size is not None:
+            self._size += len(data)
+        self.evict()
+
+    def get_json(self, key, kind):
+        data = self.get_bytes(key, kind, ext=".json")
+        return json.loads(data.decode("utf-8")) if data is not None else None
+
+    def put_json(self, key, value):
+        self.put_bytes(key, json.dumps(value).encode("utf-8"), ext=".json")
+
+    # ----------------------------------------------------------
+    # Bookkeeping
+    # ----------------------------------------------------------
+    def stats(self):
+        """
+        {kind: {"hits", "misses", "hit_rate"}} for every kind looked up so far.
+        """
+        result = {}
+        for kind in sorted(set(self.hits) | set(self.misses)):
+            hits = self.hits.get(kind, 0)
+            misses = self.misses.get(kind, 0)
+            result[kind] = {"hits": hits, "misses": misses,
+                            "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+        return result
+
+    def add_counts(self, kind, hits=0, misses=0):
+        """
+        Add lookups made through another PlanCache on the same root (e.g. in a worker process).
+        """
+        self.hits[kind] = self.hits.get(kind, 0) + hits
+        self.misses[kind] = self.misses.get(kind, 0) + misses
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+        """
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        if self._size <= self.max_bytes:
+            return
+        for path, size, _ in sorted(self._entries(), key=lambda e: e[2]):
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            os.remove(path)
+        self._size = 0
+
+    def _entries(self):
+        """
+        (path, size, mtime) of every cache entry.
+        """
+        entries = []
+        for sub in os.listdir(self.root):
+            sub_dir = os.path.join(self.root, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for fname in os.listdir(sub_dir):
+                if fname.endswith(".tmp"):
+                    continue
+                path = os.path.join(sub_dir, fname)
+                st = os.stat(path)
+                entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], key + ext)
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _count(counter, kind):
+        counter[kind] = counter.get(kind, 0) + 1
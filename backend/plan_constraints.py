@@ -0,0 +1,119 @@
+import numpy as np
+
+# Rects are arrays of [..., rooms, 4] = [x, y, width, height]; every predicate
+# returns a [..., rooms, rooms] boolean matrix, the vectorized form of the
+# FloorplanGenerator static predicates with the same names.
+
+
+def _edges(rects):
+    rects = np.asarray(rects)
+    left = rects[..., 0]
+    bottom = rects[..., 1]
+    right = left + rects[..., 2]
+    top = bottom + rects[..., 3]
+    # [..., n, 1] against [..., 1, n]
+    return (left[..., :, None], right[..., :, None], bottom[..., :, None], top[..., :, None],
+            left[..., None, :], right[..., None, :], bottom[..., None, :], top[..., None, :])
+
+
+def pairwise_overlap(rects):
+    """
+    check_overlap for every pair (the diagonal is False).
+    """
+    l1, r1, b1, t1, l2, r2, b2, t2 = _edges(rects)
+    overlap = ~((r1 <= l2) | (r2 <= l1) | (t1 <= b2) | (t2 <= b1))
+    return _off_diagonal(overlap)
+
+
+def pairwise_min_gap(rects, min_gap=3):
+    """
+    check_min_gap for every pair: True where the two rooms are at least
+    `min_gap` apart along x or y (the diagonal is True).
+    """
+    l1, r1, b1, t1, l2, r2, b2, t2 = _edges(rects)
+    gap = ((r1 + min_gap <= l2) | (r2 + min_gap <= l1) |
+           (t1 + min_gap <= b2) | (t2 + min_gap <= b1))
+    return gap | _eye_like(gap)
+
+
+def pairwise_flush_adjacent(rects, eps=0.0001):
+    """
+    is_flush_adjacent for every pair (the diagonal is False).
+    """
+    l1, r1, b1, t1, l2, r2, b2, t2 = _edges(rects)
+    y_overlap = (np.minimum(t1, t2) - np.maximum(b1, b2)) > 0
+    x_overlap = (np.minimum(r1, r2) - np.maximum(l1, l2)) > 0
+    vertical = ((np.abs(r1 - l2) < eps) | (np.abs(r2 - l1) < eps)) & y_overlap
+    horizontal = ((np.abs(t1 - b2) < eps) | (np.abs(t2 - b1) < eps)) & x_overlap
+    return _off_diagonal(vertical | horizontal)
+
+
+def _eye_like(matrix):
+    n = matrix.shape[-1]
+    return np.broadcast_to(np.eye(n, dtype=bool), matrix.shape)
+
+
+def _off_diagonal(matrix):
+    return matrix & ~_eye_like(matrix)
+
+
+class RoomConstraints:
+    """
+    The placement rules initialize_population enforces, as violation counts that
+    can be evaluated for one plan or a whole population at once:
+      - no two rooms overlap
+      - no two bedrooms share a wall (is_flush_adjacent)
+      - kitchen / garage / other rooms keep `min_gap` from every room (check_min_gap)
+      - with attached washrooms, every washroom shares a wall with a bedroom
+      - every room has a positive width and height and lies inside the floor
+        (rooms sticking out get clipped in the render, which breaks the boundary)
+    """
+
+    def __init__(self, rooms, attached_washroom=False, min_gap=3,
+                 floor_width=20, floor_height=20):
+        self.rooms = list(rooms)
+        self.attached_washroom = attached_washroom
+        self.min_gap = min_gap
+        self.floor_width = floor_width
+        self.floor_height = floor_height
+
+        is_bedroom = np.array(["Bedroom" in r for r in self.rooms])
+        is_washroom = np.array(["Washroom" in r for r in self.rooms])
+        needs_gap = ~(is_bedroom | is_washroom)
+
+        # Upper triangle only => every unordered pair is counted once.
+        upper = np.triu(np.ones((len(self.rooms), len(self.rooms)), dtype=bool), k=1)
+        self.pairs = upper
+        self.bedroom_pairs = upper & is_bedroom[:, None] & is_bedroom[None, :]
+        self.gap_pairs = upper & (needs_gap[:, None] | needs_gap[None, :])
+        self.is_bedroom = is_bedroom
+        self.is_washroom = is_washroom
+
+    def rects(self, floorplan):
+        return np.array([[floorplan[r]["x"], floorplan[r]["y"],
+                          floorplan[r]["width"], floorplan[r]["height"]] for r in self.rooms])
+
+    def violations(self, rects):
+        """
+        Number of broken rules for rects of shape [rooms, 4] or [pop, rooms, 4].
+        """
+        rects = np.asarray(rects)
+        overlap = pairwise_overlap(rects) & self.pairs
+        count = overlap.sum(axis=(-1, -2))
+        count = count + (pairwise_flush_adjacent(rects) & self.bedroom_pairs).sum(axis=(-1, -2))
+        # a pair that already overlaps is not counted twice for the gap rule
+        too_close = ~pairwise_min_gap(rects, self.min_gap) & self.gap_pairs & ~overlap
+        count = count + too_close.sum(axis=(-1, -2))
+        count = count + ((rects[..., 2] <= 0) | (rects[..., 3] <= 0)).sum(axis=-1)
+        outside = ((rects[..., 0] < 0) | (rects[..., 1] < 0) |
+                   (rects[..., 0] + rects[..., 2] > self.floor_width) |
+                   (rects[..., 1] + rects[..., 3] > self.floor_height))
+        count = count + outside.sum(axis=-1)
+        if self.attached_washroom and self.is_bedroom.any() and self.is_washroom.any():
+            flush = pairwise_flush_adjacent(rects)
+            to_bedroom = (flush & self.is_bedroom[None, :]).any(axis=-1)
+            count = count + (~to_bedroom & self.is_washroom).sum(axis=-1)
+        return count
+
+    def plan_violations(self, floorplan):
+        return int(self.violations(self.rects(floorplan)))
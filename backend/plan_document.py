@@ -0,0 +1,203 @@
+# plan_document.py
+#
+# The structured record of one floorplan that every stage reads and writes,
+# next to the image and the legacy flat JSON:
+#
+#   <base>.png        the render / annotated image
+#   <base>.json       {room: {x, y, width, height}} in plan units (what the
+#                     renderers, the API and older code read; unchanged)
+#   <base>.plan.json  the PlanDocument below
+#
+#   {
+#     "format": "floorplan-document", "version": 1,
+#     "rooms":  {room: {x, y, width, height}},            plan units
+#     "stairs": {x, y, width, height} | null,             image pixels, the corners
+#                                                         cv2.rectangle was given
+#     "porch":  {"color": "#FBF5F1", "label": [x, y]} | null,
+#     "labels": {text: [[x, y], ...]},                     image pixels, the point a
+#                                                         label is centered around
+#                                                         (drawn at x - 20, y)
+#     "provenance": [{"stage": ..., ...}, ...]             oldest first
+#   }
+#
+# Stages hand stairs and label positions on through the document instead of
+# decoding a PNG and thresholding for them again; recovering them from the
+# pixels (find_stairs) is only the fallback for plans written without one.
+
+import os
+import copy
+import json
+
+import cv2
+import numpy as np
+
+try:
+    from .plan_regions import Regions
+    from .workspace import atomic_write_json
+except ImportError:
+    from plan_regions import Regions
+    from workspace import atomic_write_json
+
+DOCUMENT_FORMAT = "floorplan-document"
+DOCUMENT_VERSION = 1
+DOCUMENT_SUFFIX = ".plan.json"
+
+# BGR color PrettyFloorplanMaker draws the stairs in
+STAIRS_COLOR = (200, 100, 200)
+PORCH_HEX = "#FBF5F1"
+
+
+class PlanDocument:
+    """
+    Rooms (plan units) plus what the image stages found or drew on top of them
+    (pixels): stairs, porch, text labels, and which stage did what.
+    """
+
+    def __init__(self, rooms=None, stairs=None, porch=None, labels=None, provenance=None):
+        self.rooms = dict(rooms or {})
+        self.stairs = dict(stairs) if stairs else None
+        self.porch = dict(porch) if porch else None
+        self.labels = {text: [list(p) for p in points] for text, points in (labels or {}).items()}
+        self.provenance = list(provenance or [])
+
+    @classmethod
+    def from_legacy(cls, floorplan):
+        """
+        Document of a flat plan dict; a pixel-space "Stairs" entry (as the maker
+        and the enhancer write it) becomes the stairs.
+        """
+        floorplan = floorplan or {}
+        rooms = {k: v for k, v in floorplan.items() if k != "Stairs"}
+        return cls(rooms, stairs=floorplan.get("Stairs"))
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        :raises ValueError: if data is not a document this code can read.
+        """
+        if data.get("format") != DOCUMENT_FORMAT:
+            raise ValueError("Not a floorplan document.")
+        if data.get("version", 0) > DOCUMENT_VERSION:
+            raise ValueError(f"Floorplan document version {data['version']} is newer than "
+                             f"{DOCUMENT_VERSION}.")
+        return cls(data.get("rooms"), data.get("stairs"), data.get("porch"),
+                   data.get("labels"), data.get("provenance"))
+
+    def to_dict(self):
+        return {
+            "format": DOCUMENT_FORMAT,
+            "version": DOCUMENT_VERSION,
+            "rooms": self.rooms,
+            "stairs": self.stairs,
+            "porch": self.porch,
+            "labels": self.labels,
+            "provenance": self.provenance,
+        }
+
+    def legacy_dict(self):
+        """
+        The flat dict older readers know: rooms, plus "Stairs" (pixels) if known.
+        """
+        floorplan = dict(self.rooms)
+        if self.stairs is not None:
+            floorplan["Stairs"] = dict(self.stairs)
+        return floorplan
+
+    def copy(self):
+        return PlanDocument(copy.deepcopy(self.rooms), self.stairs, self.porch,
+                            self.labels, copy.deepcopy(self.provenance))
+
+    def label(self, text):
+        """
+        First (x, y) the label `text` is centered around, or None.
+        """
+        points = self.labels.get(text)
+        return tuple(points[0]) if points else None
+
+    def set_label(self, text, points):
+        self.labels[text] = [[int(v) for v in p] for p in points]
+
+    def add_provenance(self, stage, **info):
+        self.provenance.append(dict(stage=stage, **info))
+
+    def __repr__(self):
+        return (f"PlanDocument({len(self.rooms)} rooms, stairs={self.stairs}, "
+                f"labels={sorted(self.labels)})")
+
+
+def document_path(directory, base_name):
+    return os.path.join(directory, base_name + DOCUMENT_SUFFIX)
+
+
+def write_document(directory, base_name, document, writer=None):
+    """
+    Save `document` as <base_name>.plan.json in directory, atomically.
+    :param writer: optional image_io.ImageWriter to write behind with.
+    :return: the path written
+    """
+    path = document_path(directory, base_name)
+    if writer is not None:
+        writer.write_json(path, document.to_dict())
+    else:
+        atomic_write_json(path, document.to_dict())
+    return path
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def read_document(directory, base_name, image=None, recover=True):
+    """
+    The PlanDocument of <base_name> in directory:
+      1) <base>.plan.json, as long as its rooms are the ones in <base>.json
+         (a flat JSON copied over it since means the document is stale);
+      2) otherwise a document made from <base>.json;
+      3) still no stairs => recovered from the pixels (`image`, or <base>.png
+         decoded here) when `recover` is set.
+    :return: PlanDocument, or None if there is neither file.
+    """
+    legacy = _read_json(os.path.join(directory, base_name + ".json"))
+    data = _read_json(document_path(directory, base_name))
+    document = None
+    if data is not None:
+        try:
+            document = PlanDocument.from_dict(data)
+        except ValueError:
+            document = None
+    if document is not None and legacy is not None:
+        if document.rooms != {k: v for k, v in legacy.items() if k != "Stairs"}:
+            document = None
+    if document is None:
+        if legacy is None:
+            return None
+        document = PlanDocument.from_legacy(legacy)
+
+    if document.stairs is None and recover:
+        if image is None:
+            image = cv2.imread(os.path.join(directory, base_name + ".png"))
+        if image is not None:
+            document.stairs = find_stairs(image)
+            if document.stairs is not None:
+                document.add_provenance("recovered", stairs="pixels")
+    return document
+
+
+def find_stairs(image, color=STAIRS_COLOR, tol=10, min_area=10):
+    """
+    Pixel fallback: the largest region within `tol` of the stairs color.
+    :return: {x, y, width, height} in the document convention (the corners
+             cv2.rectangle was given, so the filled box is width + 1 pixels
+             wide), or None.
+    """
+    lower = np.array([max(c - tol, 0) for c in color], dtype=np.uint8)
+    upper = np.array([min(c + tol, 255) for c in color], dtype=np.uint8)
+    stairs = Regions(cv2.inRange(image, lower, upper))
+    largest = stairs.largest()
+    if largest is None or stairs.area(largest) < min_area:
+        return None
+    x, y, w, h = stairs.box(largest)
+    return {"x": x, "y": y, "width": w - 1, "height": h - 1}
@@ -0,0 +1,30 @@
+import json
+import hashlib
+
+
+def plan_key(floorplan):
+    """
+    Cheap canonical, hashable key of a floorplan's geometry: the sorted
+    (room, x, y, width, height) tuples. Room order and extra flags such as
+    "has_washroom_attached" do not change the key.
+    """
+    return tuple(sorted(
+        (name, rect["x"], rect["y"], rect["width"], rect["height"])
+        for name, rect in floorplan.items()
+    ))
+
+
+def canonical_plan_json(floorplan):
+    """
+    Stable JSON text of a whole floorplan dict (all keys, sorted, no whitespace).
+    """
+    return json.dumps(floorplan, sort_keys=True, separators=(",", ":"))
+
+
+def plan_hash(floorplan, **params):
+    """
+    Content hash (hex sha1) of a floorplan dict plus any extra parameters that
+    change what is derived from it, e.g. plan_hash(fp, width=20, height=20).
+    """
+    payload = canonical_plan_json({"plan": floorplan, "params": params})
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,378 @@
+import os
+import json
+import time
+import uuid
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .floorplan_generator import FloorplanGenerator
+    from .plan_analysis import PlanAnalyzer
+    from .batch_generation import generate_plans, render_plans
+    from .plan_pipeline import PlanPipeline
+    from .plan_cache import PlanCache
+    from .plan_record import clear_stage_files
+    from .plan_hashing import plan_hash
+    from .first_floor_batch import first_floor_options, generate_first_floor_batch, option_document
+    from .plan_document import write_document
+    from .workspace import (Workspace, DEFAULT_WORKSPACE_ROOT, DEFAULT_TTL_SECONDS,
+                            atomic_write_json, collect_stale_workspaces, valid_id)
+except ImportError:
+    from floorplan_generator import FloorplanGenerator
+    from plan_analysis import PlanAnalyzer
+    from batch_generation import generate_plans, render_plans
+    from plan_pipeline import PlanPipeline
+    from plan_cache import PlanCache
+    from plan_record import clear_stage_files
+    from plan_hashing import plan_hash
+    from first_floor_batch import first_floor_options, generate_first_floor_batch, option_document
+    from plan_document import write_document
+    from workspace import (Workspace, DEFAULT_WORKSPACE_ROOT, DEFAULT_TTL_SECONDS,
+                           atomic_write_json, collect_stale_workspaces, valid_id)
+
+# Job records live next to the workspaces, so every server process sees every job
+JOBS_SUBDIR = "_jobs"
+
+# First-floor options precomputed for the ground plans a job shows ({ground plan_hash: options})
+FIRST_FLOOR_OPTIONS = "first_floor_options.json"
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def rooms_from_specs(bedrooms, washrooms, has_garage):
+    """
+    Room list the generator expects, e.g. (2, 1, True) ->
+    ["Bedroom_1", "Bedroom_2", "Washroom_1", "Kitchen", "Garage"].
+    """
+    rooms = [f"Bedroom_{b}" for b in range(1, bedrooms + 1)]
+    rooms += [f"Washroom_{w}" for w in range(1, washrooms + 1)]
+    rooms.append("Kitchen")
+    if has_garage:
+        rooms.append("Garage")
+    return rooms
+
+
+def run_ground_floor_job(workspace, specs, num_floorplans=5, seed=None, renderer="matplotlib",
+                         cache_dir=None, output="pretty"):
+    """
+    Job body: GA candidates -> PlanAnalyzer -> render -> detector -> selector ->
+    prettifier, all in memory; the final plans are written to the workspace
+    folder `output` (the job's own, under 'pretty') as plan1..plan3 (PNG + JSON),
+    like main.py does, together with the first-floor options of each (see
+    run_first_floor_job).
+    :param specs: {"bedrooms", "washrooms", "has_garage", "has_attachedwashroom"}
+    :return: {"plans": [base names], "seed": ...}
+    """
+    seed = seed if seed is not None else random.randrange(2 ** 32)
+    rooms = rooms_from_specs(specs.get("bedrooms", 2), specs.get("washrooms", 1),
+                             specs.get("has_garage", False))
+    width = FloorplanGenerator.FLOORPLAN_WIDTH
+    height = FloorplanGenerator.FLOORPLAN_HEIGHT
+
+    candidates, _ = generate_plans(rooms, specs.get("has_attachedwashroom", False),
+                                   num_floorplans, workers=1, base_seed=seed)
+    survivors = PlanAnalyzer(width, height).select(candidates, k=3)
+
+    cache = PlanCache(cache_dir) if cache_dir else None
+    pipeline = PlanPipeline(width, height, renderer=renderer, cache=cache, workspace=workspace)
+    pipeline.run([(base_name, fp_dict) for base_name, fp_dict, _ in survivors])
+    paths = pipeline.write_final(output)
+
+    # Precompute the first floors of every plan the user is about to see
+    final = pipeline.stages["pretty"]
+    options, _ = generate_first_floor_batch([(r.name, r.plan_document()) for r in final],
+                                            width, height)
+    atomic_write_json(workspace.file(output, FIRST_FLOOR_OPTIONS),
+                      {plan_hash(r.plan): options[r.name] for r in final})
+    return {"plans": [os.path.splitext(os.path.basename(p))[0] for p in paths], "seed": seed}
+
+
+def run_first_floor_job(workspace, ground_plan, base_name, renderer="matplotlib", cache_dir=None,
+                        ground_output="pretty", output="output_floor1"):
+    """
+    Job body: the FirstFloorPlanGenerator approaches for one ground-floor plan
+    (distinct ones only), written to the workspace folder `output` (the job's
+    own, under 'output_floor1') as <base_name>_approach<N> (PNG + JSON + plan
+    document). The options the ground-floor job precomputed for this plan
+    (which carry its stairs and living-room label) are used when there are any.
+    :param ground_output: workspace folder of the ground-floor job the plan comes from.
+    :return: {"plans": [base names]}
+    """
+    width = FloorplanGenerator.FLOORPLAN_WIDTH
+    height = FloorplanGenerator.FLOORPLAN_HEIGHT
+    options = None
+    options_path = workspace.file(ground_output, FIRST_FLOOR_OPTIONS)
+    if os.path.exists(options_path):
+        with open(options_path, "r") as f:
+            options = json.load(f).get(plan_hash(ground_plan))
+    if options is None:
+        options = first_floor_options(ground_plan, width, height)
+
+    floor1_dir = workspace.dir(output)
+    clear_stage_files(floor1_dir, (".png", ".json"))
+    named = [(f"{base_name}_{option['suffix']}", option["plan"]) for option in options]
+    render_plans(named, floor1_dir, width, height, renderer=renderer,
+                 cache=PlanCache(cache_dir) if cache_dir else None)
+    for (name, _), option in zip(named, options):
+        write_document(floor1_dir, name, option_document(option, plan_hash(ground_plan)))
+    return {"plans": [name for name, _ in named]}
+
+
+def run_library_top_up_job(workspace, library_root, specs, count, renderer="matplotlib",
+                           cache_dir=None):
+    """
+    Job body: generate `count` more plans for one spec into the PlanLibrary
+    (the workspace only hosts the intermediate stage folders).
+    :return: {"added": number of new plans}
+    """
+    try:
+        from .plan_library import PlanLibrary
+    except ImportError:
+        from plan_library import PlanLibrary
+    cache = PlanCache(cache_dir) if cache_dir else None
+    added = PlanLibrary(library_root).top_up(specs, count, renderer=renderer, cache=cache,
+                                             workspace=workspace)
+    return {"added": added}
+
+
+# What each job kind runs and which workspace stage its output folders go under
+JOB_KINDS = {
+    "ground_floor": (run_ground_floor_job, "pretty"),
+    "first_floor": (run_first_floor_job, "output_floor1"),
+    "library_top_up": (run_library_top_up_job, None),
+}
+
+
+class PlanJob:
+    """
+    One submitted job: its id, the workspace it writes into, and how far it got.
+    Stored as a small JSON record, so any process can answer status queries.
+    Each job writes its plans into a folder of its own, <stage>/<job_id> inside
+    the workspace (`output`), so later jobs of the same session never replace them.
+    """
+
+    FIELDS = ("job_id", "kind", "workspace_id", "stage", "output", "status", "result", "error",
+              "submitted", "started", "finished")
+
+    def __init__(self, job_id, kind, workspace_id, stage):
+        self.job_id = job_id
+        self.kind = kind
+        self.workspace_id = workspace_id
+        self.stage = stage
+        self.output = os.path.join(stage, job_id) if stage else None
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["job_id"], data["kind"], data["workspace_id"], data["stage"])
+        for field in cls.FIELDS:
+            setattr(job, field, data.get(field))
+        return job
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path):
+        atomic_write_json(path, self.to_dict())
+
+
+def _run_job(record_path, kind, workspace, args):
+    """
+    Worker entry point: run one job body and keep its record up to date.
+    """
+    job = PlanJob.load(record_path)
+    job.status = RUNNING
+    job.started = time.time()
+    job.save(record_path)
+    workspace.touch()
+    try:
+        if job.output:
+            job.result = JOB_KINDS[kind][0](workspace, *args, output=job.output)
+        else:
+            job.result = JOB_KINDS[kind][0](workspace, *args)
+        job.status = DONE
+    except Exception as e:
+        job.status = FAILED
+        job.error = f"{type(e).__name__}: {e}"
+        print(f"Job {job.job_id} failed: {job.error}")
+    job.finished = time.time()
+    job.save(record_path)
+    workspace.touch()
+
+
+class PlanJobQueue:
+    """
+    Background plan generation: jobs run in a pool of worker processes, so a
+    slow GA run never blocks the web server and concurrent users run side by
+    side (up to `workers` at a time, the rest wait in the queue).
+
+    Every job writes into a Workspace (one per session) and its state is a
+    JSON record under <root>/_jobs, so status()/result() work from any server
+    process. submit_*() returns the job id immediately.
+    collect_garbage() removes workspaces (and their job records) unused for ttl_seconds.
+    """
+
+    def __init__(self, workers=2, root=DEFAULT_WORKSPACE_ROOT, renderer="matplotlib",
+                 cache_dir=None, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.workers = workers
+        self.root = root
+        self.renderer = renderer
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.jobs_dir = os.path.join(root, JOBS_SUBDIR)
+        self._lock = threading.Lock()
+        self._pool = None
+        # (library root, spec) -> id of the top-up job last submitted for it
+        self._top_ups = {}
+        self._top_up_lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _executor(self):
+        # created on first use => importing the app does not fork workers
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _record_path(self, job_id):
+        return os.path.join(self.jobs_dir, job_id + ".json")
+
+    def workspace(self, workspace_id=None):
+        """
+        The Workspace for a session id (a new one if None); marks it as used.
+        """
+        return Workspace(workspace_id, self.root)
+
+    def _submit(self, kind, workspace, *args):
+        job = PlanJob(uuid.uuid4().hex, kind, workspace.workspace_id, JOB_KINDS[kind][1])
+        record_path = self._record_path(job.job_id)
+        job.save(record_path)
+        with self._lock:
+            future = self._executor().submit(_run_job, record_path, kind, workspace, args)
+        future.add_done_callback(lambda f: self._check_crash(record_path, f))
+        return job.job_id
+
+    @staticmethod
+    def _check_crash(record_path, future):
+        # _run_job records its own failures; this catches dead worker processes
+        error = future.exception()
+        if error is None:
+            return
+        job = PlanJob.load(record_path)
+        if job is not None and job.status in (QUEUED, RUNNING):
+            job.status = FAILED
+            job.error = f"{type(error).__name__}: {error}"
+            job.finished = time.time()
+            job.save(record_path)
+
+    def submit_ground_floor(self, workspace, specs, num_floorplans=5, seed=None):
+        return self._submit("ground_floor", workspace, dict(specs), num_floorplans, seed,
+                            self.renderer, self.cache_dir)
+
+    def submit_first_floor(self, workspace, ground_plan, base_name, ground_job=None):
+        """
+        :param ground_job: PlanJob the plan was picked from; its precomputed
+                           first-floor options are reused when it has them.
+        """
+        ground_output = ground_job.output if ground_job is not None and ground_job.output else "pretty"
+        return self._submit("first_floor", workspace, dict(ground_plan), base_name,
+                            self.renderer, self.cache_dir, ground_output)
+
+    def submit_library_top_up(self, workspace, library_root, specs, count=3):
+        """
+        Queue a top-up of one spec, unless one for the same spec is still
+        queued or running (then its id is returned).
+        """
+        key = (library_root, tuple(sorted(specs.items())))
+        with self._top_up_lock:
+            job = self.get(self._top_ups.get(key))
+            if job is not None and job.status in (QUEUED, RUNNING):
+                return job.job_id
+            job_id = self._submit("library_top_up", workspace, library_root, dict(specs), count,
+                                  self.renderer, self.cache_dir)
+            self._top_ups[key] = job_id
+        return job_id
+
+    def complete(self, kind, workspace, fill):
+        """
+        Record a job done on the spot (e.g. plans copied from the PlanLibrary),
+        so the usual status/result/file routes serve it.
+        :param fill: fill(output_dir) writes the job's files into its own
+                     folder and returns the job's result dict.
+        """
+        job = PlanJob(uuid.uuid4().hex, kind, workspace.workspace_id, JOB_KINDS[kind][1])
+        job.result = fill(workspace.dir(job.output))
+        job.status = DONE
+        job.started = job.finished = job.submitted
+        job.save(self._record_path(job.job_id))
+        return job.job_id
+
+    def get(self, job_id):
+        """
+        PlanJob for an id, or None if it is unknown (or not a valid id).
+        """
+        if not valid_id(job_id):
+            return None
+        return PlanJob.load(self._record_path(job_id))
+
+    def status(self, job_id):
+        """
+        Job state as a JSON-friendly dict, or None for an unknown id.
+        """
+        job = self.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def result(self, job_id):
+        """
+        The job's result dict once it is done, else None.
+        """
+        job = self.get(job_id)
+        if job is None or job.status != DONE:
+            return None
+        return job.result
+
+    def output_dir(self, job):
+        """
+        Folder the job wrote its plans into (records from before per-job
+        folders have no `output` and point at the stage itself).
+        """
+        return os.path.join(self.root, job.workspace_id, job.output or job.stage)
+
+    def collect_garbage(self):
+        """
+        Delete stale workspaces, then the records of jobs whose workspace is gone.
+        :return: ids of the removed workspaces
+        """
+        removed = collect_stale_workspaces(self.root, self.ttl_seconds)
+        for fname in os.listdir(self.jobs_dir):
+            if not fname.endswith(".json"):
+                continue
+            job = PlanJob.load(os.path.join(self.jobs_dir, fname))
+            if job is None or not os.path.isdir(os.path.join(self.root, job.workspace_id)):
+                try:
+                    os.remove(os.path.join(self.jobs_dir, fname))
+                except OSError:
+                    pass
+        return removed
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
@@ -0,0 +1,250 @@
+from shapely.geometry import Polygon, LineString
+from shapely.ops import unary_union
+
+try:
+    from .adjacency_graph import RoomAdjacencyGraph
+except ImportError:
+    from adjacency_graph import RoomAdjacencyGraph
+
+# Room palette shared by every renderer. The detectors downstream key on the
+# rendered colors, so all backends must draw rooms with these (alpha 0.7 on white).
+ROOM_COLORS = {
+    "Garage":   "#C5D5E4",  # Soft pastel blue-gray for a calm and neutral garage
+    "Kitchen":  "#FFEDCC",  # Warm pastel peach (friendly and inviting kitchen)
+    "Bedroom":  "#FFB3C6",  # Soft pastel pink for a cozy and restful bedroom
+    "Washroom": "#C4E3CB",  # Mint pastel green for a fresh and clean feel
+    "Storage":  "#E9C9FF",  # Light lavender pastel for an elegant storage space
+    "Balcony":  "#FFF4B1",  # Warm pastel yellow for an open and sunny feel
+    "Study":    "#F6C5B6",  # Pastel coral peach to create a warm, productive atmosphere
+    "Door":     "#5C4033",  # Pastel purple for a soft, charming door presence
+    "Stairs":   "#A4D8C2"   # Mint-teal pastel for a refreshing yet distinct look
+}
+ROOM_ALPHA = 0.7
+UNKNOWN_ROOM_COLOR = "gray"
+
+
+class PlanLayout:
+    """
+    Renderer-independent geometry of one floorplan:
+      - rooms:  {room_name: shapely Polygon}
+      - union:  union of all rooms
+      - fused:  union closed until it is a single hole-free outline (black boundary)
+      - doors:  list of small door Polygons, one per room where a wall allows it
+      - graph:  RoomAdjacencyGraph the doors were picked from (None off the grid)
+    """
+
+    def __init__(self, rooms, union, fused, doors, graph=None):
+        self.rooms = rooms
+        self.union = union
+        self.fused = fused
+        self.doors = doors
+        self.graph = graph
+
+    @classmethod
+    def build(cls, floorplan, width, height):
+        rooms = room_polygons(floorplan)
+        union_poly = unary_union(list(rooms.values()))
+        graph = adjacency_graph(floorplan, width, height)
+        if graph is None:
+            # off-grid plan => iterative buffers and polygon intersections
+            fused_poly = fuse_boundary(union_poly)
+            if fused_poly.is_empty:
+                return cls(rooms, union_poly, fused_poly, [])
+            doors = place_doors(rooms, union_poly, fused_poly, width, height)
+            return cls(rooms, union_poly, fused_poly, doors)
+
+        fused_poly = close_union(union_poly, graph.closing_distance)
+        doors = []
+        for seg in graph.door_walls().values():
+            door_rect = construct_door_rectangle(LineString([seg.start, seg.end]))
+            if door_rect is not None:
+                doors.append(door_rect)
+        return cls(rooms, union_poly, fused_poly, doors, graph)
+
+    def boundary_rings(self):
+        """
+        Exterior rings of the fused outline, as lists of (x, y).
+        """
+        if self.fused.is_empty:
+            return []
+        if self.fused.geom_type == "Polygon":
+            return [list(self.fused.exterior.coords)]
+        return [list(part.exterior.coords) for part in self.fused.geoms
+                if part.geom_type == "Polygon"]
+
+
+def room_polygons(floorplan):
+    """
+    {room_name: Polygon} for every rectangle in the floorplan dict.
+    """
+    polygons = {}
+    for room_name, rect in floorplan.items():
+        x, y = rect["x"], rect["y"]
+        w, h = rect["width"], rect["height"]
+        polygons[room_name] = Polygon([
+            (x,     y),
+            (x + w, y),
+            (x + w, y + h),
+            (x,     y + h)
+        ])
+    return polygons
+
+
+def fuse_boundary(union_poly, max_buf=50, step=1):
+    """
+    Close the room union with growing buffers until it is a single polygon
+    without holes (or max_buf is reached).
+    """
+    fused_poly = union_poly
+    for dist in range(step, max_buf+1, step):
+        if (fused_poly.geom_type == "Polygon") and (len(fused_poly.interiors) == 0):
+            break
+        bigger = fused_poly.buffer(dist, join_style=2)
+        fused_poly = bigger.buffer(-dist, join_style=2)
+    return fused_poly
+
+
+def close_union(union_poly, dist):
+    """
+    The union closed once at `dist`, i.e. fuse_boundary()'s result when its loop
+    stops at `dist`: closing by d equals closing the previous closing by d for
+    square buffers, so one round gives the same outline as the loop.
+    """
+    if dist == 0:
+        return union_poly
+    return union_poly.buffer(dist, join_style=2).buffer(-dist, join_style=2)
+
+
+def adjacency_graph(floorplan, width, height):
+    """
+    RoomAdjacencyGraph of the plan, or None if it is not on the unit grid
+    (the shapely code paths are used then).
+    """
+    try:
+        return RoomAdjacencyGraph(floorplan, width, height)
+    except ValueError:
+        return None
+
+
+def place_doors(room_polys, union_poly, fused_poly, width, height):
+    """
+    Exactly 1 door per room:
+      - bedroom/kitchen/garage => door on shared boundary with living room
+      - washroom => on a wall shared with a study room or a bedroom if any,
+        else on the shared boundary with the living room.
+    Walls on the fused exterior never get a door.
+    """
+    bounding_poly = Polygon([(0,0), (width,0), (width,height), (0,height)])
+    living_area_poly = bounding_poly.difference(union_poly)
+
+    doors = []
+    for room_name, poly in room_polys.items():
+        base_type = room_name.split("_")[0]
+
+        if base_type == "Washroom":
+            door_line = None
+            # First try to find shared boundary with a Study room
+            for other_name, other_poly in room_polys.items():
+                if "Study" in other_name:
+                    shared_line = poly.boundary.intersection(other_poly.boundary)
+                    if not shared_line.is_empty and shared_line.length > 0.1:
+                        door_line = shared_line
+                        break
+            # If no Study adjacent, try Bedroom adjacency
+            if not door_line:
+                for other_name, other_poly in room_polys.items():
+                    if "Bedroom" in other_name:
+                        shared_line = poly.boundary.intersection(other_poly.boundary)
+                        if not shared_line.is_empty and shared_line.length > 0.1:
+                            door_line = shared_line
+                            break
+            # If still not found, use living area boundary
+            if not door_line:
+                door_line = poly.boundary.intersection(living_area_poly.boundary)
+        else:
+            # For other room types, door on adjacency with living area
+            door_line = poly.boundary.intersection(living_area_poly.boundary)
+
+        if door_line and not door_line.is_empty:
+            valid_door_line = None
+            if fused_poly.geom_type == "Polygon":
+                valid_door_line = door_line.difference(fused_poly.exterior)
+            elif fused_poly.geom_type == "MultiPolygon":
+                for part in fused_poly.geoms:
+                    if part.geom_type == "Polygon":
+                        valid_door_line = door_line.difference(part.exterior)
+                        if not valid_door_line.is_empty:
+                            break
+
+            if valid_door_line and not valid_door_line.is_empty:
+                door_rect = construct_door_rectangle(valid_door_line)
+                if door_rect is not None:
+                    doors.append(door_rect)
+    return doors
+
+
+def construct_door_rectangle(door_line, door_len=0.4, door_thick=0.1):
+    """
+    door_line can be a LineString or MultiLineString.
+    1) Pick the longest line segment
+    2) Find its midpoint param
+    3) Build a small rectangle around that midpoint, oriented with the line direction.
+    Returns a shapely Polygon or None.
+    """
+    if door_line.is_empty:
+        return None
+
+    if door_line.geom_type == "LineString":
+        line = door_line
+    elif door_line.geom_type == "MultiLineString":
+        max_len = 0
+        best_line = None
+        for l in door_line.geoms:
+            if l.length > max_len:
+                max_len = l.length
+                best_line = l
+        if not best_line or best_line.length < 0.01:
+            return None
+        line = best_line
+    else:
+        return None
+
+    if line.length < 0.01:
+        return None
+
+    mid_param = line.length / 2
+    mid_pt = line.interpolate(mid_param)
+
+    epsilon = 0.01
+    p1 = line.interpolate(mid_param - epsilon)
+    p2 = line.interpolate(mid_param + epsilon)
+    dx = p2.x - p1.x
+    dy = p2.y - p1.y
+    line_len = (dx*dx + dy*dy)**0.5
+    if line_len < 1e-6:
+        return None
+
+    nx = dx / line_len
+    ny = dy / line_len
+
+    left_nx = -ny
+    left_ny = nx
+
+    halfL = door_len * 0.5
+    halfT = door_thick * 0.5
+
+    mx, my = mid_pt.x, mid_pt.y
+
+    c1x = mx - halfL*nx + halfT*left_nx
+    c1y = my - halfL*ny + halfT*left_ny
+
+    c2x = mx + halfL*nx + halfT*left_nx
+    c2y = my + halfL*ny + halfT*left_ny
+
+    c3x = mx + halfL*nx - halfT*left_nx
+    c3y = my + halfL*ny - halfT*left_nx
+
+    c4x = mx - halfL*nx - halfT*left_ny
+    c4y = my - halfL*ny - halfT*left_ny
+
+    return Polygon([(c1x,c1y), (c2x,c2y), (c3x,c3y), (c4x,c4y)])
@@ -0,0 +1,273 @@
+# plan_library.py
+#
+# Precomputed ground-floor plans for every spec the app can ask for, so a
+# request is answered by copying files instead of running the GA.
+#
+#   python plan_library.py --per-spec 9 --workers 4
+#   python plan_library.py --per-spec 9 --reachable-only   (only what parse_floorplan_request returns)
+
+import os
+import json
+import time
+import random
+import argparse
+import itertools
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    from .floorplan_generator import FloorplanGenerator
+    from .plan_analysis import PlanAnalyzer
+    from .batch_generation import generate_plans, plan_seed
+    from .plan_pipeline import PlanPipeline
+    from .plan_hashing import plan_hash
+    from .plan_jobs import rooms_from_specs
+    from .workspace import Workspace, atomic_write_bytes, atomic_write_json, atomic_write_image
+except ImportError:
+    from floorplan_generator import FloorplanGenerator
+    from plan_analysis import PlanAnalyzer
+    from batch_generation import generate_plans, plan_seed
+    from plan_pipeline import PlanPipeline
+    from plan_hashing import plan_hash
+    from plan_jobs import rooms_from_specs
+    from workspace import Workspace, atomic_write_bytes, atomic_write_json, atomic_write_image
+
+DEFAULT_LIBRARY_DIR = "plan_library"
+INDEX_FILE = "index.json"
+# Held (flock) while a spec's index is read, merged and rewritten
+LOCK_FILE = ".lock"
+
+
+def spec_key(specs):
+    """
+    Library key of a spec dict, e.g. "b2-w1-g1-a1".
+    """
+    return "b{}-w{}-g{}-a{}".format(specs.get("bedrooms", 2), specs.get("washrooms", 1),
+                                    int(bool(specs.get("has_garage", False))),
+                                    int(bool(specs.get("has_attachedwashroom", False))))
+
+
+def all_specs():
+    """
+    The whole spec space: 1-3 bedrooms, 1-3 washrooms, garage and attached yes/no.
+    """
+    for bedrooms, washrooms, garage, attached in itertools.product(
+            (1, 2, 3), (1, 2, 3), (False, True), (False, True)):
+        yield {"bedrooms": bedrooms, "washrooms": washrooms,
+               "has_garage": garage, "has_attachedwashroom": attached}
+
+
+def reachable_specs():
+    """
+    The specs parse_floorplan_request can return: it always adds a garage and
+    attaches washrooms from 2 bedrooms up.
+    """
+    for specs in all_specs():
+        if specs["has_garage"] and (specs["bedrooms"] < 2 or specs["has_attachedwashroom"]):
+            yield specs
+
+
+def build_spec_plans(specs, count, candidates_per_round=12, seed=0, workers=1,
+                     renderer="matplotlib", cache=None, workspace=None, max_rounds=None):
+    """
+    Run the ground-floor pipeline round after round (each round: GA candidates ->
+    PlanAnalyzer -> render -> detector -> selector -> prettifier) until `count`
+    distinct final plans are collected.
+    :return: [(plan_dict, BGR image, metrics dict), ...] best living area first
+    """
+    width = FloorplanGenerator.FLOORPLAN_WIDTH
+    height = FloorplanGenerator.FLOORPLAN_HEIGHT
+    rooms = rooms_from_specs(specs["bedrooms"], specs["washrooms"], specs["has_garage"])
+    analyzer = PlanAnalyzer(width, height)
+    max_rounds = max_rounds or 2 * (count // 3 + 1)
+
+    plans = {}
+    for round_index in range(max_rounds):
+        if len(plans) >= count:
+            break
+        round_seed = plan_seed(seed, round_index)
+        candidates, _ = generate_plans(rooms, specs["has_attachedwashroom"], candidates_per_round,
+                                       workers, round_seed)
+        survivors = analyzer.select(candidates, k=3)
+        analyses = {name + ".png": analysis for name, _, analysis in survivors}
+
+        pipeline = PlanPipeline(width, height, renderer=renderer, workers=min(workers, 3),
+                                cache=cache, workspace=workspace)
+        pipeline.run([(name, plan) for name, plan, _ in survivors])
+        for record in pipeline.final_records():
+            key = plan_hash(record.plan)
+            if key in plans:
+                continue
+            metrics = {"living_area_px": float(record.living_area or 0), "seed": round_seed}
+            if record.filename in analyses:
+                metrics.update(json.loads(json.dumps(analyses[record.filename].as_dict(),
+                                                     default=float)))
+            plans[key] = (record.plan, record.image, metrics)
+
+    ranked = sorted(plans.values(), key=lambda p: p[2]["living_area_px"], reverse=True)
+    return ranked[:count]
+
+
+class PlanLibrary:
+    """
+    Finished ground-floor plans (PNG + JSON + metrics) grouped by spec:
+
+        <root>/<spec_key>/index.json     [{"id", "image", "plan", "metrics", "added"}, ...]
+        <root>/<spec_key>/<id>.png/.json
+
+    Each spec has its own index (written atomically), so builds and top-ups of
+    different specs never contend; add() merges into a spec's index under that
+    spec's lock file, so concurrent top-ups of one spec keep each other's plans.
+    lookup() is a dict lookup plus a sample.
+    """
+
+    def __init__(self, root=DEFAULT_LIBRARY_DIR):
+        self.root = root
+        self._indexes = {}   # spec_key -> (mtime, entries)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _index_path(self, key):
+        return os.path.join(self.root, key, INDEX_FILE)
+
+    def entries(self, specs):
+        """
+        Library entries for a spec, best first (re-read only when the index changes).
+        """
+        key = spec_key(specs)
+        path = self._index_path(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return []
+        cached = self._indexes.get(key)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r") as f:
+                cached = (mtime, json.load(f))
+            self._indexes[key] = cached
+        return cached[1]
+
+    def count(self, specs):
+        return len(self.entries(specs))
+
+    def lookup(self, specs, k=3, rng=random):
+        """
+        k plans for the spec, sampled from the library (best first among the
+        sample) for variety; [] if the library holds fewer than k.
+        """
+        entries = self.entries(specs)
+        if len(entries) < k:
+            return []
+        picked = sorted(rng.sample(range(len(entries)), k))
+        return [entries[i] for i in picked]
+
+    def path(self, specs, filename):
+        return os.path.join(self.root, spec_key(specs), filename)
+
+    @contextmanager
+    def _locked(self, key):
+        """
+        Exclusive lock on one spec's folder, across processes (a no-op where
+        flock is not available).
+        """
+        os.makedirs(os.path.join(self.root, key), exist_ok=True)
+        with open(os.path.join(self.root, key, LOCK_FILE), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add(self, specs, plans):
+        """
+        Store [(plan_dict, BGR image, metrics), ...]; plans already in the
+        library are skipped. Keeps the index sorted by living area.
+        The index is re-read under the spec's lock, so entries another process
+        added meanwhile are merged, not overwritten.
+        :return: number of plans added
+        """
+        key = spec_key(specs)
+        with self._locked(key):
+            entries = []
+            if os.path.exists(self._index_path(key)):
+                with open(self._index_path(key), "r") as f:
+                    entries = json.load(f)
+            known = {e["id"] for e in entries}
+            added = 0
+            for plan, image, metrics in plans:
+                plan_id = plan_hash(plan)[:16]
+                if plan_id in known:
+                    continue
+                atomic_write_image(self.path(specs, plan_id + ".png"), image)
+                atomic_write_json(self.path(specs, plan_id + ".json"), plan)
+                entries.append({"id": plan_id, "image": plan_id + ".png", "plan": plan_id + ".json",
+                                "metrics": metrics, "added": time.time()})
+                known.add(plan_id)
+                added += 1
+            entries.sort(key=lambda e: e["metrics"].get("living_area_px", 0), reverse=True)
+            atomic_write_json(self._index_path(key), entries)
+        return added
+
+    def export(self, specs, entries, output_dir):
+        """
+        Copy entries into output_dir as plan1..planN (PNG + JSON), like the
+        pipeline's 'pretty' output.
+        :return: base names written
+        """
+        names = []
+        for i, entry in enumerate(entries, start=1):
+            name = f"plan{i}"
+            for src, ext in ((entry["image"], ".png"), (entry["plan"], ".json")):
+                with open(self.path(specs, src), "rb") as f:
+                    atomic_write_bytes(os.path.join(output_dir, name + ext), f.read())
+            names.append(name)
+        return names
+
+    def top_up(self, specs, count, seed=None, workers=1, renderer="matplotlib", cache=None,
+               workspace=None):
+        """
+        Generate `count` more plans for one spec and add the new ones.
+        :return: number of plans added
+        """
+        seed = seed if seed is not None else random.randrange(2 ** 32)
+        plans = build_spec_plans(specs, count, seed=seed, workers=workers, renderer=renderer,
+                                 cache=cache, workspace=workspace)
+        return self.add(specs, plans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed plan library.")
+    parser.add_argument("--root", default=DEFAULT_LIBRARY_DIR)
+    parser.add_argument("--per-spec", type=int, default=9,
+                        help="Plans to generate for every spec (default: 9).")
+    parser.add_argument("--candidates", type=int, default=12,
+                        help="GA candidates per pipeline round (default: 12).")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--renderer", default="matplotlib")
+    parser.add_argument("--reachable-only", action="store_true",
+                        help="Only the specs parse_floorplan_request can produce.")
+    args = parser.parse_args()
+
+    library = PlanLibrary(args.root)
+    workspace = Workspace("_build", args.root)
+    specs_list = list(reachable_specs() if args.reachable_only else all_specs())
+    start = time.perf_counter()
+    for i, specs in enumerate(specs_list):
+        plans = build_spec_plans(specs, args.per_spec, args.candidates, plan_seed(args.seed, i),
+                                 args.workers, args.renderer, workspace=workspace)
+        added = library.add(specs, plans)
+        print(f"{spec_key(specs)}: +{added} plans ({library.count(specs)} in library)")
+        if not library.count(specs):
+            print(f"  no valid plans for {spec_key(specs)}; requests for it fall back to the GA.")
+    workspace.remove()
+    print(f"Built {len(specs_list)} specs in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+
+class PlanMasks:
+    """
+    The pixel masks every image-consuming stage derives from a rendered floorplan:
+      - floor_mask:  filled interior of the largest black boundary (255 inside)
+      - living_mask: strictly-white pixels inside the floor (the living area)
+      - color_masks: one mask per known room color, restricted to the floor
+    All masks are uint8 images with values 0/255, like cv2.inRange output.
+    """
+
+    def __init__(self, floor_mask, living_mask, color_masks):
+        self.floor_mask = floor_mask
+        self.living_mask = living_mask
+        self.color_masks = color_masks
+
+    @property
+    def color_mask(self):
+        """
+        Union of all known-room-color masks.
+        """
+        total_mask = np.zeros_like(self.floor_mask)
+        for mask in self.color_masks:
+            total_mask |= mask
+        return total_mask
+
+
+def floorplan_mask(image, min_area=0):
+    """
+    Invert threshold → find largest external black contour → fill.
+    Contours with area <= min_area are ignored. Returns None if nothing qualifies.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, black_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+    cnts, _ = cv2.findContours(black_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if min_area > 0:
+        cnts = [c for c in cnts if cv2.contourArea(c) > min_area]
+    if not cnts:
+        return None
+    largest = max(cnts, key=cv2.contourArea)
+    mask = np.zeros_like(black_mask)
+    cv2.drawContours(mask, [largest], -1, 255, -1)
+    return mask
+
+
+def compute_plan_masks(image, room_colors=(), tol=8, min_floor_area=0, living_threshold=240):
+    """
+    Build floor, living and room-color masks for a BGR image in one vectorized pass.
+
+    :param image:            BGR image as produced by cv2.imread.
+    :param room_colors:      Iterable of BGR tuples to build color masks for.
+    :param tol:              Per-channel tolerance for the room colors.
+    :param min_floor_area:   Ignore black contours at or below this area.
+    :param living_threshold: A pixel is 'white' if every channel is >= this value.
+    :return: PlanMasks, or None if no floor boundary was found.
+    """
+    floor_mask = floorplan_mask(image, min_area=min_floor_area)
+    if floor_mask is None:
+        return None
+
+    # strictly white inside the floor => living
+    white = cv2.inRange(image, (living_threshold,) * 3, (255, 255, 255))
+    living_mask = cv2.bitwise_and(white, floor_mask)
+
+    # |pixel - color| <= tol on every channel, as clamped cv2.inRange bounds
+    color_masks = []
+    for color in room_colors:
+        lower = tuple(max(int(c) - tol, 0) for c in color)
+        upper = tuple(min(int(c) + tol, 255) for c in color)
+        color_masks.append(cv2.bitwise_and(cv2.inRange(image, lower, upper), floor_mask))
+
+    return PlanMasks(floor_mask, living_mask, color_masks)
@@ -0,0 +1,122 @@
+try:
+    from .plan_record import PlanRecord, clear_stage_files
+    from .batch_generation import render_images
+    from .room_type_detector import RoomTypeDetector
+    from .perfect_plan_selector import PerfectPlanSelector
+    from .pretty_floorplan_maker import PrettyFloorplanMaker
+    from .workspace import stage_dir
+except ImportError:
+    from plan_record import PlanRecord, clear_stage_files
+    from batch_generation import render_images
+    from room_type_detector import RoomTypeDetector
+    from perfect_plan_selector import PerfectPlanSelector
+    from pretty_floorplan_maker import PrettyFloorplanMaker
+    from workspace import stage_dir
+
+
+class PlanPipeline:
+    """
+    render -> RoomTypeDetector -> PerfectPlanSelector -> PrettyFloorplanMaker
+    with PlanRecords handed from stage to stage in memory:
+    every plan is rendered once, never re-decoded, and masks are shared
+    between stages until an image changes.
+
+    Disk output is an optional sink: write_stage() saves the records of any stage,
+    into the pipeline's Workspace if it has one.
+    """
+
+    STAGES = ("output", "finaloutput", "perfect", "pretty")
+
+    def __init__(self, width, height, renderer="matplotlib", workers=1,
+                 detector=None, selector=None, maker=None, cache=None, workspace=None,
+                 min_plans=3):
+        """
+        :param renderer: name accepted by raster_renderer.get_renderer().
+        :param workers:  processes used for rendering.
+        :param min_plans: plans a run is fed (the default detector's min_plans).
+        :param cache:    optional PlanCache shared by the renderer, selector and maker.
+        :param workspace: optional Workspace the stage folders live in.
+        """
+        self.width = width
+        self.height = height
+        self.renderer = renderer
+        self.workers = workers
+        self.cache = cache
+        self.workspace = workspace
+        self.detector = detector or RoomTypeDetector(workspace=workspace, min_plans=min_plans)
+        self.selector = selector or PerfectPlanSelector(cache=cache, workspace=workspace)
+        self.maker = maker or PrettyFloorplanMaker(cache=cache, workspace=workspace)
+        self.stages = {}
+        self.render_stats = None
+
+    def render(self, named_plans):
+        """
+        [(base_name, floorplan_dict), ...] -> [PlanRecord, ...]
+        """
+        named_plans = list(named_plans)
+        images, self.render_stats = render_images(
+            named_plans, self.width, self.height, workers=self.workers, renderer=self.renderer,
+            cache=self.cache
+        )
+        return [PlanRecord(name + ".png", plan, img)
+                for (name, plan), img in zip(named_plans, images)]
+
+    def run(self, named_plans):
+        """
+        Push the plans through every stage.
+        :return: the pretty PlanRecords (also kept in self.stages by stage name)
+        """
+        records = self.render(named_plans)
+        self.stages = {"output": records}
+
+        # later stages see the "Living Room" labels, exactly like the PNGs
+        # they used to read back
+        finaloutput = self.detector.select_records(records)
+        self.stages["finaloutput"] = finaloutput
+
+        perfect = self.selector.select_records(finaloutput)
+        for record in perfect:
+            print(f"Selected '{record.filename}' (living_area={record.living_area}).")
+        self.stages["perfect"] = perfect
+
+        pretty = self.maker.make_pretty_records(perfect)
+        self.stages["pretty"] = pretty
+        return pretty
+
+    def final_records(self, count=3):
+        """
+        The final plans exactly like the on-disk flow in main.py leaves 'pretty':
+        sorted by file name, each with the JSON copied over from 'perfect'
+        (no pixel-space Stairs; those stay in the record's document).
+        Also becomes the "pretty" stage.
+        """
+        perfect = {r.filename: r for r in self.stages.get("perfect", [])}
+        pretty = sorted(self.stages.get("pretty", []), key=lambda r: r.filename)[:count]
+        for record in pretty:
+            if record.filename in perfect:
+                record.plan = perfect[record.filename].plan
+                record.living_area = perfect[record.filename].living_area
+        self.stages["pretty"] = pretty
+        return pretty
+
+    def write_final(self, output_dir="pretty", count=3):
+        """
+        Write final_records() as plan1..plan<count>.
+        :return: list of written image paths
+        """
+        pretty = self.final_records(count)
+        return self.write_stage("pretty", output_dir,
+                                [f"plan{i}" for i in range(1, len(pretty) + 1)])
+
+    def write_stage(self, stage, output_dir=None, base_names=None):
+        """
+        Sink: save one stage's records (PNG + JSON) into output_dir (default: the
+        stage's own folder), replacing the images and JSON files left there by earlier runs.
+        :param base_names: optional new base names, one per record.
+        :return: list of written image paths
+        """
+        records = self.stages.get(stage, [])
+        output_dir = stage_dir(output_dir or stage, self.workspace)
+        clear_stage_files(output_dir, (".png", ".jpg", ".jpeg", ".json"))
+        names = base_names or [None] * len(records)
+        return [record.write(output_dir, name) for record, name in zip(records, names)]
@@ -0,0 +1,83 @@
+import math
+
+from shapely.geometry import box
+
+try:
+    from .plan_layout import PlanLayout
+except ImportError:
+    from plan_layout import PlanLayout
+
+# Metrics a PlanScore can weigh, all taken from the plan dict (no rendering):
+#   - living_area:  largest living region (inside the outline, not a room), plan units²
+#   - compactness:  4*pi*area / perimeter² of the fused outline (1.0 for a circle)
+#   - door_count:   doors the renderers draw (one per room that has a wall for it)
+#   - wall_length:  length of the fused outline (the black exterior wall)
+PLAN_METRICS = ("living_area", "compactness", "door_count", "wall_length")
+
+# Living area alone: the order PerfectPlanSelector always ranked by
+DEFAULT_WEIGHTS = {"living_area": 1.0}
+
+
+def plan_metrics(floorplan, width=20, height=20):
+    """
+    {metric: value} for every name in PLAN_METRICS.
+    """
+    layout = PlanLayout.build(floorplan, width, height)
+    fused = layout.fused
+    living = box(0, 0, width, height).intersection(fused).difference(layout.union)
+    parts = living.geoms if hasattr(living, "geoms") else [living]
+    perimeter = fused.length
+    return {
+        "living_area": max((p.area for p in parts), default=0.0),
+        "compactness": 4 * math.pi * fused.area / perimeter ** 2 if perimeter else 0.0,
+        "door_count": len(layout.doors),
+        "wall_length": perimeter,
+    }
+
+
+def parse_weights(text):
+    """
+    "living_area=1,compactness=20,wall_length=-0.5" -> {metric: weight}
+    :raises ValueError: on a malformed entry or an unknown metric.
+    """
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected metric=weight, got '{item}'.")
+        name = name.strip()
+        if name not in PLAN_METRICS:
+            raise ValueError(f"Unknown plan metric '{name}'.")
+        weights[name] = float(value)
+    return weights
+
+
+class PlanScore:
+    """
+    Weighted sum of plan_metrics(): higher is better. Negative weights penalize
+    a metric (e.g. wall_length).
+    """
+
+    def __init__(self, weights=None, width=20, height=20):
+        """
+        :param weights: {metric: weight}; DEFAULT_WEIGHTS if None.
+        :raises ValueError: for a metric not in PLAN_METRICS.
+        """
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        unknown = set(self.weights) - set(PLAN_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown plan metrics {sorted(unknown)}; expected some of {PLAN_METRICS}.")
+        self.width = width
+        self.height = height
+
+    def metrics(self, floorplan):
+        return plan_metrics(floorplan, self.width, self.height)
+
+    def __call__(self, floorplan):
+        if not any(self.weights.values()):
+            return 0.0
+        metrics = self.metrics(floorplan)
+        return sum(weight * metrics[name] for name, weight in self.weights.items() if weight)
+
+    def __repr__(self):
+        return f"PlanScore({self.weights})"
@@ -0,0 +1,142 @@
+import os
+import json
+
+try:
+    from .plan_masks import compute_plan_masks
+    from .plan_regions import PlanRegions
+    from .plan_document import DOCUMENT_SUFFIX, PlanDocument, read_document, write_document
+    from .image_io import IMAGE_EXTENSIONS, iter_images
+    from .workspace import atomic_write_image, atomic_write_json
+except ImportError:
+    from plan_masks import compute_plan_masks
+    from plan_regions import PlanRegions
+    from plan_document import DOCUMENT_SUFFIX, PlanDocument, read_document, write_document
+    from image_io import IMAGE_EXTENSIONS, iter_images
+    from workspace import atomic_write_image, atomic_write_json
+
+
+class PlanRecord:
+    """
+    One floorplan as it moves between pipeline stages in memory:
+      - plan:     the {room: {x, y, width, height}} dict (the JSON sidecar)
+      - document: the PlanDocument (stairs, labels, provenance) stages add to,
+                  see plan_document(); written as <name>.plan.json
+      - image:    the BGR raster (what cv2.imread would return for the PNG)
+      - masks():  PlanMasks of the current image, computed once per parameter set
+      - regions(): PlanRegions (shared contour analysis) of the current image, shared
+                  by every stage that looks at it
+    Stages may attach results (living_rooms, living_area). Replacing the image
+    drops the cached masks and regions, since they describe the old pixels.
+    """
+
+    def __init__(self, filename, plan, image):
+        self.filename = filename
+        self.plan = plan
+        self.document = None
+        self._image = image
+        self._masks = {}
+        self._regions = {}
+        self.living_rooms = None
+        self.living_area = None
+
+    @property
+    def name(self):
+        return os.path.splitext(self.filename)[0]
+
+    @property
+    def image(self):
+        return self._image
+
+    @image.setter
+    def image(self, value):
+        self._image = value
+        self._masks = {}
+        self._regions = {}
+
+    def plan_document(self):
+        """
+        self.document, made from the flat plan dict the first time it is needed.
+        """
+        if self.document is None:
+            self.document = PlanDocument.from_legacy(self.plan)
+        return self.document
+
+    def masks(self, room_colors=(), tol=8, min_floor_area=0):
+        """
+        compute_plan_masks(self.image, ...), memoized until the image changes.
+        """
+        key = (tuple(tuple(c) for c in room_colors), tol, min_floor_area)
+        if key not in self._masks:
+            self._masks[key] = compute_plan_masks(self.image, room_colors, tol, min_floor_area)
+        return self._masks[key]
+
+    def regions(self, room_colors=(), tol=8, min_floor_area=0):
+        """
+        PlanRegions of the current image over masks(...) with the same
+        parameters, memoized until the image changes.
+        """
+        key = (tuple(tuple(c) for c in room_colors), tol, min_floor_area)
+        if key not in self._regions:
+            self._regions[key] = PlanRegions(
+                self.image, lambda: self.masks(room_colors, tol, min_floor_area))
+        return self._regions[key]
+
+    def write(self, output_dir, base_name=None, with_plan=True, writer=None):
+        """
+        Save the image (and the plan JSON and document next to it) into
+        output_dir, atomically.
+        :param writer: optional image_io.ImageWriter to write behind with.
+        :return: path of the written image
+        """
+        base_name = base_name or self.name
+        ext = os.path.splitext(self.filename)[1] or ".png"
+        img_path = os.path.join(output_dir, base_name + ext)
+        json_path = os.path.join(output_dir, base_name + ".json")
+        if writer is not None:
+            writer.write_image(img_path, self.image)
+            if with_plan and self.plan is not None:
+                writer.write_json(json_path, self.plan)
+        else:
+            atomic_write_image(img_path, self.image)
+            if with_plan and self.plan is not None:
+                atomic_write_json(json_path, self.plan)
+        if self.document is not None:
+            write_document(output_dir, base_name, self.document, writer)
+        return img_path
+
+
+def read_records(input_dir, with_plans=True, workers=1):
+    """
+    Load every image in input_dir (os.listdir order) as a PlanRecord.
+    The plan comes from the JSON with the same base name ({} if there is none),
+    the document from the <name>.plan.json next to it (see plan_document.read_document;
+    no pixel recovery here).
+    :param workers: threads decoding ahead (see image_io.iter_images).
+    """
+    return list(iter_records(input_dir, with_plans, workers))
+
+
+def iter_records(input_dir, with_plans=True, workers=1):
+    """
+    read_records() one image at a time.
+    """
+    for fname, img in iter_images(input_dir, workers):
+        plan = {}
+        base_name = os.path.splitext(fname)[0]
+        json_path = os.path.join(input_dir, base_name + ".json")
+        if with_plans and os.path.exists(json_path):
+            with open(json_path, "r") as jf:
+                plan = json.load(jf)
+        record = PlanRecord(fname, plan, img)
+        if with_plans:
+            record.document = read_document(input_dir, base_name, recover=False)
+        yield record
+
+
+def clear_stage_files(output_dir, extensions=IMAGE_EXTENSIONS + (DOCUMENT_SUFFIX,)):
+    """
+    Remove old stage outputs (files with one of `extensions`) from output_dir.
+    """
+    for f in os.listdir(output_dir):
+        if f.lower().endswith(extensions):
+            os.remove(os.path.join(output_dir, f))
@@ -0,0 +1,128 @@
+from functools import cached_property
+
+import cv2
+
+try:
+    from .plan_masks import compute_plan_masks
+except ImportError:
+    from plan_masks import compute_plan_masks
+
+
+class Regions:
+    """
+    The components findContours(RETR_EXTERNAL) reports for a 0/255 mask
+    (8-connected, not nested in a hole of another component), measured the way
+    contour-based code did:
+      - ids:  component indices, in findContours order
+    area(), largest() and centroid() use the outer contour (cv2.contourArea,
+    cv2.moments), so holes count as part of a component; box() is its bounding
+    rect, which is the component's own.
+    One contour pass: no connected-component labeling is needed on top of it.
+    """
+
+    def __init__(self, mask):
+        cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self._contours = cnts
+        self.ids = list(range(len(cnts)))
+        self._areas = [cv2.contourArea(c) for c in cnts]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def large(self, min_area):
+        """
+        External components with a contour area above min_area.
+        """
+        return [i for i in self.ids if self._areas[i] > min_area]
+
+    def largest(self):
+        """
+        The external component with the largest contour area (the first one on a tie), or None.
+        """
+        return max(self.ids, key=self._areas.__getitem__, default=None)
+
+    def area(self, label):
+        """
+        cv2.contourArea of the component's outer contour.
+        """
+        return self._areas[label]
+
+    def centroid(self, label):
+        """
+        Integer (x, y) centroid of the outer contour, or None for a degenerate one.
+        """
+        M = cv2.moments(self._contours[label])
+        if M["m00"] == 0:
+            return None
+        return (int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"]))
+
+    def box(self, label):
+        """
+        (x, y, w, h) bounding rect of the component.
+        """
+        return tuple(int(v) for v in cv2.boundingRect(self._contours[label]))
+
+    def contour(self, label):
+        """
+        Outer contour of an external component, as findContours returns it.
+        """
+        return self._contours[label]
+
+
+class PlanRegions:
+    """
+    Contour analysis of a rendered floorplan, shared by the stages that consume
+    images. Each mask gets one findContours pass (a Regions), on first use:
+      - boundary: black (wall) components of the whole image
+      - living:   strictly-white components inside the floor (None without a floor)
+      - rooms:    known-room-color components inside the floor (None without a floor)
+    """
+
+    def __init__(self, image, get_masks):
+        """
+        :param get_masks: returns the image's PlanMasks (None if it has no floor);
+                          called once, when living or rooms are first needed.
+        """
+        self.image = image
+        self._get_masks = get_masks
+
+    @cached_property
+    def masks(self):
+        return self._get_masks()
+
+    @cached_property
+    def boundary(self):
+        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        _, black_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+        return Regions(black_mask)
+
+    @cached_property
+    def living(self):
+        return Regions(self.masks.living_mask) if self.masks is not None else None
+
+    @cached_property
+    def rooms(self):
+        return Regions(self.masks.color_mask) if self.masks is not None else None
+
+    def living_centroids(self, min_area=10):
+        """
+        Centroids of the living components with a contour area of at least min_area.
+        """
+        if self.living is None:
+            return []
+        centroids = (self.living.centroid(i) for i in self.living.ids
+                     if self.living.area(i) >= min_area)
+        return [c for c in centroids if c is not None]
+
+    def largest_living(self):
+        """
+        Label of the living component with the largest contour area, or None.
+        """
+        return self.living.largest() if self.living is not None else None
+
+
+def compute_plan_regions(image, **mask_params):
+    """
+    PlanRegions of a BGR image; the masks come from compute_plan_masks(image, **mask_params).
+    """
+    return PlanRegions(image, lambda: compute_plan_masks(image, **mask_params))
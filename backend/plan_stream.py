@@ -0,0 +1,110 @@
+import heapq
+import itertools
+
+try:
+    from .plan_analysis import PlanAnalyzer
+    from .batch_generation import iter_plans
+except ImportError:
+    from plan_analysis import PlanAnalyzer
+    from batch_generation import iter_plans
+
+
+def iter_analyzed(named_plans, analyzer):
+    """
+    Validate stage: (name, plan) -> (name, plan, PlanAnalysis) for the connected
+    plans only (the ones RoomTypeDetector / PerfectPlanSelector could accept).
+    """
+    for name, plan in named_plans:
+        analysis = analyzer.analyze(plan)
+        if analysis.connected:
+            yield name, plan, analysis
+
+
+def plan_score(analysis):
+    """
+    Score stage: the order PlanAnalyzer.select ranks by, as one comparable key:
+    exactly one living room first, then larger living area.
+    """
+    return (analysis.living_room_count == 1, analysis.living_area)
+
+
+class TopK:
+    """
+    Bounded min-heap of the k best items seen so far. Ties go to the item
+    pushed first, like a stable sort would.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._counter = itertools.count()
+
+    def push(self, score, item):
+        """
+        :return: True if the item is (for now) among the k best.
+        """
+        # -seq: of two equal scores, the earlier one ranks higher
+        entry = (score, -next(self._counter), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def accepts(self, score):
+        """
+        True if an item with this score pushed now would be kept (before paying
+        for whatever else it takes to build the item).
+        """
+        return len(self._heap) < self.k or score > self._heap[0][0]
+
+    def threshold(self):
+        """
+        Score of the k-th best item, or None while fewer than k are kept.
+        """
+        return self._heap[0][0] if len(self._heap) >= self.k else None
+
+    def best(self):
+        """
+        The kept items, best first.
+        """
+        return [item for _, _, item in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+def stream_top_k(analyzed, k=3, score=plan_score):
+    """
+    Select stage, incrementally: consume (name, plan, analysis) tuples and yield
+    the current top-k (best first) every time it changes. The first yield comes
+    with the first acceptable plan; the last one is the final selection.
+    Memory is O(k) however many plans flow through.
+    """
+    top = TopK(k)
+    for entry in analyzed:
+        if top.push(score(entry[2]), entry):
+            yield top.best()
+
+
+def select_top_k(analyzed, k=3, score=plan_score):
+    """
+    Final top-k of a stream; same result as PlanAnalyzer.select() on the same plans.
+    """
+    top = TopK(k)
+    for entry in analyzed:
+        top.push(score(entry[2]), entry)
+    return top.best()
+
+
+def stream_plans(rooms, attached_washroom=False, num_floorplans=40, workers=1, base_seed=0,
+                 engine="dict", k=3, width=20, height=20):
+    """
+    generate -> validate -> score -> select top-k as one lazy pipeline.
+    Yields the running top-k [(name, plan, PlanAnalysis), ...] whenever it improves.
+    """
+    analyzer = PlanAnalyzer(width, height)
+    generated = iter_plans(rooms, attached_washroom, num_floorplans, workers, base_seed, engine)
+    return stream_top_k(iter_analyzed(generated, analyzer), k)
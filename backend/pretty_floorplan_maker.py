@@ -1,10 +1,34 @@
-import os
 import cv2
 import numpy as np
-import json
+import math
 import random
 from math import sqrt
 
+try:
+    from .plan_masks import compute_plan_masks
+    from .plan_regions import PlanRegions
+    from .plan_record import PlanRecord, iter_records, clear_stage_files
+    from .plan_document import PORCH_HEX
+    from .image_io import ImageWriter
+    from .workspace import stage_dir
+except ImportError:
+    from plan_masks import compute_plan_masks
+    from plan_regions import PlanRegions
+    from plan_record import PlanRecord, iter_records, clear_stage_files
+    from plan_document import PORCH_HEX
+    from image_io import ImageWriter
+    from workspace import stage_dir
+
+# Radial stairs candidates around a wall point, in search order:
+# distances 5..35 px, then angles 0..330 degrees
+_RADIAL_OFFSETS = [(dist * math.cos(math.radians(a)), dist * math.sin(math.radians(a)))
+                   for dist in range(5, 40, 5) for a in range(0, 360, 30)]
+_RADIAL_DX = np.array([o[0] for o in _RADIAL_OFFSETS])
+_RADIAL_DY = np.array([o[1] for o in _RADIAL_OFFSETS])
+# Boundary points whose radial candidates are checked per vectorized batch;
+# the search stops at the first batch with a fit
+_RADIAL_CHUNK = 32
+
 class PrettyFloorplanMaker:
     """
     1) Loads each PNG + JSON from 'perfect' (self.input_dir)
@@ -13,17 +37,25 @@ class PrettyFloorplanMaker:
     4) Writes 'Stairs' to the dictionary (floor_dict["Stairs"])
     5) Saves updated image + dictionary in self.output_dir (e.g. 'pretty')
     Additionally, the area outside the black boundary is filled with background color FBF5F1
-    and labeled as "Porch".
+    and labeled as "Porch". The stairs rectangle and the porch label also go into
+    the plan's document, where later stages read them instead of the pixels.
     """
 
-    def __init__(self, input_dir="perfect", output_dir="pretty"):
-        self.input_dir = input_dir
-        self.output_dir = output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
+    def __init__(self, input_dir="perfect", output_dir="pretty", cache=None, workspace=None,
+                 workers=1, stairs_size=(15, 15)):
+        """
+        :param cache: optional PlanCache; remembers where stairs went for each image.
+        :param workspace: optional Workspace; the folders are then stages inside it.
+        :param workers: threads decoding ahead and writing behind (see image_io).
+        :param stairs_size: (width, height) of the stairs rectangle in pixels.
+        """
+        self.input_dir = stage_dir(input_dir, workspace)
+        self.output_dir = stage_dir(output_dir, workspace)
+        self.cache = cache
+        self.workers = workers
 
         # The dimension of the stairs rectangle
-        self.stairs_w = 15
-        self.stairs_h = 15
+        self.stairs_w, self.stairs_h = stairs_size
 
         # Tolerance for color detection
         self.tol = 8
@@ -47,78 +79,79 @@ class PrettyFloorplanMaker:
            Save the updated result.
         """
         # Remove old files in output_dir
-        for f in os.listdir(self.output_dir):
-            if f.lower().endswith((".png", ".jpg", ".jpeg", ".json")):
-                os.remove(os.path.join(self.output_dir, f))
-
-        # Gather images
-        image_files = [f for f in os.listdir(self.input_dir)
-                       if f.lower().endswith((".png", ".jpg", ".jpeg"))]
-        for fname in image_files:
-            path = os.path.join(self.input_dir, fname)
-            img = cv2.imread(path)
-            if img is None:
-                continue
-
-            base = os.path.splitext(fname)[0]
-            dict_path = os.path.join(self.input_dir, base + ".json")
-
-            # Load dictionary if present; otherwise, use an empty dict.
-            floor_dict = {}
-            if os.path.exists(dict_path):
-                with open(dict_path, "r") as jf:
-                    floor_dict = json.load(jf)
-
-            # Recalculate stairs placement and porch filling/labeling.
-            annotated, updated_dict = self._place_stairs_in_image(img, floor_dict)
-
-            # Save updated image and JSON.
-            out_img_path = os.path.join(self.output_dir, fname)
-            cv2.imwrite(out_img_path, annotated)
-            print(f"Saved plan with stairs => {out_img_path}")
-            out_json_path = os.path.join(self.output_dir, base + ".json")
-            with open(out_json_path, "w") as jf:
-                json.dump(updated_dict, jf)
+        clear_stage_files(self.output_dir, (".png", ".jpg", ".jpeg", ".json"))
+
+        # Gather images + their dictionaries (empty dict if there is no JSON),
+        # decoded ahead of the plan being annotated
+        records = iter_records(self.input_dir, workers=self.workers)
+        with ImageWriter(self.workers) as writer:
+            for record in self.iter_pretty_records(records):
+                # Save updated image and JSON.
+                out_img_path = record.write(self.output_dir, writer=writer)
+                print(f"Saved plan with stairs => {out_img_path}")
+
+    def make_pretty_records(self, records):
+        """
+        Place stairs and the porch on in-memory PlanRecords.
+        Returns new records; the input records and their dicts are left untouched.
+        """
+        return list(self.iter_pretty_records(records))
 
-    def _place_stairs_in_image(self, img, floor_dict):
+    def iter_pretty_records(self, records):
+        """
+        make_pretty_records() one record at a time.
+        """
+        for record in records:
+            masks = record.masks(self.room_colors, self.tol, min_floor_area=2000)
+            # Recalculate stairs placement and porch filling/labeling. The living
+            # components are the ones earlier stages already labeled on this image
+            # (same living mask whenever the floor passes the 2000 px minimum).
+            document = record.plan_document().copy()
+            annotated, updated_dict = self._place_stairs_in_image(
+                record.image, dict(record.plan or {}), masks=masks, regions=record.regions(),
+                document=document
+            )
+            document.add_provenance("pretty", stairs=document.stairs is not None)
+            pretty = PlanRecord(record.filename, updated_dict, annotated)
+            pretty.document = document
+            yield pretty
+
+    def _place_stairs_in_image(self, img, floor_dict, masks=None, regions=None, document=None):
         """
-        1) Find the largest living-area contour.
+        1) Find the largest living-area component and its contour.
         2) Place a 'Stairs' rectangle and update floor_dict.
         3) Fill the region outside the black boundary with background color FBF5F1.
         4) Then, without using complex centroid computations, pick a porch-colored pixel
            (using cv2.findNonZero) and place the "Porch" label at that location with a small offset.
         5) Return the annotated image and updated dictionary.
+        :param masks: PlanMasks of img with this maker's colors (pipeline mode).
+        :param regions: PlanRegions of img (pipeline mode).
+        :param document: optional PlanDocument to record the stairs and porch label in.
         """
         annotated = img.copy()
         h, w = annotated.shape[:2]
 
-        # Get floor mask: invert threshold, select largest contour, fill → floor_mask=255
-        floor_mask = self._get_floorplan_mask(annotated)
-        if floor_mask is None:
+        # Floor mask (largest black contour > 2000 px), known-room-color mask and
+        # strictly-white living mask, all from one vectorized pass.
+        if masks is None:
+            masks = compute_plan_masks(annotated, self.room_colors, self.tol, min_floor_area=2000)
+        if masks is None:
             return annotated, floor_dict
+        floor_mask = masks.floor_mask
+        color_mask = masks.color_mask
+        if regions is None:
+            regions = PlanRegions(annotated, lambda: masks)
 
-        color_mask = self._build_color_mask(annotated, floor_mask)
-
-        # Determine living area within the floor mask.
-        living_mask = np.zeros((h, w), dtype=np.uint8)
-        for y in range(h):
-            for x in range(w):
-                if floor_mask[y, x] == 255:
-                    b, g, r = annotated[y, x]
-                    if b >= 240 and g >= 240 and r >= 240:
-                        living_mask[y, x] = 255
-
-        cnts, _ = cv2.findContours(living_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not cnts:
+        largest = regions.largest_living()
+        if largest is None or regions.living.area(largest) < 10:
             return annotated, floor_dict
+        largest_lr = regions.living.contour(largest)
 
-        largest_lr = max(cnts, key=cv2.contourArea)
-        if cv2.contourArea(largest_lr) < 10:
-            return annotated, floor_dict
+        # Place stairs using existing logic (or where they went last time for this image).
+        annotated, floor_dict = self._place_stairs_cached(annotated, largest_lr, color_mask, floor_dict)
+        if document is not None:
+            document.stairs = floor_dict.get("Stairs")
 
-        # Place stairs using existing logic.
-        annotated, floor_dict = self._try_place_stairs(annotated, largest_lr, color_mask, floor_dict)
-        
         # ----- New Code for Porch Filling and Labeling -----
         # Fill the area outside the floor (the porch) with the porch background color.
         annotated[cv2.bitwise_not(floor_mask) == 255] = self.porch_color
@@ -126,88 +159,179 @@ class PrettyFloorplanMaker:
         # Get all porch pixel coordinates.
         porch_pts = cv2.findNonZero(cv2.bitwise_not(floor_mask))
         if porch_pts is not None:
-            # Convert to a list of (x, y) points.
-            pts = [tuple(pt[0]) for pt in porch_pts]
+            # (N, 2) array of (x, y) points.
+            pts = porch_pts.reshape(-1, 2)
             # Filter out points too close to the image boundaries (e.g., within 10 pixels)
-            valid_pts = [pt for pt in pts if pt[0] > 10 and pt[0] < (w-10) and pt[1] > 10 and pt[1] < (h-10)]
-            # If there are valid points, pick one randomly.
-            if valid_pts:
-                label_pt = random.choice(valid_pts)
+            xs, ys = pts[:, 0], pts[:, 1]
+            valid_pts = pts[(xs > 10) & (xs < (w-10)) & (ys > 10) & (ys < (h-10))]
+            # If there are valid points, pick one randomly (same draw as on a list).
+            if len(valid_pts):
+                label_pt = tuple(int(v) for v in random.choice(valid_pts))
             else:
                 # Fallback: use the first available porch point.
-                label_pt = pts[0]
+                label_pt = tuple(int(v) for v in pts[0])
             # Apply a small outward offset (e.g., 5 pixels) to ensure it is away from the boundary.
             final_pt = (label_pt[0] + 5, label_pt[1] + 5)
             cv2.putText(annotated, "Porch", (final_pt[0] - 20, final_pt[1]),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+            if document is not None:
+                document.porch = {"color": PORCH_HEX, "label": list(final_pt)}
         # ----- End New Code -----
 
         return annotated, floor_dict
 
-    def _get_floorplan_mask(self, annotated):
-        """
-        Invert threshold → find largest external contour → fill → return floor mask.
-        """
-        gray = cv2.cvtColor(annotated, cv2.COLOR_BGR2GRAY)
-        _, black_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-        cnts, _ = cv2.findContours(black_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not cnts:
-            return None
-        big_cnts = [c for c in cnts if cv2.contourArea(c) > 2000]
-        if not big_cnts:
-            return None
-        largest = max(big_cnts, key=cv2.contourArea)
-        mask = np.zeros_like(black_mask)
-        cv2.drawContours(mask, [largest], -1, 255, -1)
-        return mask
-
-    def _build_color_mask(self, annotated, floor_mask):
+    def _place_stairs_cached(self, annotated, living_contour, color_mask, floor_dict):
         """
-        Create a mask for known room colors.
+        _try_place_stairs, with the resulting position (or the failure) stored in
+        the cache under the image content and the stairs/color parameters.
         """
-        h, w = annotated.shape[:2]
-        total_mask = np.zeros((h, w), dtype=np.uint8)
-        for (bC, gC, rC) in self.room_colors:
-            lower = np.array([max(0, bC - self.tol), max(0, gC - self.tol), max(0, rC - self.tol)], dtype=np.uint8)
-            upper = np.array([min(255, bC + self.tol), min(255, gC + self.tol), min(255, rC + self.tol)], dtype=np.uint8)
-            mask = cv2.inRange(annotated, lower, upper)
-            mask = cv2.bitwise_and(mask, floor_mask)
-            total_mask = cv2.bitwise_or(total_mask, mask)
-        return total_mask
+        if self.cache is None:
+            return self._try_place_stairs(annotated, living_contour, color_mask, floor_dict)
+
+        key = self.cache.image_key(annotated, "stairs", stairs_w=self.stairs_w,
+                                   stairs_h=self.stairs_h, tol=self.tol,
+                                   room_colors=self.room_colors)
+        entry = self.cache.get_json(key, "stairs")
+        if entry is not None:
+            if entry["stairs"] is not None:
+                bx, by = entry["stairs"]
+                annotated, floor_dict = self._draw_stairs(annotated, bx, by, floor_dict)
+            return annotated, floor_dict
+
+        before = floor_dict.get("Stairs")
+        annotated, floor_dict = self._try_place_stairs(annotated, living_contour, color_mask, floor_dict)
+        stairs = floor_dict.get("Stairs")
+        placed = [stairs["x"], stairs["y"]] if stairs is not None and stairs is not before else None
+        self.cache.put_json(key, {"stairs": placed})
+        return annotated, floor_dict
 
     def _try_place_stairs(self, annotated, living_contour, color_mask, floor_dict):
         """
         Try a radial approach; if that fails, try a free-wall approach.
+        The first free wall point is tried directly on the masks (on most plans
+        one of its candidates fits); past it, stairs boxes and wall
+        neighbourhoods are tested with summed-area tables instead of scanning
+        the masks box by box.
         """
         h, w = annotated.shape[:2]
         lr_mask = np.zeros((h, w), dtype=np.uint8)
         cv2.drawContours(lr_mask, [living_contour], -1, 255, -1)
         boundary_pts = living_contour.reshape(-1, 2)
-        placed, annotated, floor_dict = self._radial_stairs(annotated, boundary_pts, lr_mask, color_mask, floor_dict)
+        position, rest = self._first_point_stairs(boundary_pts, lr_mask, color_mask)
+        if position is not None:
+            return self._draw_stairs(annotated, position[0], position[1], floor_dict)
+        tables = self._stairs_tables(lr_mask, color_mask, living_contour)
+        placed, annotated, floor_dict = self._radial_stairs(annotated, boundary_pts[rest:], tables,
+                                                            floor_dict)
         if not placed:
-            placed2, annotated, floor_dict = self._free_wall_segment(annotated, boundary_pts, lr_mask, color_mask, floor_dict)
+            placed2, annotated, floor_dict = self._free_wall_segment(annotated, boundary_pts, tables, floor_dict)
         return annotated, floor_dict
 
-    def _radial_stairs(self, annotated, boundary_pts, lr_mask, color_mask, floor_dict):
-        import math
-        for (x1, y1) in boundary_pts:
-            if self._neighbor_color(x1, y1, color_mask):
+    def _first_point_stairs(self, boundary_pts, lr_mask, color_mask):
+        """
+        The radial search of the first boundary point not next to a room color,
+        box by box on the masks (building the tables costs more than this).
+        :return: ((bx, by) or None, index of the boundary point after it)
+        """
+        h, w = color_mask.shape
+        area = self.stairs_w * self.stairs_h
+        for i, (x, y) in enumerate(boundary_pts.tolist()):
+            if color_mask[max(y - 1, 0):y + 2, max(x - 1, 0):x + 2].any():
                 continue
-            for dist in range(5, 40, 5):
-                for angle_deg in range(0, 360, 30):
-                    rad = math.radians(angle_deg)
-                    bx = int(x1 + dist * math.cos(rad))
-                    by = int(y1 + dist * math.sin(rad))
-                    if self._can_place_stairs_box(bx, by, annotated, lr_mask, color_mask):
-                        annotated, floor_dict = self._draw_stairs(annotated, bx, by, floor_dict)
-                        return True, annotated, floor_dict
+            for dx, dy in _RADIAL_OFFSETS:
+                # truncation toward zero, like the vectorized search
+                bx, by = int(x + dx), int(y + dy)
+                xB, yB = bx + self.stairs_w, by + self.stairs_h
+                if bx < 0 or by < 0 or xB > w or yB > h:
+                    continue
+                if (cv2.countNonZero(lr_mask[by:yB, bx:xB]) == area
+                        and cv2.countNonZero(color_mask[by:yB, bx:xB]) == 0):
+                    return (bx, by), i + 1
+            return None, i + 1
+        return None, len(boundary_pts)
+
+    def _stairs_tables(self, lr_mask, color_mask, living_contour):
+        """
+        Summed-area tables (integral images) of the living and room-color masks.
+        Every stairs box that fits lies inside the living room, and the 3x3
+        neighbourhood of every boundary point inside its bounding rect grown by
+        one pixel, so the tables only cover that window.
+        :return: (lr_sat, color_sat, (x0, y0) of the window)
+        """
+        h, w = lr_mask.shape
+        x, y, rw, rh = cv2.boundingRect(living_contour)
+        x0, y0 = max(x - 1, 0), max(y - 1, 0)
+        window = (slice(y0, min(y + rh + 1, h)), slice(x0, min(x + rw + 1, w)))
+        return cv2.integral(lr_mask[window]), cv2.integral(color_mask[window]), (x0, y0)
+
+    @staticmethod
+    def _box_sums(sat, x0, y0, x1, y1):
+        """
+        Sums over [x0, x1) x [y0, y1) for arrays of boxes, four lookups each.
+        """
+        return sat[y1, x1] - sat[y0, x1] - sat[y1, x0] + sat[y0, x0]
+
+    def _stairs_fit(self, tables, bx, by):
+        """
+        For arrays of top-left corners: True where the stairs box lies entirely
+        in the living room and touches no room color (masks are 0/255).
+        Boxes sticking out of the window are clipped into it for the lookups
+        and masked out afterwards (cheaper than gathering the inside ones).
+        """
+        lr_sat, color_sat, (ox, oy) = tables
+        rows, cols = lr_sat.shape[0] - 1, lr_sat.shape[1] - 1
+        x0, y0 = bx - ox, by - oy
+        max_x, max_y = cols - self.stairs_w, rows - self.stairs_h
+        inside = (x0 >= 0) & (y0 >= 0) & (x0 <= max_x) & (y0 <= max_y)
+        if max_x < 0 or max_y < 0:
+            return inside
+        # Flat index of each box's top-left corner; the other three are fixed offsets
+        stride = cols + 1
+        corner = np.clip(y0, 0, max_y) * stride + np.clip(x0, 0, max_x)
+        offsets = (self.stairs_h * stride + self.stairs_w, self.stairs_w, self.stairs_h * stride)
+        lr_flat, color_flat = lr_sat.ravel(), color_sat.ravel()
+
+        def sums(flat):
+            return (flat.take(corner + offsets[0]) - flat.take(corner + offsets[1])
+                    - flat.take(corner + offsets[2]) + flat.take(corner))
+
+        return (inside & (sums(lr_flat) == 255 * self.stairs_w * self.stairs_h)
+                & (sums(color_flat) == 0))
+
+    def _near_color(self, tables, pts):
+        """
+        For an (N, 2) array of points: True where the point or one of its
+        8 neighbours has a room color.
+        """
+        _, color_sat, (ox, oy) = tables
+        rows, cols = color_sat.shape[0] - 1, color_sat.shape[1] - 1
+        x, y = pts[:, 0] - ox, pts[:, 1] - oy
+        return self._box_sums(color_sat, np.clip(x - 1, 0, cols), np.clip(y - 1, 0, rows),
+                              np.clip(x + 2, 0, cols), np.clip(y + 2, 0, rows)) > 0
+
+    def _radial_stairs(self, annotated, boundary_pts, tables, floor_dict):
+        """
+        From each boundary point not next to a room color, try 7 distances x 12
+        angles; the first candidate (in that order) that fits gets the stairs.
+        The candidates of _RADIAL_CHUNK points are checked per vectorized pass,
+        stopping at the first pass with a fit.
+        """
+        pts = boundary_pts[~self._near_color(tables, boundary_pts)]
+        for start in range(0, len(pts), _RADIAL_CHUNK):
+            chunk = pts[start:start + _RADIAL_CHUNK]
+            # float64 + truncation toward zero, exactly like int(x1 + dist * cos)
+            bx = (chunk[:, 0:1] + _RADIAL_DX).astype(np.int64)
+            by = (chunk[:, 1:2] + _RADIAL_DY).astype(np.int64)
+            fits = self._stairs_fit(tables, bx, by)
+            first = fits.argmax()
+            if fits.flat[first]:
+                annotated, floor_dict = self._draw_stairs(annotated, int(bx.flat[first]),
+                                                          int(by.flat[first]), floor_dict)
+                return True, annotated, floor_dict
         return False, annotated, floor_dict
 
-    def _free_wall_segment(self, annotated, boundary_pts, lr_mask, color_mask, floor_dict):
-        free_pts = []
-        for (x1, y1) in boundary_pts:
-            if not self._neighbor_color(x1, y1, color_mask):
-                free_pts.append((x1, y1))
+    def _free_wall_segment(self, annotated, boundary_pts, tables, floor_dict):
+        free_pts = [tuple(pt) for pt in boundary_pts[~self._near_color(tables, boundary_pts)]]
         if len(free_pts) < 2:
             return False, annotated, floor_dict
 
@@ -278,36 +402,13 @@ class PrettyFloorplanMaker:
         offset = 5
         bx = int(mx + offset * lx)
         by = int(my + offset * ly)
-        if self._can_place_stairs_box(bx, by, annotated, lr_mask, color_mask):
+        if self._can_place_stairs_box(bx, by, tables):
             annotated, floor_dict = self._draw_stairs(annotated, bx, by, floor_dict)
             return True, annotated, floor_dict
         return False, annotated, floor_dict
 
-    def _neighbor_color(self, x, y, color_mask):
-        h, w = color_mask.shape
-        for dy in [-1, 0, 1]:
-            for dx in [-1, 0, 1]:
-                nx = x + dx
-                ny = y + dy
-                if nx < 0 or ny < 0 or nx >= w or ny >= h:
-                    continue
-                if color_mask[ny, nx] == 255:
-                    return True
-        return False
-
-    def _can_place_stairs_box(self, bx, by, annotated, lr_mask, color_mask):
-        h, w = annotated.shape[:2]
-        xB = bx + self.stairs_w
-        yB = by + self.stairs_h
-        if bx < 0 or by < 0 or xB > w or yB > h:
-            return False
-        sub_lr = lr_mask[by:yB, bx:xB]
-        if cv2.countNonZero(sub_lr) < self.stairs_w * self.stairs_h:
-            return False
-        sub_color = color_mask[by:yB, bx:xB]
-        if cv2.countNonZero(sub_color) > 0:
-            return False
-        return True
+    def _can_place_stairs_box(self, bx, by, tables):
+        return bool(self._stairs_fit(tables, np.array([bx]), np.array([by]))[0])
 
     def _draw_stairs(self, annotated, bx, by, floor_dict):
         """
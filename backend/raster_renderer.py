@@ -0,0 +1,165 @@
+import cv2
+import numpy as np
+
+try:
+    from .plan_layout import PlanLayout, ROOM_COLORS, ROOM_ALPHA
+    from .workspace import atomic_write_bytes, atomic_write_image
+except ImportError:
+    from plan_layout import PlanLayout, ROOM_COLORS, ROOM_ALPHA
+    from workspace import atomic_write_bytes, atomic_write_image
+
+# Renderer names accepted by get_renderer() and the --renderer flags
+RENDERERS = ("matplotlib", "raster")
+
+# Colors outside the palette (matplotlib's "gray")
+_UNKNOWN_BGR = (128, 128, 128)
+
+
+def hex_to_bgr(hex_color):
+    hex_color = hex_color.lstrip("#")
+    r, g, b = (int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+    return (b, g, r)
+
+
+class RasterFloorplanRenderer:
+    """
+    Draws the same picture as FloorplanVisualizer.plot_with_boundaries straight
+    into a BGR NumPy buffer with OpenCV, without matplotlib.
+
+    The output matches the matplotlib renders the image stages were tuned on:
+      - SIZE x SIZE pixels for the whole width x height floor, y axis up
+      - room fills are ROOM_COLORS blended with ROOM_ALPHA over white
+      - ~3 px black fused boundary, opaque doors, black labels on top
+    so RoomTypeDetector, PerfectPlanSelector and PrettyFloorplanMaker
+    see the same colors either way.
+    """
+
+    SIZE = 462
+    BOUNDARY_THICKNESS = 3
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+    FONT_SCALE = 0.35
+
+    def __init__(self, size=None, cache=None):
+        """
+        :param size:  output width/height in pixels (default SIZE).
+        :param cache: optional PlanCache; plans rendered before are not drawn again.
+        """
+        if size is not None:
+            self.SIZE = size
+        self.cache = cache
+
+    def _to_pixels(self, points, width, height):
+        pts = np.asarray(points, dtype=np.float64)
+        px = pts[:, 0] * (self.SIZE / width)
+        py = (height - pts[:, 1]) * (self.SIZE / height)
+        return np.round(np.stack([px, py], axis=1)).astype(np.int32)
+
+    def _render_key(self, floorplan, width, height):
+        return self.cache.render_key(floorplan, width, height, f"raster-{self.SIZE}", ROOM_COLORS)
+
+    def render(self, floorplan, width, height):
+        """
+        :return: uint8 BGR image of shape (SIZE, SIZE, 3).
+        """
+        if self.cache is None:
+            return self._draw(floorplan, width, height)
+        key = self._render_key(floorplan, width, height)
+        data = self.cache.get_bytes(key, "render")
+        if data is not None:
+            return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        img = self._draw(floorplan, width, height)
+        self.cache.put_bytes(key, cv2.imencode(".png", img)[1].tobytes())
+        return img
+
+    def _draw(self, floorplan, width, height):
+        img = np.full((self.SIZE, self.SIZE, 3), 255, dtype=np.uint8)
+        layout = PlanLayout.build(floorplan, width, height)
+
+        # 1) Room fills, blended in dict order like stacked matplotlib patches
+        for room_name, poly in layout.rooms.items():
+            base_type = room_name.split("_")[0]
+            color = ROOM_COLORS.get(base_type)
+            bgr = hex_to_bgr(color) if color else _UNKNOWN_BGR
+            x_min, y_min, x_max, y_max = poly.bounds
+            (c0, r1), (c1, r0) = self._to_pixels([(x_min, y_min), (x_max, y_max)], width, height)
+            c0, c1 = max(c0, 0), min(c1, self.SIZE)
+            r0, r1 = max(r0, 0), min(r1, self.SIZE)
+            if c1 <= c0 or r1 <= r0:
+                continue
+            region = img[r0:r1, c0:c1].astype(np.float32)
+            blended = region * (1 - ROOM_ALPHA) + np.array(bgr, dtype=np.float32) * ROOM_ALPHA
+            img[r0:r1, c0:c1] = blended.astype(np.uint8)
+
+        if layout.fused.is_empty:
+            return img
+
+        # 2) Doors (patches sit below the boundary line, like in matplotlib)
+        door_bgr = hex_to_bgr(ROOM_COLORS["Door"])
+        for door_rect in layout.doors:
+            pts = self._to_pixels(list(door_rect.exterior.coords), width, height)
+            cv2.fillPoly(img, [pts], door_bgr)
+
+        # 3) Fused black boundary
+        for ring in layout.boundary_rings():
+            pts = self._to_pixels(ring, width, height)
+            cv2.polylines(img, [pts], True, (0, 0, 0), self.BOUNDARY_THICKNESS)
+
+        # 4) Labels in the room centers
+        for room_name, poly in layout.rooms.items():
+            base_type = room_name.split("_")[0]
+            (tw, th), _ = cv2.getTextSize(base_type, self.FONT, self.FONT_SCALE, 1)
+            x_min, y_min, x_max, y_max = poly.bounds
+            center = ((x_min + x_max) / 2, (y_min + y_max) / 2)
+            cx, cy = self._to_pixels([center], width, height)[0]
+            cv2.putText(img, base_type, (int(cx - tw / 2), int(cy + th / 2)),
+                        self.FONT, self.FONT_SCALE, (0, 0, 0), 1, cv2.LINE_AA)
+        return img
+
+    def plot_with_boundaries(self, floorplan, save_path, width, height):
+        """
+        Drop-in for FloorplanVisualizer.plot_with_boundaries.
+        """
+        if self.cache is None:
+            atomic_write_image(save_path, self._draw(floorplan, width, height))
+            return
+        key = self._render_key(floorplan, width, height)
+        data = self.cache.get_bytes(key, "render")
+        if data is None:
+            data = cv2.imencode(".png", self._draw(floorplan, width, height))[1].tobytes()
+            self.cache.put_bytes(key, data)
+        atomic_write_bytes(save_path, data)
+
+
+class _CachedVisualizer:
+    """
+    FloorplanVisualizer with a PlanCache bound to it.
+    """
+
+    def __init__(self, visualizer, cache):
+        self.visualizer = visualizer
+        self.cache = cache
+
+    def plot_with_boundaries(self, floorplan, save_path, width, height):
+        self.visualizer.plot_with_boundaries(floorplan, save_path, width, height, cache=self.cache)
+
+    def render(self, floorplan, width, height):
+        return self.visualizer.render(floorplan, width, height, cache=self.cache)
+
+
+def get_renderer(name="matplotlib", cache=None):
+    """
+    Renderer object with plot_with_boundaries(floorplan, save_path, width, height)
+    and render(floorplan, width, height) methods, optionally backed by a PlanCache.
+    matplotlib is imported only when it is asked for.
+    """
+    if name == "raster":
+        return RasterFloorplanRenderer(cache=cache)
+    if name == "matplotlib":
+        try:
+            from .floorplan_visualizer import FloorplanVisualizer
+        except ImportError:
+            from floorplan_visualizer import FloorplanVisualizer
+        if cache is not None:
+            return _CachedVisualizer(FloorplanVisualizer(), cache)
+        return FloorplanVisualizer()
+    raise ValueError(f"Unknown renderer '{name}', expected one of {RENDERERS}.")
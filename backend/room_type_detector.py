@@ -1,73 +1,163 @@
 import os
+import sys
 import cv2
 import numpy as np
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from .plan_regions import compute_plan_regions
+    from .plan_record import PlanRecord, iter_records, clear_stage_files
+    from .plan_document import read_document
+    from .image_io import ImageWriter, list_images, map_ordered
+    from .workspace import stage_dir
+except ImportError:
+    from plan_regions import compute_plan_regions
+    from plan_record import PlanRecord, iter_records, clear_stage_files
+    from plan_document import read_document
+    from image_io import ImageWriter, list_images, map_ordered
+    from workspace import stage_dir
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None where the
+    resource module is not available).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
 class RoomTypeDetector:
     """
     1) Only selects images that have exactly 1 living room (strictly-white region
        inside the largest black boundary).
-    2) Ensures at least 8 final images if possible. If fewer than 8 total images
-       are available, it just saves whatever it can.
+    2) Ensures at least min_plans final images if possible. If fewer than
+       min_plans total images are available, it just saves whatever it can.
     """
 
-    def __init__(self, input_dir="output", output_dir="finaloutput"):
+    def __init__(self, input_dir="output", output_dir="finaloutput", workspace=None, workers=1,
+                 min_plans=6):
         """
         :param input_dir:  Folder where raw floorplan images are found
         :param output_dir: Folder where final chosen floorplans are saved
+        :param workspace:  optional Workspace; the folders are then stages inside it
+        :param workers:    threads decoding, scoring and writing images
+        :param min_plans:  plans to keep when there are that many (filled up with
+                           images without exactly 1 living room); the number of
+                           plans the caller renders, e.g. 3 for main.py
         """
-        self.input_dir = input_dir
-        self.output_dir = output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.input_dir = stage_dir(input_dir, workspace)
+        self.output_dir = stage_dir(output_dir, workspace)
+        self.workers = max(1, workers)
+        self.min_plans = min_plans
 
         # Strict near-white threshold for living-room detection
         self.living_room_lower = np.array([240, 240, 240], dtype=np.uint8)
         self.living_room_upper = np.array([255, 255, 255], dtype=np.uint8)
 
-    def detect_and_label_images(self):
+    def detect_and_label_images(self, two_pass=True):
         """
         Main pipeline:
           1) Collect living-room info for each image (largest black boundary => find white).
           2) Separate images with exactly 1 LR from others.
-          3) If we have >=8 in the 1-LR list, pick up to 10 from them.
-             Otherwise, we take all from 1-LR and fill with 'other' images to reach 8 (if possible).
+          3) If we have >=min_plans in the 1-LR list, pick up to 10 from them.
+             Otherwise, we take all from 1-LR and fill with 'other' images to reach
+             min_plans (if possible).
           4) Label the living room in those that have exactly 1 LR, then save everything in output_dir.
+        :param two_pass: score every image and drop its pixels right away, keeping
+                         only (filename, living rooms) handles, then re-decode just
+                         the chosen ones for labeling. Otherwise the chosen
+                         candidates are kept decoded while scanning.
         """
-        all_data = self._collect_living_room_info()
-        if not all_data:
-            print("No images found in input directory.")
+        if two_pass:
+            final_plans = self._two_pass_selection()
+        else:
+            final_plans = self.select_records(self._collect_living_room_info())
+        peak = peak_rss_mb()
+        if peak is not None:
+            print(f"Detector peak RSS: {peak:.1f} MB")
+        if not final_plans:
             return
 
+        # Clear old files
+        clear_stage_files(self.output_dir)
+
+        # Step E: save (images + documents; main.py copies the flat JSON)
+        with ImageWriter(self.workers) as writer:
+            for record in final_plans:
+                record.write(self.output_dir, with_plan=False, writer=writer)
+
+    def select_records(self, records):
+        """
+        Steps B-D of detect_and_label_images on PlanRecords (any iterable, consumed lazily).
+        Sets record.living_rooms and returns the chosen records, with the
+        single living room labeled.
+        At most 10 one-LR and min_plans other records are held at a time, and reading
+        stops once 10 one-LR plans are found (later ones could not be chosen).
+        """
+        return self._label(self._choose(records))
+
+    def _choose(self, records):
+        """
+        Steps B-D: the records to keep, in selection order ([] if none).
+        """
         # Step B: separate images that have exactly 1 LR from those that do not
-        one_lr_list = [x for x in all_data if len(x[2]) == 1]
-        other_list  = [x for x in all_data if len(x[2]) != 1]
+        one_lr_list = []
+        other_list = []
+        seen = 0
+        for record in records:
+            seen += 1
+            if record.living_rooms is None:
+                record.living_rooms = self._find_living_rooms(record.image, record.regions())
+            if len(record.living_rooms) == 1:
+                one_lr_list.append(record)
+                if len(one_lr_list) == 10:
+                    break
+            elif len(other_list) < self.min_plans:
+                other_list.append(record)
+
+        if not seen:
+            print("No images found in input directory.")
+            return []
 
-        # Step C: if we have >=8 in one_lr_list, pick up to 10
-        if len(one_lr_list) >= 6:
-            final_plans = one_lr_list[:10]  # e.g. 8..10
+        # Step C: if we have >=min_plans in one_lr_list, pick up to 10
+        if len(one_lr_list) >= self.min_plans:
+            final_plans = one_lr_list[:10]
         else:
-            # fewer than 8 => take them all, fill from 'other_list'
+            # fewer than min_plans => take them all, fill from 'other_list'
             final_plans = list(one_lr_list)
-            needed = 6 - len(final_plans)
+            needed = self.min_plans - len(final_plans)
             if needed > 0:
                 final_plans.extend(other_list[:needed])
 
         if not final_plans:
             print("No final plans chosen. Nothing saved.")
-            return
-
-        # Step D: if final <8, we just do what we can
-        if len(final_plans) < 6:
-            print(f"Warning: only {len(final_plans)} floorplans in total (need >=8).")
+            return []
 
-        # Clear old files
-        for f in os.listdir(self.output_dir):
-            if f.lower().endswith((".png",".jpg",".jpeg")):
-                os.remove(os.path.join(self.output_dir, f))
-
-        # Step E: label + save
-        for (filename, img, centroids) in final_plans:
-            if len(centroids) == 1:  # label the 1 LR
-                (cx, cy) = centroids[0]
+        # Step D: if final <min_plans, we just do what we can
+        if len(final_plans) < self.min_plans:
+            print(f"Warning: only {len(final_plans)} floorplans in total "
+                  f"(need >={self.min_plans}).")
+        return final_plans
+
+    def _label(self, final_plans):
+        # Step E: label the 1 LR (on a copy, the input records keep their pixels)
+        # and note where in the record's document
+        labeled = []
+        for record in final_plans:
+            document = record.plan_document().copy()
+            document.add_provenance("finaloutput", source=record.filename,
+                                    living_rooms=len(record.living_rooms))
+            if len(record.living_rooms) == 1:
+                (cx, cy) = record.living_rooms[0]
+                img = record.image.copy()
                 cv2.putText(
                     img,
                     "Living Room",
@@ -78,62 +168,63 @@ class RoomTypeDetector:
                     1,
                     cv2.LINE_AA
                 )
-
-            out_path = os.path.join(self.output_dir, filename)
-            cv2.imwrite(out_path, img)
+                document.set_label("Living Room", [(cx, cy)])
+                label_record = PlanRecord(record.filename, record.plan, img)
+                label_record.living_rooms = record.living_rooms
+                record = label_record
+            record.document = document
+            labeled.append(record)
+        return labeled
 
     def _collect_living_room_info(self):
         """
-        Return [(filename, image, [(cx,cy),...])] for each floorplan.
+        Yield a PlanRecord per floorplan image in input_dir (with its plan, for the document).
         """
-        image_data_list = []
-        for fname in os.listdir(self.input_dir):
-            if not fname.lower().endswith((".png",".jpg",".jpeg")):
-                continue
-            path = os.path.join(self.input_dir, fname)
-            img = cv2.imread(path)
+        return iter_records(self.input_dir, workers=self.workers)
+
+    def _two_pass_selection(self):
+        """
+        Pass 1 scores the images (on `workers` threads, in listdir order) into
+        pixel-less handles; pass 2 re-decodes only the chosen ones and labels them.
+        At most 2 * workers decoded images are alive during the scan.
+        """
+        scores = map_ordered(self._score_file, list_images(self.input_dir), self.workers)
+        handles = (handle for handle in scores if handle is not None)
+        try:
+            chosen = self._choose(handles)
+        finally:
+            scores.close()
+        paths = [os.path.join(self.input_dir, record.filename) for record in chosen]
+        decoded = []
+        for record, img in zip(chosen, map_ordered(cv2.imread, paths, self.workers)):
+            # deleted or truncated since pass 1 => dropped, like unreadable files in pass 1
             if img is None:
+                print(f"Skipping {record.filename}: it can no longer be read.")
                 continue
+            record.image = img
+            record.document = read_document(self.input_dir, record.name, recover=False)
+            decoded.append(record)
+        return self._label(decoded)
 
-            living_rooms = self._find_living_rooms(img)
-            image_data_list.append((fname, img, living_rooms))
-
-        return image_data_list
-
-    def _find_living_rooms(self, image):
+    def _score_file(self, fname):
+        """
+        Decode one image and keep only its living-room centroids.
+        :return: a PlanRecord without pixels, or None if the file can't be read
+        """
+        img = cv2.imread(os.path.join(self.input_dir, fname))
+        if img is None:
+            return None
+        handle = PlanRecord(fname, {}, None)
+        handle.living_rooms = self._find_living_rooms(img)
+        return handle
+
+    def _find_living_rooms(self, image, regions=None):
         """
         1) Find largest black boundary => floorplan_mask
-        2) Inside that => find strictly-white => living rooms
-        3) Return centroid list
-        """
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        # black => invert => external contour
-        _, black_mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-        cnts, _ = cv2.findContours(black_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not cnts:
-            return []
-
-        # largest boundary => fill mask
-        largest = max(cnts, key=cv2.contourArea)
-        floorplan_mask = np.zeros_like(black_mask)
-        cv2.drawContours(floorplan_mask, [largest], -1, 255, -1)
-
-        # strictly white => inRange => living
-        living_mask = cv2.inRange(image, self.living_room_lower, self.living_room_upper)
-        # bitwise-and with floorplan_mask
-        living_mask = cv2.bitwise_and(living_mask, floorplan_mask)
-
-        # find living-room contours
-        living_cnts, _ = cv2.findContours(living_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        centroids = []
-        for c in living_cnts:
-            area = cv2.contourArea(c)
-            if area < 10:
-                continue
-            M = cv2.moments(c)
-            if M["m00"] != 0:
-                cx = int(M["m10"]/M["m00"])
-                cy = int(M["m01"]/M["m00"])
-                centroids.append((cx, cy))
-
-        return centroids
+        2) Inside that => label the strictly-white components => living rooms
+        3) Return the centroids of the ones with at least 10 pixels
+        :param regions: PlanRegions of the image if already computed (pipeline mode).
+        """
+        if regions is None:
+            regions = compute_plan_regions(image)
+        return regions.living_centroids(min_area=10)
@@ -0,0 +1,290 @@
+import os
+import re
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .workspace import atomic_write_json
+except ImportError:
+    from workspace import atomic_write_json
+
+DEFAULT_SPEC_CACHE_DIR = ".spec_cache"
+DEFAULT_SPEC_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# What the LLM is told to assume for anything the user did not say
+DEFAULT_SPECS = {
+    "bedrooms": 2,
+    "washrooms": 1,
+    "has_garage": False,
+    "has_attachedwashroom": False,
+}
+
+SYSTEM_PROMPT = """
+You are a helpful AI that extracts floorplan specs from the user's text.
+They might mention:
+ - number of bedrooms (1..3)
+ - number of washrooms (1..3)
+ - garage or not
+ - attached washrooms or not
+If not stated, defaults: bedrooms=2, washrooms=1, has_garage=false, attached=false.
+Return strictly valid JSON with 4 keys: bedrooms, washrooms, has_garage, has_attachedwashroom.
+No extra text, just JSON.
+"""
+
+_NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "single": 1, "two": 2, "double": 2, "three": 3}
+_COUNT = r"\b(\d+|a|an|one|single|two|double|three)"
+_BEDROOM = r"(?:bed\s*rooms?|beds?|br)\b"
+_WASHROOM = r"(?:wash\s*rooms?|bath\s*rooms?|baths?|toilets?)\b"
+_NEGATION = r"(?:no|without|not|don'?t want|do not want|skip)"
+# Any negating word; one near "attached" that _NEGATION's strict form misses
+# means the local parse can't tell what was meant
+_ANY_NEGATION = re.compile(r"\b(?:no|not|without|never|none|skip|don'?t|doesn'?t|isn'?t)\b|n't\b")
+_ATTACHED = re.compile(r"attached|en-?suite")
+# Clauses of a description (negations only apply within their own)
+_CLAUSE_SPLIT = re.compile(r"[,;.!?]|\bbut\b")
+
+# The two regexes parse_floorplan_request always applied on top of the LLM answer
+_BED_MATCH = re.compile(r'(\d+)\s+bedroom')
+_WASH_MATCH = re.compile(r'(\d+)\s+(?:washroom|bathroom)')
+
+
+def normalize_description(text):
+    """
+    Cache key text: lowercase, single spaces, no surrounding punctuation.
+    """
+    return re.sub(r"\s+", " ", (text or "").lower()).strip(" .,!?;:")
+
+
+def _count(word):
+    return int(word) if word.isdigit() else _NUMBER_WORDS[word]
+
+
+def parse_local(text):
+    """
+    Regex parse of a description.
+    :return: (specs, complete). specs holds whatever was found; complete is True
+             when nothing is left for the LLM to decide (see finalize_specs for
+             which answers it could still change).
+    """
+    text = normalize_description(text)
+    specs = {}
+
+    bed = re.search(_COUNT + r"[\s-]*" + _BEDROOM, text)
+    if bed:
+        specs["bedrooms"] = _count(bed.group(1))
+    wash = re.search(_COUNT + r"(?:\s+attached)?[\s-]*" + _WASHROOM, text)
+    if wash:
+        specs["washrooms"] = _count(wash.group(1))
+
+    if re.search(_NEGATION + r"\s+(?:\w+\s+)?garage", text):
+        specs["has_garage"] = False
+    elif "garage" in text:
+        specs["has_garage"] = True
+
+    if re.search(_NEGATION + r"\s+(?:\w+\s+)?(?:attached|en-?suite)", text):
+        specs["has_attachedwashroom"] = False
+    elif _ATTACHED.search(text):
+        specs["has_attachedwashroom"] = True
+
+    # has_garage is always forced on and attached washrooms are forced on from
+    # 2 bedrooms up, so only the room counts (and attached for 1 bedroom) matter
+    complete = "bedrooms" in specs and "washrooms" in specs and (
+        specs["bedrooms"] >= 2 or "has_attachedwashroom" in specs
+    )
+    if complete and _ambiguous(text):
+        complete = False
+    return specs, complete
+
+
+def _ambiguous(text):
+    """
+    True for phrasings parse_local would misread, which the LLM has to decide:
+      - a room noun mentioned more than once ("2 bedrooms ... plus 1 extra
+        bedroom"), since only the first count is used;
+      - a negation in the same clause as "attached"/"ensuite" that is not the
+        strict "no attached ..." form ("no need for the bathroom to be attached").
+    """
+    for noun in (_BEDROOM, _WASHROOM):
+        if len(re.findall(r"(?<![a-z])" + noun, text)) > 1:
+            return True
+    for clause in _CLAUSE_SPLIT.split(text):
+        if (_ATTACHED.search(clause) and _ANY_NEGATION.search(clause)
+                and not re.search(_NEGATION + r"\s+(?:\w+\s+)?(?:attached|en-?suite)", clause)):
+            return True
+    return False
+
+
+def finalize_specs(data, user_text):
+    """
+    The rules parse_floorplan_request applies to any raw answer (LLM or local):
+    clamp the counts, let explicit "<n> bedroom(s)/washroom(s)" in the text win,
+    always add a garage, attach washrooms from 2 bedrooms up, pick the language.
+    """
+    data = dict(data)
+    bedrooms = data.get("bedrooms", 2)
+    if bedrooms not in [1, 2, 3]:
+        bedrooms = 2
+    washrooms = data.get("washrooms", 1)
+    if washrooms not in [1, 2, 3]:
+        washrooms = 1
+    has_attachedwashroom = bool(data.get("has_attachedwashroom", False))
+    text_lower = user_text.lower()
+    bed_match = _BED_MATCH.search(text_lower)
+    if bed_match:
+        bed_num = int(bed_match.group(1))
+        if bed_num in [1, 2, 3]:
+            bedrooms = bed_num
+    wash_match = _WASH_MATCH.search(text_lower)
+    if wash_match:
+        wash_num = int(wash_match.group(1))
+        if wash_num in [1, 2, 3]:
+            washrooms = wash_num
+    has_garage = True
+    if bedrooms >= 2:
+        has_attachedwashroom = True
+    data["language"] = "Urdu" if "urdu" in text_lower else "English"
+    data["bedrooms"] = bedrooms
+    data["washrooms"] = washrooms
+    data["has_garage"] = has_garage
+    data["has_attachedwashroom"] = has_attachedwashroom
+    return data
+
+
+class OpenAIChatClient:
+    """
+    The real LLM behind SpecParser: openai.ChatCompletion, imported on first use
+    (the API key is whatever openai.api_key holds at call time).
+    Any object with the same complete(messages) method can replace it, e.g. a
+    canned-answer client when running offline.
+    """
+
+    def __init__(self, model="gpt-3.5-turbo"):
+        self.model = model
+
+    def complete(self, messages):
+        import openai
+        response = openai.ChatCompletion.create(model=self.model, messages=messages,
+                                                temperature=0.0)
+        return response["choices"][0]["message"]["content"]
+
+
+class SpecParser:
+    """
+    Description text -> floorplan specs, as cheaply as possible:
+      1) the local regex parser, when it resolves everything
+      2) the memo (in memory, then <cache_dir>/<key>.json younger than ttl_seconds),
+         keyed by the normalized description; the LLM runs at temperature 0, so
+         the same text always gets the same answer
+      3) the LLM client, whose raw answer is stored in the memo
+    Either way finalize_specs() is applied to the raw answer, exactly like before.
+    counts tells how each parse was resolved ("local", "memory", "disk", "llm", "fallback").
+    """
+
+    def __init__(self, client=None, cache_dir=DEFAULT_SPEC_CACHE_DIR,
+                 ttl_seconds=DEFAULT_SPEC_TTL_SECONDS, workers=4):
+        """
+        :param client:    object with complete(messages) -> str; OpenAIChatClient() if None.
+        :param cache_dir: on-disk memo folder (None => memory only).
+        :param workers:   concurrent LLM calls in parse_many().
+        """
+        self.client = client or OpenAIChatClient()
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.workers = workers
+        self.counts = {}
+        self._memo = {}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def parse(self, user_text):
+        return finalize_specs(self._raw(user_text), user_text)
+
+    def parse_many(self, texts):
+        """
+        parse() for many descriptions: duplicates are parsed once and the LLM
+        calls that remain run concurrently.
+        :return: specs in input order
+        """
+        raw = {}
+        pending = {}
+        for text in texts:
+            key = normalize_description(text)
+            if key in raw or key in pending:
+                continue
+            data = self._lookup(text)
+            if data is None:
+                pending[key] = text
+            else:
+                raw[key] = data
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                raw.update(zip(pending, pool.map(self._raw, pending.values())))
+        return [finalize_specs(raw[normalize_description(text)], text) for text in texts]
+
+    def _count(self, how):
+        self.counts[how] = self.counts.get(how, 0) + 1
+
+    def _lookup(self, user_text):
+        """
+        Raw answer without calling the LLM (local parse or memo), else None.
+        """
+        specs, complete = parse_local(user_text)
+        if complete:
+            self._count("local")
+            return dict(DEFAULT_SPECS, **specs)
+
+        key = self._key(user_text)
+        if key in self._memo:
+            self._count("memory")
+            return self._memo[key]
+        data = self._read_disk(key)
+        if data is not None:
+            self._memo[key] = data
+            self._count("disk")
+        return data
+
+    def _raw(self, user_text):
+        data = self._lookup(user_text)
+        if data is not None:
+            return data
+
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user",
+             "content": f"User request:\n{user_text}\nExtract the parameters in JSON only."},
+        ]
+        try:
+            data = json.loads(self.client.complete(messages).strip())
+        except Exception as e:
+            # not memoized: the next request retries the LLM
+            print("OpenAI API error, using defaults:", e)
+            self._count("fallback")
+            return dict(DEFAULT_SPECS)
+
+        self._count("llm")
+        key = self._key(user_text)
+        self._memo[key] = data
+        if self.cache_dir:
+            atomic_write_json(self._path(key), {"created": time.time(), "specs": data})
+        return data
+
+    @staticmethod
+    def _key(user_text):
+        return hashlib.sha1(normalize_description(user_text).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created", 0) > self.ttl_seconds:
+            return None
+        return entry.get("specs")
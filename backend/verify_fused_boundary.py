@@ -0,0 +1,95 @@
+# verify_fused_boundary.py
+#
+# Check that the grid-based fused boundary (RoomAdjacencyGraph closing distance)
+# gives exactly the outline of the old iterative shapely buffer loop
+# (plan_layout.fuse_boundary) and time both, from the same room union.
+#
+#   python verify_fused_boundary.py [json_dir] [--random N]
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+
+from shapely.ops import unary_union
+
+from plan_analysis import PlanGrid, fuse_footprint
+from plan_layout import room_polygons, fuse_boundary, close_union, adjacency_graph
+from floorplan_generator import FloorplanGenerator
+
+
+def load_plans(json_dir):
+    plans = []
+    for path in sorted(glob.glob(os.path.join(json_dir, "*.json"))):
+        with open(path, "r") as f:
+            plans.append((os.path.basename(path), json.load(f)))
+    return plans
+
+
+def random_plans(count, seed=0):
+    """
+    Freshly initialized (mostly disconnected) plans: the buffer loop's worst case.
+    """
+    random.seed(seed)
+    rooms = ["Bedroom_1", "Bedroom_2", "Washroom_1", "Washroom_2", "Kitchen", "Garage"]
+    generator = FloorplanGenerator(rooms=rooms)
+    generator.POPULATION_SIZE = count
+    return [(f"random_{i+1}", fp) for i, fp in enumerate(generator.initialize_population())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and time the grid fused boundary.")
+    parser.add_argument("json_dir", nargs="?",
+                        default=os.path.join(os.path.dirname(__file__), "..", "finaloutput"))
+    parser.add_argument("--random", type=int, default=0,
+                        help="Also check N freshly initialized GA plans.")
+    args = parser.parse_args()
+
+    plans = load_plans(args.json_dir) + random_plans(args.random)
+    if not plans:
+        print(f"No plans found in {args.json_dir}.")
+        sys.exit(1)
+
+    # Both sides start from the same room union; the rest of the adjacency
+    # graph (walls, doors) replaces place_doors and is timed on its own.
+    loop_time = 0.0
+    grid_time = 0.0
+    graph_time = 0.0
+    for name, plan in plans:
+        union = unary_union(list(room_polygons(plan).values()))
+
+        start = time.perf_counter()
+        expected = fuse_boundary(union)
+        loop_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        graph = adjacency_graph(plan, 20, 20)
+        graph_time += time.perf_counter() - start
+        if graph is None:
+            print(f"{name}: not an integer plan, the shapely loop is used.")
+            continue
+
+        occupied = PlanGrid(plan, 20, 20).occupied
+        start = time.perf_counter()
+        _, dist = fuse_footprint(occupied)
+        fused = close_union(union, min(dist, 50))
+        grid_time += time.perf_counter() - start
+        if graph.closing_distance != min(dist, 50):
+            print(f"Closing distance mismatch on {name}.")
+            sys.exit(1)
+
+        if not (fused.geom_type == expected.geom_type and fused.equals(expected)):
+            print(f"Mismatch on {name}:\n  loop {expected.wkt}\n  grid {fused.wkt}")
+            sys.exit(1)
+
+    print(f"{len(plans)} plans, identical outlines.")
+    print(f"buffer loop {loop_time / len(plans) * 1000:.2f} ms/plan | "
+          f"grid {grid_time / len(plans) * 1000:.2f} ms/plan "
+          f"(whole adjacency graph {graph_time / len(plans) * 1000:.2f} ms/plan)")
+
+
+if __name__ == "__main__":
+    main()
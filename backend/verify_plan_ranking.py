@@ -0,0 +1,88 @@
+# verify_plan_ranking.py
+#
+# Check that PerfectPlanSelector's bounded-heap selection picks the same plans,
+# in the same order, as scoring every plan and sorting the full list (the way
+# it used to), for the image living area and for a multi-metric PlanScore.
+# Candidates are copies of the renders (+ JSON) in image_dir; times both ways.
+#
+#   python verify_plan_ranking.py [image_dir] [--count 2000] [--k 3]
+#                                 [--weights living_area=1,compactness=20,wall_length=-0.5]
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from benchmark_image_io import make_plan_dir
+from image_io import list_images
+from perfect_plan_selector import PerfectPlanSelector
+from plan_ranking import PlanScore, parse_weights
+from plan_record import iter_records
+
+
+def sorted_selection(selector, k):
+    """
+    The old way: score every plan, sort everything, take the first k
+    (only names and scores are kept here, the old code held every image).
+    """
+    connected = []
+    for record in iter_records(selector.input_dir, with_plans=selector.score is not None):
+        ok, living_area = selector._measure(record)
+        if ok:
+            score = living_area if selector.score is None else selector.score(record.plan)
+            connected.append((score, record.filename))
+    connected.sort(key=lambda x: x[0], reverse=True)
+    return [name for _, name in connected[:k]]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the top-k plan selection.")
+    parser.add_argument("image_dir", nargs="?",
+                        default=os.path.join(os.path.dirname(__file__), "..", "frontend", "output"))
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--weights", type=parse_weights,
+                        default=parse_weights("living_area=1,compactness=20,wall_length=-0.5"))
+    args = parser.parse_args()
+
+    if not list_images(args.image_dir):
+        print(f"No images found in {args.image_dir}.")
+        sys.exit(1)
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        plans = make_plan_dir(args.image_dir, args.count, os.path.join(tmp, "plans"))
+        print(f"{args.count} plans from {args.image_dir}, k={args.k}")
+        for label, score in (("image living area", None), (repr(PlanScore(args.weights)), PlanScore(args.weights))):
+            out = os.path.join(tmp, "perfect")
+            os.makedirs(out, exist_ok=True)
+            selector = PerfectPlanSelector(plans, out, k=args.k, score=score)
+            expected, old_time = timed(lambda: sorted_selection(selector, args.k))
+
+            devnull = open(os.devnull, "w")
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                _, new_time = timed(selector.select_connected_plans)
+            finally:
+                sys.stdout = stdout
+                devnull.close()
+            got = sorted(list_images(out))
+            if got != sorted(expected):
+                mismatches += 1
+                print(f"Mismatch for {label}: sorted {sorted(expected)}, heap {got}")
+            print(f"{label}: full sort {old_time:6.2f}s | top-k heap {new_time:6.2f}s")
+
+    if mismatches:
+        sys.exit(1)
+    print("Selections identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# verify_spec_parser.py
+#
+# Offline check of SpecParser with a canned-answer client instead of OpenAI:
+#   - fully specified descriptions are parsed locally (no client call)
+#   - the same description is sent to the client once (memory, then disk memo)
+#   - expired disk entries are asked again
+#   - results match the old parse_floorplan_request rules for the same LLM answer
+#
+#   python verify_spec_parser.py
+
+import sys
+import json
+import time
+import tempfile
+
+from spec_parser import SpecParser, parse_local, finalize_specs
+
+
+class CannedChatClient:
+    """
+    Stand-in LLM: answers every prompt with the same JSON and counts the calls.
+    """
+
+    def __init__(self, answer, fail=False):
+        self.answer = answer
+        self.fail = fail
+        self.calls = 0
+
+    def complete(self, messages):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("offline")
+        return json.dumps(self.answer)
+
+
+def check(label, condition):
+    print(f"{'ok  ' if condition else 'FAIL'} {label}")
+    return condition
+
+
+def main():
+    answer = {"bedrooms": 1, "washrooms": 2, "has_garage": False, "has_attachedwashroom": True}
+    results = []
+
+    # 1) local parse
+    cases = {
+        "Generate a 3 bedroom, 2 washroom house with a garage.": (3, 2),
+        "two bedrooms and one bathroom please": (2, 1),
+        "3br 2 bath, no garage": (3, 2),
+        "a single bedroom with one attached bathroom": (1, 1),
+    }
+    for text, (beds, baths) in cases.items():
+        specs, complete = parse_local(text)
+        results.append(check(f"local: {text!r}", complete and specs["bedrooms"] == beds
+                             and specs["washrooms"] == baths))
+    results.append(check("local: 1 bedroom without attached info needs the LLM",
+                         not parse_local("1 bedroom, 1 washroom")[1]))
+    results.append(check("local: 'extra bedroom' is not a count",
+                         "bedrooms" not in parse_local("an extra bedroom maybe")[0]))
+    # phrasings the regexes would misread are left to the LLM
+    for text in ("1 bedroom 1 bathroom, no need for the bathroom to be attached",
+                 "2 bedrooms 1 bathroom plus 1 extra bedroom",
+                 "1 bedroom 1 bathroom, attached is not needed",
+                 "3 bedrooms, 1 washroom and another washroom downstairs"):
+        results.append(check(f"local: {text!r} needs the LLM", not parse_local(text)[1]))
+    specs, complete = parse_local("1 bedroom 1 bathroom, not attached")
+    results.append(check("local: strict 'no attached' is still parsed locally",
+                         complete and specs["has_attachedwashroom"] is False))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = CannedChatClient(answer)
+        parser = SpecParser(client=client, cache_dir=cache_dir)
+        vague = "A cosy family home in Urdu"
+
+        specs = parser.parse("3 bedroom 2 washroom house")
+        results.append(check("fully specified text never calls the client", client.calls == 0))
+
+        first = parser.parse(vague)
+        again = parser.parse("  a cosy   family home in URDU! ")
+        results.append(check("same normalized text => one client call", client.calls == 1))
+        results.append(check("memoized answer == fresh answer", first == again))
+        results.append(check("old rules applied", first == finalize_specs(answer, vague)))
+        results.append(check("language detected", first["language"] == "Urdu"))
+
+        # 2) disk memo survives a new parser, and expires
+        other = SpecParser(client=client, cache_dir=cache_dir)
+        other.parse(vague)
+        results.append(check("disk memo hit from a new parser", client.calls == 1
+                             and other.counts.get("disk") == 1))
+        expired = SpecParser(client=client, cache_dir=cache_dir, ttl_seconds=0)
+        time.sleep(0.01)
+        expired.parse(vague)
+        results.append(check("expired entry asks again", client.calls == 2))
+
+        # 3) batch: duplicates collapse, locals skip the client
+        batch_client = CannedChatClient(answer)
+        batch = SpecParser(client=batch_client, cache_dir=None)
+        texts = ["nice house", "Nice house.", "another house", "2 bedroom 1 washroom"]
+        out = batch.parse_many(texts)
+        results.append(check("parse_many: 2 unique vague texts => 2 calls", batch_client.calls == 2))
+        results.append(check("parse_many keeps input order", out[3]["bedrooms"] == 2
+                             and out[0] == out[1]))
+
+        # 4) failing client => defaults, not memoized
+        failing = CannedChatClient(answer, fail=True)
+        fallback = SpecParser(client=failing, cache_dir=None)
+        specs = fallback.parse(vague)
+        fallback.parse(vague)
+        results.append(check("client errors fall back to defaults",
+                             specs["bedrooms"] == 2 and specs["washrooms"] == 1))
+        results.append(check("fallbacks are retried", failing.calls == 2))
+
+    if not all(results):
+        sys.exit(1)
+    print("All spec parser checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# verify_stairs_placement.py
+#
+# Check that PrettyFloorplanMaker's summed-area-table stairs search puts the
+# stairs exactly where the old box-by-box search did (same position, or no
+# stairs in both), for several stairs sizes, and time both.
+#
+#   python verify_stairs_placement.py [image_dir ...] [--sizes 15 10 25] [--scale 4]
+
+import os
+import sys
+import math
+import time
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+from image_io import iter_images
+from plan_masks import compute_plan_masks
+from pretty_floorplan_maker import PrettyFloorplanMaker
+
+
+class LegacyStairs:
+    """
+    The per-point, per-box search the prettifier used before (radial + free wall).
+    """
+
+    def __init__(self, maker):
+        # the maker's unchanged geometry helpers (_distance, _segment_length)
+        self.maker = maker
+        self.stairs_w = maker.stairs_w
+        self.stairs_h = maker.stairs_h
+
+    def place(self, shape, living_contour, color_mask):
+        h, w = shape
+        lr_mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.drawContours(lr_mask, [living_contour], -1, 255, -1)
+        boundary_pts = living_contour.reshape(-1, 2)
+        return (self.radial(shape, boundary_pts, lr_mask, color_mask)
+                or self.free_wall(shape, boundary_pts, lr_mask, color_mask))
+
+    def radial(self, shape, boundary_pts, lr_mask, color_mask):
+        for (x1, y1) in boundary_pts:
+            if self.neighbor_color(x1, y1, color_mask):
+                continue
+            for dist in range(5, 40, 5):
+                for angle_deg in range(0, 360, 30):
+                    rad = math.radians(angle_deg)
+                    bx = int(x1 + dist * math.cos(rad))
+                    by = int(y1 + dist * math.sin(rad))
+                    if self.can_place(bx, by, shape, lr_mask, color_mask):
+                        return (bx, by)
+        return None
+
+    def free_wall(self, shape, boundary_pts, lr_mask, color_mask):
+        free_pts = [(x1, y1) for (x1, y1) in boundary_pts
+                    if not self.neighbor_color(x1, y1, color_mask)]
+        if len(free_pts) < 2:
+            return None
+        segments = []
+        cur = [free_pts[0]]
+        for prev, this in zip(free_pts, free_pts[1:]):
+            if math.hypot(prev[0] - this[0], prev[1] - this[1]) < 2.0:
+                cur.append(this)
+            else:
+                if len(cur) > 1:
+                    segments.append(cur)
+                cur = [this]
+        if len(cur) > 1:
+            segments.append(cur)
+        if not segments:
+            return None
+        maker = self.maker
+        largest = max(segments, key=maker._segment_length)
+        half = maker._segment_length(largest) * 0.5
+        dist_so_far = 0
+        mx, my = largest[-1]
+        for i in range(len(largest) - 1):
+            d = maker._distance(largest[i], largest[i + 1])
+            if dist_so_far + d >= half:
+                ratio = (half - dist_so_far) / d
+                mx = largest[i][0] + ratio * (largest[i + 1][0] - largest[i][0])
+                my = largest[i][1] + ratio * (largest[i + 1][1] - largest[i][1])
+                break
+            dist_so_far += d
+        closest_idx = min(range(len(largest)), key=lambda i: maker._distance(largest[i], (mx, my)))
+        if closest_idx < len(largest) - 1:
+            p0, p1 = largest[closest_idx], largest[closest_idx + 1]
+        else:
+            p0, p1 = largest[closest_idx - 1], largest[closest_idx]
+        length = math.hypot(p1[0] - p0[0], p1[1] - p0[1])
+        if length < 1e-3:
+            return None
+        bx = int(mx + 5 * -(p1[1] - p0[1]) / length)
+        by = int(my + 5 * (p1[0] - p0[0]) / length)
+        if self.can_place(bx, by, shape, lr_mask, color_mask):
+            return (bx, by)
+        return None
+
+    @staticmethod
+    def neighbor_color(x, y, color_mask):
+        h, w = color_mask.shape
+        for dy in [-1, 0, 1]:
+            for dx in [-1, 0, 1]:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < w and 0 <= ny < h and color_mask[ny, nx] == 255:
+                    return True
+        return False
+
+    def can_place(self, bx, by, shape, lr_mask, color_mask):
+        h, w = shape
+        xB, yB = bx + self.stairs_w, by + self.stairs_h
+        if bx < 0 or by < 0 or xB > w or yB > h:
+            return False
+        if cv2.countNonZero(lr_mask[by:yB, bx:xB]) < self.stairs_w * self.stairs_h:
+            return False
+        return cv2.countNonZero(color_mask[by:yB, bx:xB]) == 0
+
+
+def living_inputs(maker, img):
+    """
+    (largest living contour, color mask) as _place_stairs_in_image computes them.
+    """
+    masks = compute_plan_masks(img, maker.room_colors, maker.tol, min_floor_area=2000)
+    if masks is None:
+        return None
+    cnts, _ = cv2.findContours(masks.living_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not cnts:
+        return None
+    largest = max(cnts, key=cv2.contourArea)
+    if cv2.contourArea(largest) < 10:
+        return None
+    return largest, masks.color_mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the fast stairs placement.")
+    parser.add_argument("image_dirs", nargs="*",
+                        default=[os.path.join(os.path.dirname(__file__), "..", "frontend", "output")])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[15, 10, 25, 40])
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Upscale the renders (larger living areas, more boundary points).")
+    args = parser.parse_args()
+
+    images = [img for d in args.image_dirs for _, img in iter_images(d)]
+    if args.scale > 1:
+        images = [cv2.resize(img, None, fx=args.scale, fy=args.scale,
+                             interpolation=cv2.INTER_NEAREST) for img in images]
+    if not images:
+        print("No images found.")
+        sys.exit(1)
+
+    mismatches = 0
+    stage_dir = tempfile.mkdtemp()
+    for size in args.sizes:
+        maker = PrettyFloorplanMaker(stage_dir, stage_dir, stairs_size=(size, size))
+        legacy = LegacyStairs(maker)
+        cases = [(img, living_inputs(maker, img)) for img in images]
+        cases = [(img, inputs) for img, inputs in cases if inputs is not None]
+
+        old_times, new_times = [], []
+        placed = 0
+        for img, (contour, color_mask) in cases:
+            start = time.perf_counter()
+            expected = legacy.place(img.shape[:2], contour, color_mask)
+            old_times.append(time.perf_counter() - start)
+
+            canvas = img.copy()
+            start = time.perf_counter()
+            _, plan = maker._try_place_stairs(canvas, contour, color_mask, {})
+            new_times.append(time.perf_counter() - start)
+
+            got = (plan["Stairs"]["x"], plan["Stairs"]["y"]) if "Stairs" in plan else None
+            placed += got is not None
+            if got != expected:
+                mismatches += 1
+                print(f"Mismatch at {size}x{size}: legacy {expected}, new {got}")
+        n = max(len(cases), 1)
+        print(f"{size:3d}x{size:<3d} {len(cases)} plans, {placed} placed: "
+              f"legacy {sum(old_times) / n * 1000:7.2f} ms/plan (worst {max(old_times) * 1000:7.2f}) | "
+              f"summed-area {sum(new_times) / n * 1000:6.2f} ms/plan (worst {max(new_times) * 1000:6.2f})")
+
+    os.rmdir(stage_dir)
+    if mismatches:
+        sys.exit(1)
+    print("Stairs positions identical.")
+
+
+if __name__ == "__main__":
+    main()
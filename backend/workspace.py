@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import tempfile
+
+import cv2
+
+DEFAULT_WORKSPACE_ROOT = "workspaces"
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+# Touched on every use; its mtime is what the garbage collector looks at
+LAST_USED_MARKER = ".last_used"
+
+_VALID_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def valid_id(value):
+    """
+    True for ids that are safe as a single path component (session, job and workspace ids).
+    """
+    return isinstance(value, str) and bool(_VALID_ID.match(value))
+
+
+def atomic_write_bytes(path, data):
+    """
+    Write data to path via a temp file + rename in the same directory, so a
+    reader (another request, another process) never sees a half-written file.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def atomic_write_json(path, value):
+    atomic_write_bytes(path, json.dumps(value).encode("utf-8"))
+
+
+def atomic_write_image(path, image):
+    """
+    cv2.imwrite, but atomic. The format follows the file extension.
+    """
+    ok, encoded = cv2.imencode(os.path.splitext(path)[1] or ".png", image)
+    if not ok:
+        raise ValueError(f"Could not encode image for {path}")
+    atomic_write_bytes(path, encoded.tobytes())
+
+
+class Workspace:
+    """
+    An isolated directory tree for one session or job:
+
+        <root>/<workspace_id>/output/, finaloutput/, perfect/, pretty/, output_floor1/, ...
+
+    Backend classes take a workspace and resolve their stage directories through
+    dir(stage) instead of using the shared, cwd-relative folders, so concurrent
+    users (and several server processes) never touch each other's files.
+    Without a workspace they keep using the stage folders in the current directory.
+
+    Every use refreshes a marker file; collect_stale_workspaces() deletes the
+    workspaces nobody used for longer than a TTL.
+    """
+
+    def __init__(self, workspace_id=None, root=DEFAULT_WORKSPACE_ROOT):
+        """
+        :param workspace_id: session/job id (letters, digits, '-' and '_'); a new one if None.
+        :raises ValueError: for ids that could escape the root directory.
+        """
+        workspace_id = workspace_id or uuid.uuid4().hex
+        if not valid_id(workspace_id):
+            raise ValueError(f"Invalid workspace id: {workspace_id!r}")
+        self.workspace_id = workspace_id
+        self.root = root
+        self.path = os.path.join(root, workspace_id)
+        os.makedirs(self.path, exist_ok=True)
+        self.touch()
+
+    def dir(self, stage):
+        """
+        Directory of one stage ("output", "pretty", ...), created on demand.
+        """
+        path = os.path.normpath(os.path.join(self.path, stage))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def file(self, stage, filename):
+        return os.path.join(self.dir(stage), filename)
+
+    def touch(self):
+        marker = os.path.join(self.path, LAST_USED_MARKER)
+        with open(marker, "a"):
+            pass
+        os.utime(marker, None)
+
+    def last_used(self):
+        return workspace_last_used(self.path)
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __repr__(self):
+        return f"Workspace({self.path!r})"
+
+
+def stage_dir(stage, workspace=None):
+    """
+    Directory for a stage: inside the workspace if one is given, else the
+    cwd-relative folder itself (the legacy behaviour).
+    """
+    if workspace is None:
+        os.makedirs(stage, exist_ok=True)
+        return stage
+    return workspace.dir(stage)
+
+
+def workspace_last_used(path):
+    """
+    mtime of the workspace's marker (None if it has none, i.e. it is not a workspace).
+    """
+    try:
+        return os.path.getmtime(os.path.join(path, LAST_USED_MARKER))
+    except OSError:
+        return None
+
+
+def collect_stale_workspaces(root=DEFAULT_WORKSPACE_ROOT, ttl_seconds=DEFAULT_TTL_SECONDS, now=None):
+    """
+    Delete the workspaces under root that were last used more than ttl_seconds ago.
+    Safe to run from several processes at once.
+    :return: ids of the removed workspaces
+    """
+    if not os.path.isdir(root):
+        return []
+    now = now if now is not None else time.time()
+    removed = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        last_used = workspace_last_used(path)
+        if last_used is None or now - last_used <= ttl_seconds:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed